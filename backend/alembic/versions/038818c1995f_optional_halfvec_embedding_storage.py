@@ -0,0 +1,43 @@
+"""optional halfvec embedding storage
+
+Revision ID: 038818c1995f
+Revises: 9df82087ce1c
+Create Date: 2026-10-17 07:09:13.779830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '038818c1995f'
+down_revision = '9df82087ce1c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Embeddings stay vector(384), the default VECTOR_STORAGE. Revisions must
+    # not depend on settings, so switching to halfvec (and back) is done by
+    # `python -m src.chunks.vector_schema apply`.
+    pass
+
+
+def downgrade():
+    # Earlier revisions expect vector(384), whatever storage was applied since
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF (
+                SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+                WHERE attrelid = 'chunks'::regclass AND attname = 'embedding'
+            ) <> 'vector(384)' THEN
+                DROP INDEX IF EXISTS idx_chunks_embedding_bq;
+                DROP INDEX IF EXISTS idx_chunks_embedding;
+                ALTER TABLE chunks ALTER COLUMN embedding TYPE vector(384) USING embedding::vector(384);
+            END IF;
+        END $$
+        """
+    )
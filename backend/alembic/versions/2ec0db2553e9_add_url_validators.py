@@ -0,0 +1,29 @@
+"""add url validators
+
+Revision ID: 2ec0db2553e9
+Revises: d356a017fbc0
+Create Date: 2026-10-17 08:13:07.302396
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '2ec0db2553e9'
+down_revision = 'd356a017fbc0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('urls', sa.Column('etag', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('urls', sa.Column('last_modified', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('urls', sa.Column('content_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column('urls', 'content_hash')
+    op.drop_column('urls', 'last_modified')
+    op.drop_column('urls', 'etag')
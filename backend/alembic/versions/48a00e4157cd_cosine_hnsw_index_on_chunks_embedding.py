@@ -0,0 +1,33 @@
+"""cosine hnsw index on chunks embedding
+
+Revision ID: 48a00e4157cd
+Revises: 2661a0ca55f5
+Create Date: 2026-10-17 07:01:07.176154
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '48a00e4157cd'
+down_revision = '2661a0ca55f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Queries order by cosine distance (<=>), which an index built with
+    # vector_l2_ops cannot serve, so rebuild it with the matching operator class
+    op.execute('DROP INDEX IF EXISTS idx_chunks_embedding')
+    op.execute(
+        'CREATE INDEX idx_chunks_embedding ON chunks USING hnsw (embedding vector_cosine_ops)'
+    )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS idx_chunks_embedding')
+    op.execute(
+        'CREATE INDEX idx_chunks_embedding ON chunks USING hnsw (embedding vector_l2_ops)'
+    )
@@ -0,0 +1,29 @@
+"""binary quantized embedding index
+
+Revision ID: 50c1d64a5d0a
+Revises: 038818c1995f
+Create Date: 2026-10-17 07:12:30.104574
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '50c1d64a5d0a'
+down_revision = '038818c1995f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # VECTOR_SEARCH_BINARY_QUANTIZATION is off by default, so no index is built
+    # here. Revisions must not depend on settings; the Hamming-distance index
+    # is created (and dropped) by `python -m src.chunks.vector_schema apply`.
+    pass
+
+
+def downgrade():
+    # Created outside of migrations, if at all
+    op.execute('DROP INDEX IF EXISTS idx_chunks_embedding_bq')
@@ -0,0 +1,28 @@
+"""btree indexes for filtered chunk search
+
+Revision ID: 7dbfff380041
+Revises: 48a00e4157cd
+Create Date: 2026-10-17 07:04:57.669508
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '7dbfff380041'
+down_revision = '48a00e4157cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Small-scope searches bypass HNSW and filter through these btree indexes
+    op.create_index('ix_chunks_project_id', 'chunks', ['project_id'])
+    op.create_index('ix_chunks_url_id_chunk_index', 'chunks', ['url_id', 'chunk_index'])
+
+
+def downgrade():
+    op.drop_index('ix_chunks_url_id_chunk_index', table_name='chunks')
+    op.drop_index('ix_chunks_project_id', table_name='chunks')
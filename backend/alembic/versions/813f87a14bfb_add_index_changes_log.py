@@ -0,0 +1,35 @@
+"""add index_changes log
+
+Revision ID: 813f87a14bfb
+Revises: fdac0f691582
+Create Date: 2026-10-17 07:43:57.103293
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '813f87a14bfb'
+down_revision = 'fdac0f691582'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per projects.index_generation bump, naming the URL whose chunks
+    # changed; url_id has no foreign key so deletions are recorded too
+    op.create_table(
+        'index_changes',
+        sa.Column('project_id', sa.UUID(), nullable=False),
+        sa.Column('generation', sa.Integer(), nullable=False),
+        sa.Column('url_id', sa.UUID(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.project_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_id', 'generation')
+    )
+
+
+def downgrade():
+    op.drop_table('index_changes')
@@ -0,0 +1,37 @@
+"""add pipeline_artifacts
+
+Revision ID: 8f3530230b7b
+Revises: 2ec0db2553e9
+Create Date: 2026-10-17 08:35:10.306444
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3530230b7b'
+down_revision = '2ec0db2553e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pipeline_artifacts',
+        sa.Column('artifact_id', sa.UUID(), nullable=False),
+        sa.Column('url_id', sa.UUID(), nullable=False),
+        sa.Column('page', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('content_type', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('contents', sa.JSON(), nullable=True),
+        sa.Column('embeddings', sa.LargeBinary(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['url_id'], ['urls.url_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('artifact_id')
+    )
+    op.create_index(op.f('ix_pipeline_artifacts_url_id'), 'pipeline_artifacts', ['url_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_pipeline_artifacts_url_id'), table_name='pipeline_artifacts')
+    op.drop_table('pipeline_artifacts')
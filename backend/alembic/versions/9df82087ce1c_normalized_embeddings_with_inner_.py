@@ -0,0 +1,43 @@
+"""normalized embeddings with inner product index
+
+Revision ID: 9df82087ce1c
+Revises: db3485f4358f
+Create Date: 2026-10-17 07:08:01.719354
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '9df82087ce1c'
+down_revision = 'db3485f4358f'
+branch_labels = None
+depends_on = None
+
+# Must match src.chunks.constants.CHUNK_PARTITION_COUNT
+PARTITION_COUNT = 16
+
+
+def _rebuild_embedding_index(opclass):
+    op.execute('DROP INDEX IF EXISTS idx_chunks_embedding')
+    op.execute(f'CREATE INDEX idx_chunks_embedding ON ONLY chunks USING hnsw (embedding {opclass})')
+    for remainder in range(PARTITION_COUNT):
+        partition = f'chunks_p{remainder:02d}'
+        op.execute(f'CREATE INDEX {partition}_embedding_idx ON {partition} USING hnsw (embedding {opclass})')
+        op.execute(f'ALTER INDEX idx_chunks_embedding ATTACH PARTITION {partition}_embedding_idx')
+
+
+def upgrade():
+    # Always builds the default (VECTOR_SEARCH_METRIC=inner_product) schema;
+    # switching to cosine is done by `python -m src.chunks.vector_schema apply`
+    # Normalize before building the index so the graph is built on unit vectors
+    op.execute('UPDATE chunks SET embedding = l2_normalize(embedding)')
+    _rebuild_embedding_index('vector_ip_ops')
+
+
+def downgrade():
+    # Normalized embeddings rank identically under cosine distance, so only the
+    # index has to change back
+    _rebuild_embedding_index('vector_cosine_ops')
@@ -0,0 +1,42 @@
+"""chunk metadata filter columns
+
+Revision ID: adc51a57c26a
+Revises: 813f87a14bfb
+Create Date: 2026-10-17 07:55:40.786501
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'adc51a57c26a'
+down_revision = '813f87a14bfb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Denormalized from urls so that filtered searches can pre-filter through
+    # btree indexes on chunks instead of joining urls after the ANN scan
+    op.add_column('chunks', sa.Column('host', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True))
+    op.add_column('chunks', sa.Column('crawled_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute(
+        """
+        UPDATE chunks
+        SET host = lower(substring(urls.original_url FROM '^[A-Za-z][A-Za-z0-9+.-]*://(?:[^@/?#]*@)?([^:/?#]+)')),
+            crawled_at = chunks.created_at
+        FROM urls
+        WHERE urls.url_id = chunks.url_id
+        """
+    )
+    op.create_index('ix_chunks_project_id_host_crawled_at', 'chunks', ['project_id', 'host', 'crawled_at'])
+    op.create_index('ix_chunks_project_id_crawled_at', 'chunks', ['project_id', 'crawled_at'])
+
+
+def downgrade():
+    op.drop_index('ix_chunks_project_id_crawled_at', table_name='chunks')
+    op.drop_index('ix_chunks_project_id_host_crawled_at', table_name='chunks')
+    op.drop_column('chunks', 'crawled_at')
+    op.drop_column('chunks', 'host')
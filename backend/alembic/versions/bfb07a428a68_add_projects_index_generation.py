@@ -0,0 +1,28 @@
+"""add projects index_generation
+
+Revision ID: bfb07a428a68
+Revises: 50c1d64a5d0a
+Create Date: 2026-10-17 07:15:53.981022
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'bfb07a428a68'
+down_revision = '50c1d64a5d0a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'projects',
+        sa.Column('index_generation', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade():
+    op.drop_column('projects', 'index_generation')
@@ -0,0 +1,29 @@
+"""add crawl_host_slots
+
+Revision ID: d356a017fbc0
+Revises: adc51a57c26a
+Create Date: 2026-10-17 08:04:38.074566
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'd356a017fbc0'
+down_revision = 'adc51a57c26a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('crawl_host_slots',
+        sa.Column('host', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+        sa.Column('next_slot_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('host')
+    )
+
+
+def downgrade():
+    op.drop_table('crawl_host_slots')
@@ -0,0 +1,104 @@
+"""hash partition chunks by project_id
+
+Revision ID: db3485f4358f
+Revises: 7dbfff380041
+Create Date: 2026-10-17 07:06:13.425837
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = 'db3485f4358f'
+down_revision = '7dbfff380041'
+branch_labels = None
+depends_on = None
+
+# Must match src.chunks.constants.CHUNK_PARTITION_COUNT
+PARTITION_COUNT = 16
+
+CHUNK_COLUMNS = 'chunk_id, url_id, project_id, content, embedding, chunk_index, created_at'
+
+
+def _partition_names():
+    return [f'chunks_p{remainder:02d}' for remainder in range(PARTITION_COUNT)]
+
+
+def upgrade():
+    # Keep the old heap around until its rows are copied over
+    op.execute('ALTER TABLE chunks RENAME TO chunks_unpartitioned')
+    op.execute('ALTER INDEX chunks_pkey RENAME TO chunks_unpartitioned_pkey')
+    op.drop_index('idx_chunks_embedding', table_name='chunks_unpartitioned')
+    op.drop_index('ix_chunks_project_id', table_name='chunks_unpartitioned')
+    op.drop_index('ix_chunks_url_id_chunk_index', table_name='chunks_unpartitioned')
+    
+    # The partition key has to be part of the primary key
+    op.create_table(
+        'chunks',
+        sa.Column('chunk_id', sa.UUID(), nullable=False),
+        sa.Column('url_id', sa.UUID(), nullable=False),
+        sa.Column('project_id', sa.UUID(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('embedding', Vector(384), nullable=False),
+        sa.Column('chunk_index', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.project_id']),
+        sa.ForeignKeyConstraint(['url_id'], ['urls.url_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('chunk_id', 'project_id', name='chunks_pkey'),
+        postgresql_partition_by='HASH (project_id)',
+    )
+    for remainder, partition in enumerate(_partition_names()):
+        op.execute(
+            f'CREATE TABLE {partition} PARTITION OF chunks '
+            f'FOR VALUES WITH (MODULUS {PARTITION_COUNT}, REMAINDER {remainder})'
+        )
+    
+    op.execute(f'INSERT INTO chunks ({CHUNK_COLUMNS}) SELECT {CHUNK_COLUMNS} FROM chunks_unpartitioned')
+    op.drop_table('chunks_unpartitioned')
+    
+    op.create_index('ix_chunks_project_id', 'chunks', ['project_id'])
+    op.create_index('ix_chunks_url_id_chunk_index', 'chunks', ['url_id', 'chunk_index'])
+    
+    # Each partition gets its own, much smaller HNSW graph. The parent index is
+    # created ON ONLY the parent and the local indexes are attached one by one,
+    # so they can also be rebuilt independently (and in parallel) later on.
+    op.execute('CREATE INDEX idx_chunks_embedding ON ONLY chunks USING hnsw (embedding vector_cosine_ops)')
+    for partition in _partition_names():
+        op.execute(
+            f'CREATE INDEX {partition}_embedding_idx ON {partition} USING hnsw (embedding vector_cosine_ops)'
+        )
+        op.execute(f'ALTER INDEX idx_chunks_embedding ATTACH PARTITION {partition}_embedding_idx')
+
+
+def downgrade():
+    op.execute('ALTER TABLE chunks RENAME TO chunks_partitioned')
+    op.execute('ALTER INDEX chunks_pkey RENAME TO chunks_partitioned_pkey')
+    op.drop_index('idx_chunks_embedding', table_name='chunks_partitioned')
+    op.drop_index('ix_chunks_project_id', table_name='chunks_partitioned')
+    op.drop_index('ix_chunks_url_id_chunk_index', table_name='chunks_partitioned')
+    
+    op.create_table(
+        'chunks',
+        sa.Column('chunk_id', sa.UUID(), nullable=False),
+        sa.Column('url_id', sa.UUID(), nullable=False),
+        sa.Column('project_id', sa.UUID(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('embedding', Vector(384), nullable=False),
+        sa.Column('chunk_index', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.project_id']),
+        sa.ForeignKeyConstraint(['url_id'], ['urls.url_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('chunk_id', name='chunks_pkey'),
+    )
+    op.execute(f'INSERT INTO chunks ({CHUNK_COLUMNS}) SELECT {CHUNK_COLUMNS} FROM chunks_partitioned')
+    # Dropping the parent also drops all of its partitions
+    op.drop_table('chunks_partitioned')
+    
+    op.create_index('ix_chunks_project_id', 'chunks', ['project_id'])
+    op.create_index('ix_chunks_url_id_chunk_index', 'chunks', ['url_id', 'chunk_index'])
+    op.execute(
+        'CREATE INDEX idx_chunks_embedding ON chunks USING hnsw (embedding vector_cosine_ops)'
+    )
@@ -0,0 +1,40 @@
+"""chunk content full text search
+
+Revision ID: fdac0f691582
+Revises: bfb07a428a68
+Create Date: 2026-10-17 07:18:56.324364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'fdac0f691582'
+down_revision = 'bfb07a428a68'
+branch_labels = None
+depends_on = None
+
+# Must match src.chunks.constants.CHUNK_PARTITION_COUNT
+PARTITION_COUNT = 16
+
+
+def upgrade():
+    # Kept in sync with content by Postgres; hybrid search queries it directly.
+    # Built with the default TEXT_SEARCH_CONFIG; other configurations are
+    # applied by `python -m src.chunks.vector_schema apply`.
+    op.execute(
+        "ALTER TABLE chunks ADD COLUMN content_tsv tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('english'::regconfig, content)) STORED"
+    )
+    op.execute('CREATE INDEX idx_chunks_content_tsv ON ONLY chunks USING gin (content_tsv)')
+    for remainder in range(PARTITION_COUNT):
+        partition = f'chunks_p{remainder:02d}'
+        op.execute(f'CREATE INDEX {partition}_content_tsv_idx ON {partition} USING gin (content_tsv)')
+        op.execute(f'ALTER INDEX idx_chunks_content_tsv ATTACH PARTITION {partition}_content_tsv_idx')
+
+
+def downgrade():
+    # Dropping the column drops its indexes
+    op.execute('ALTER TABLE chunks DROP COLUMN content_tsv')
@@ -0,0 +1,149 @@
+"""
+Benchmark recall and latency of chunk similarity search against exact search.
+
+Queries are embeddings of randomly sampled chunks of the given projects. The
+exact top-k is computed in NumPy over all of their embeddings, and each search
+configuration is scored by recall@k (the fraction of the exact top-k it
+returns) and its latency percentiles.
+
+Usage (from ./backend/):
+
+    python scripts/benchmark_vector_search.py --project-id <uuid> \
+        --ef-search 40,100 --oversampling 2,4,8
+
+Scopes with at most VECTOR_SEARCH_EXACT_SCAN_THRESHOLD chunks are always
+searched exactly, so benchmark projects larger than that. The in-process
+"numpy" backend is exact; its first query includes loading the projects.
+The binary-quantized configurations are skipped unless the database has the
+idx_chunks_embedding_bq index.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chunks import service
+from src.chunks.backends import SearchScope
+from src.chunks.embeddings import embedding_array, normalize_embeddings
+from src.chunks.vector_schema import live_schema
+from src.config import settings
+from src.database import engine
+from src.models import Chunk
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--project-id", type=UUID, action="append", required=True,
+                        help="Project to search; repeat to search several projects at once")
+    parser.add_argument("--queries", type=int, default=100, help="Number of sampled queries")
+    parser.add_argument("--top-k", type=int, default=10, help="Number of results per query")
+    parser.add_argument("--ef-search", type=_int_list, default=[settings.VECTOR_SEARCH_EF_SEARCH],
+                        help="Comma-separated hnsw.ef_search values")
+    parser.add_argument("--oversampling", type=_int_list, default=[2, 4, 8],
+                        help="Comma-separated oversampling factors for binary-quantized search")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+async def load_embeddings(project_ids: list[UUID]):
+    """Load the chunk IDs and embeddings of the projects as a float32 matrix."""
+    async with AsyncSession(engine) as session:
+        result = await session.execute(
+            select(Chunk.chunk_id, Chunk.embedding).where(Chunk.project_id.in_(project_ids))
+        )
+        rows = result.all()
+    chunk_ids = [row.chunk_id for row in rows]
+    matrix = np.stack([embedding_array(row.embedding) for row in rows])
+    return chunk_ids, matrix
+
+
+def exact_top_k(matrix: np.ndarray, query: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the exact top-k rows, using the configured metric."""
+    if settings.VECTOR_SEARCH_METRIC == "inner_product":
+        distances = -(matrix @ query)
+    else:
+        distances = -(normalize_embeddings(matrix) @ normalize_embeddings(query))
+    return np.argsort(distances, kind="stable")[:top_k]
+
+
+async def run_configuration(project_ids, queries, truth, top_k, ef_search, oversampling):
+    """Run all queries with one configuration and return (recall, p50 ms, p95 ms)."""
+    recalls, latencies = [], []
+    for query, expected in zip(queries, truth, strict=True):
+        # Every search runs in its own transaction, like an API request
+        async with AsyncSession(engine) as session:
+            started = time.perf_counter()
+            rows = await service._nearest_chunks(
+                session,
+                query.tolist(),
+                top_k=top_k,
+                ef_search=ef_search,
+                scope=SearchScope(tuple(project_ids)),
+                oversampling=oversampling,
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            await session.rollback()
+        recalls.append(len(expected & {row.chunk_id for row in rows}) / len(expected))
+    return float(np.mean(recalls)), float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+async def main() -> None:
+    args = parse_args()
+    chunk_ids, matrix = await load_embeddings(args.project_id)
+    if len(chunk_ids) <= settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD:
+        print(
+            f"Warning: {len(chunk_ids)} chunks is within VECTOR_SEARCH_EXACT_SCAN_THRESHOLD "
+            f"({settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD}); all searches will be exact."
+        )
+
+    sample = random.Random(args.seed).sample(range(len(chunk_ids)), min(args.queries, len(chunk_ids)))
+    queries = matrix[sample]
+    truth = [
+        {chunk_ids[i] for i in exact_top_k(matrix, query, args.top_k)}
+        for query in queries
+    ]
+
+    configurations = [("numpy", "-", None)]
+    configurations += [("hnsw", ef_search, None) for ef_search in args.ef_search]
+    async with engine.connect() as conn:
+        binary_index = (await live_schema(conn)).binary_quantization
+    if binary_index:
+        configurations += [
+            ("binary+rerank", ef_search, oversampling)
+            for ef_search in args.ef_search
+            for oversampling in args.oversampling
+        ]
+    else:
+        print(
+            "Warning: idx_chunks_embedding_bq does not exist; skipping binary+rerank "
+            "(set VECTOR_SEARCH_BINARY_QUANTIZATION and run the migrations to create it)."
+        )
+
+    print(f"{len(chunk_ids)} chunks, {len(queries)} queries, top_k={args.top_k}")
+    print(f"{'mode':<14} {'ef_search':>9} {'oversampling':>12} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode, ef_search, oversampling in configurations:
+        settings.VECTOR_SEARCH_BACKEND = "numpy" if mode == "numpy" else "pgvector"
+        settings.VECTOR_SEARCH_BINARY_QUANTIZATION = oversampling is not None
+        recall, p50, p95 = await run_configuration(
+            args.project_id, queries, truth, args.top_k, ef_search if mode != "numpy" else None, oversampling
+        )
+        print(
+            f"{mode:<14} {ef_search:>9} {oversampling or '-':>12} "
+            f"{recall:>9.3f} {p50:>8.1f} {p95:>8.1f}"
+        )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,757 @@
+"""Vector search backends that answer nearest-neighbor queries outside the database."""
+
+import fcntl
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chunks.embeddings import embedding_array, normalize_embeddings
+from src.config import settings
+from src.models import URL, Chunk, IndexChange, Project
+
+# (chunk ID, distance) of each neighbor, nearest first
+Neighbors = List[Tuple[UUID, float]]
+
+# (distance, chunk ID) of the last result of a page; the next page starts after it
+PageCursor = Tuple[float, UUID]
+
+# (chunk ID, URL ID, embedding) of each chunk loaded into an index
+ChunkRows = List[Tuple[UUID, UUID, np.ndarray]]
+
+# Rebuild a FAISS index once more than this fraction of its rows are deleted
+_MAX_DELETED_FRACTION = 0.5
+
+
+@dataclass(frozen=True)
+class SearchScope:
+    """
+    Chunks a search runs over: all chunks of some projects, or those of one
+    URL, optionally narrowed by metadata filters.
+    """
+    project_ids: Tuple[UUID, ...]
+    url_id: Optional[UUID] = None
+    hosts: Tuple[str, ...] = ()
+    url_statuses: Tuple[str, ...] = ()
+    crawled_after: Optional[datetime] = None
+    crawled_before: Optional[datetime] = None
+
+    @property
+    def filtered(self) -> bool:
+        """Whether any metadata filter is set."""
+        return bool(self.hosts or self.url_statuses or self.crawled_after or self.crawled_before)
+
+    def filters(self) -> tuple:
+        """Values of the metadata filters, for cache keys and cursor fingerprints."""
+        return (self.hosts, self.url_statuses, self.crawled_after, self.crawled_before)
+
+    def criteria(self) -> list:
+        """SQL filter selecting the chunks in scope."""
+        if self.url_id is not None:
+            criteria = [Chunk.url_id == self.url_id, Chunk.project_id == self.project_ids[0]]
+        else:
+            criteria = [Chunk.project_id.in_(self.project_ids)]
+        # host and crawled_at are denormalized onto chunks and indexed with
+        # project_id; the mutable URL status is looked up in urls instead
+        if self.hosts:
+            criteria.append(Chunk.host.in_(self.hosts))
+        if self.crawled_after is not None:
+            criteria.append(Chunk.crawled_at >= self.crawled_after)
+        if self.crawled_before is not None:
+            criteria.append(Chunk.crawled_at < self.crawled_before)
+        if self.url_statuses:
+            criteria.append(Chunk.url_id.in_(
+                select(URL.url_id).where(URL.project_id.in_(self.project_ids), URL.status.in_(self.url_statuses))
+            ))
+        return criteria
+
+
+class VectorSearchBackend(Protocol):
+    """Interface implemented by all in-process vector search backends."""
+
+    async def search(
+        self,
+        session: AsyncSession,
+        query_embeddings: Sequence[Sequence[float]],
+        top_k: int,
+        scope: SearchScope,
+        ef_search: Optional[int] = None,
+        after: Optional[PageCursor] = None,
+    ) -> List[Neighbors]:
+        """Find the top_k nearest chunks in scope for each query embedding, ordered after the cursor."""
+        ...
+
+    def replace_url(
+        self,
+        project_id: UUID,
+        url_id: UUID,
+        generation: int,
+        chunk_ids: Sequence[UUID],
+        embeddings: np.ndarray,
+    ) -> None:
+        """Apply a committed replacement of a URL's chunks."""
+        ...
+
+    def remove_url(self, project_id: UUID, url_id: UUID, generation: int) -> None:
+        """Apply a committed deletion of a URL's chunks."""
+        ...
+
+    def change_log_horizon(self, project_id: UUID) -> Optional[int]:
+        """Generation up to which the project's index_changes log is no longer needed, if any."""
+        ...
+
+    def clear(self) -> None:
+        """Drop all loaded indexes."""
+        ...
+
+
+class _ProjectIndex:
+    """
+    Immutable snapshot of a project's embeddings at one index generation.
+
+    Embeddings are stored L2-normalized in one contiguous float32 matrix, with
+    parallel arrays of chunk IDs and integer URL codes for filtering. Updates
+    build a new snapshot, so searches in the threadpool never see a partial
+    update.
+    """
+
+    __slots__ = ("generation", "matrix", "chunk_ids", "url_codes", "url_code_by_id")
+
+    def __init__(
+        self,
+        generation: int,
+        matrix: np.ndarray,
+        chunk_ids: np.ndarray,
+        url_codes: np.ndarray,
+        url_code_by_id: Dict[UUID, int],
+    ):
+        self.generation = generation
+        self.matrix = matrix
+        self.chunk_ids = chunk_ids
+        self.url_codes = url_codes
+        self.url_code_by_id = url_code_by_id
+
+    @classmethod
+    def build(cls, generation: int, rows: ChunkRows) -> "_ProjectIndex":
+        """Build an index from (chunk ID, URL ID, embedding) rows."""
+        url_code_by_id: Dict[UUID, int] = {}
+        url_codes = np.array(
+            [url_code_by_id.setdefault(url_id, len(url_code_by_id)) for _, url_id, _ in rows],
+            dtype=np.int32,
+        )
+        chunk_ids = np.array([chunk_id for chunk_id, _, _ in rows], dtype=object)
+        return cls(generation, _embedding_matrix(rows), chunk_ids, url_codes, url_code_by_id)
+
+    def replace_url(
+        self,
+        generation: int,
+        url_id: UUID,
+        chunk_ids: Sequence[UUID],
+        embeddings: np.ndarray,
+    ) -> "_ProjectIndex":
+        """Snapshot with the URL's rows replaced, copying the matrix once."""
+        keep = self.url_codes != self.url_code_by_id.get(url_id, -1)
+        url_code_by_id = dict(self.url_code_by_id)
+        code = url_code_by_id.setdefault(url_id, len(url_code_by_id))
+        embeddings = normalize_embeddings(
+            np.asarray(embeddings, dtype=np.float32).reshape(len(chunk_ids), self.matrix.shape[1])
+        )
+        return _ProjectIndex(
+            generation,
+            np.ascontiguousarray(np.concatenate([self.matrix[keep], embeddings])),
+            np.concatenate([self.chunk_ids[keep], np.array(list(chunk_ids), dtype=object)]),
+            np.concatenate([self.url_codes[keep], np.full(len(chunk_ids), code, dtype=np.int32)]),
+            url_code_by_id,
+        )
+
+    def search(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        url_ids: Optional[Sequence[UUID]],
+        after: Optional[PageCursor],
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Chunk IDs and similarities of the top_k rows of the given URLs (all if None) per query, best first."""
+        matrix, chunk_ids = self.matrix, self.chunk_ids
+        if url_ids is not None:
+            codes = [self.url_code_by_id[url_id] for url_id in url_ids if url_id in self.url_code_by_id]
+            positions = np.flatnonzero(np.isin(self.url_codes, codes))
+            matrix, chunk_ids = matrix[positions], chunk_ids[positions]
+        similarities = _after_cursor(queries @ matrix.T, chunk_ids, after)
+        return [(chunk_ids[best], values) for best, values in _top_k_rows(similarities, top_k, chunk_ids)]
+
+
+class NumpyVectorBackend:
+    """
+    Exact search over per-project embedding matrices held in process memory.
+
+    A project's matrix is loaded from the chunks table on its first search and
+    tagged with the project's index generation. Chunk writes made through this
+    process are applied incrementally; other writes (e.g. by another worker)
+    are caught up from the index_changes log on the next search. Each query
+    costs one matrix-vector product and an argpartition per project.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[UUID, _ProjectIndex] = {}
+        self._lock = threading.Lock()
+
+    async def search(
+        self,
+        session: AsyncSession,
+        query_embeddings: Sequence[Sequence[float]],
+        top_k: int,
+        scope: SearchScope,
+        ef_search: Optional[int] = None,
+        after: Optional[PageCursor] = None,
+    ) -> List[Neighbors]:
+        indexes = []
+        for project_id, generation in await _project_generations(session, scope.project_ids):
+            indexes.append(await self._current_index(session, project_id, generation))
+        url_ids = await _scope_url_ids(session, scope)
+        queries = normalize_embeddings(np.asarray(query_embeddings, dtype=np.float32))
+        return await run_in_threadpool(
+            lambda: _merge_neighbors(
+                [index.search(queries, top_k, url_ids, after) for index in indexes], len(queries), top_k
+            )
+        )
+
+    def replace_url(
+        self,
+        project_id: UUID,
+        url_id: UUID,
+        generation: int,
+        chunk_ids: Sequence[UUID],
+        embeddings: np.ndarray,
+    ) -> None:
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is None or index.generation != generation - 1:
+                # Caught up from the index_changes log on the next search
+                return
+            self._indexes[project_id] = index.replace_url(generation, url_id, chunk_ids, embeddings)
+
+    def remove_url(self, project_id: UUID, url_id: UUID, generation: int) -> None:
+        self.replace_url(project_id, url_id, generation, [], np.empty((0, settings.EMBEDDING_DIMENSIONS)))
+
+    def change_log_horizon(self, project_id: UUID) -> Optional[int]:
+        # Indexes of other processes may be at any older generation
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    async def _current_index(self, session: AsyncSession, project_id: UUID, generation: int) -> _ProjectIndex:
+        """Get the project's index at its current generation, catching up or loading it."""
+        index = self._indexes.get(project_id)
+        if index is not None and index.generation == generation:
+            return index
+
+        changed = await _changed_urls(session, project_id, index.generation, generation) if index else None
+        if changed is None:
+            index = _ProjectIndex.build(generation, await _project_rows(session, project_id))
+        else:
+            rows = await _url_rows(session, project_id, changed)
+            for url_id in changed:
+                url_rows = [row for row in rows if row[1] == url_id]
+                index = index.replace_url(
+                    generation,
+                    url_id,
+                    [chunk_id for chunk_id, _, _ in url_rows],
+                    _embedding_matrix(url_rows),
+                )
+        with self._lock:
+            self._indexes[project_id] = index
+        return index
+
+
+class _FaissIndex:
+    """
+    A project's FAISS HNSW index with the chunk and URL ID of each label.
+
+    Deleted chunks are tombstoned in ``live`` rather than removed, since HNSW
+    graphs do not support removal. Mutations and searches hold ``lock``.
+    """
+
+    def __init__(
+        self,
+        index,
+        generation: int,
+        chunk_ids: np.ndarray,
+        url_ids: np.ndarray,
+        live: np.ndarray,
+        snapshot_generation: Optional[int],
+        mapped: bool = False,
+    ):
+        self.index = index
+        self.generation = generation
+        # UUID bytes, shape (n, 16), possibly memory-mapped
+        self.chunk_ids = chunk_ids
+        self.url_ids = url_ids
+        self.live = live
+        self.snapshot_generation = snapshot_generation
+        # Memory-mapped indexes are read-only and must be copied before adding
+        self.mapped = mapped
+        self.lock = threading.Lock()
+
+    def url_mask(self, url_id: UUID) -> np.ndarray:
+        """Rows belonging to a URL."""
+        return (self.url_ids == np.frombuffer(url_id.bytes, dtype=np.uint8)).all(axis=1)
+
+    def urls_mask(self, url_ids: Sequence[UUID]) -> np.ndarray:
+        """Rows belonging to any of the URLs."""
+        # Each 16-byte row compares as a single opaque value
+        return np.isin(self.url_ids.view("V16").ravel(), _uuid_bytes(url_ids).view("V16").ravel())
+
+
+class FaissVectorBackend:
+    """
+    Approximate search over per-project FAISS HNSW indexes held in process memory.
+
+    Indexes are built from the chunks table, which stays the source of truth,
+    and persisted as snapshots in VECTOR_INDEX_DIR. Snapshots are opened
+    memory-mapped, so a restarted process, and all workers on a host, share
+    their pages instead of rebuilding. A loaded or mapped index catches up to
+    the project's current index generation by re-reading only the URLs listed
+    in the index_changes log since its own generation, and a new snapshot is
+    written every VECTOR_INDEX_SNAPSHOT_INTERVAL generations. The log is only
+    kept after the oldest snapshot; an index older than that reopens the
+    snapshot and catches up from there.
+
+    Scopes with at most VECTOR_SEARCH_EXACT_SCAN_THRESHOLD live chunks (e.g. a
+    single URL) are scored exactly from the stored vectors, like pgvector
+    searches; larger scopes use a filtered HNSW search.
+    """
+
+    def __init__(self, directory: str):
+        # Imported lazily, like the sentence-transformers embedder: faiss-cpu
+        # is only needed when this backend is configured
+        import faiss
+
+        self._faiss = faiss
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._indexes: Dict[UUID, _FaissIndex] = {}
+        self._lock = threading.Lock()
+
+    async def search(
+        self,
+        session: AsyncSession,
+        query_embeddings: Sequence[Sequence[float]],
+        top_k: int,
+        scope: SearchScope,
+        ef_search: Optional[int] = None,
+        after: Optional[PageCursor] = None,
+    ) -> List[Neighbors]:
+        indexes = []
+        for project_id, generation in await _project_generations(session, scope.project_ids):
+            indexes.append(await self._current_index(session, project_id, generation))
+        url_ids = await _scope_url_ids(session, scope)
+        queries = normalize_embeddings(np.asarray(query_embeddings, dtype=np.float32))
+        ef_search = max(ef_search or settings.VECTOR_SEARCH_EF_SEARCH, top_k)
+        return await run_in_threadpool(
+            lambda: _merge_neighbors(
+                [self._search(state, queries, top_k, url_ids, ef_search, after) for state in indexes],
+                len(queries),
+                top_k,
+            )
+        )
+
+    def replace_url(
+        self,
+        project_id: UUID,
+        url_id: UUID,
+        generation: int,
+        chunk_ids: Sequence[UUID],
+        embeddings: np.ndarray,
+    ) -> None:
+        state = self._indexes.get(project_id)
+        if state is None or state.generation != generation - 1:
+            # Caught up from the index_changes log on the next search
+            return
+        rows = [(chunk_id, url_id, embedding) for chunk_id, embedding in zip(chunk_ids, np.asarray(embeddings), strict=True)]
+        if not self._apply(project_id, state, generation, [url_id], rows):
+            with self._lock:
+                self._indexes.pop(project_id, None)
+
+    def remove_url(self, project_id: UUID, url_id: UUID, generation: int) -> None:
+        self.replace_url(project_id, url_id, generation, [], np.empty((0, settings.EMBEDDING_DIMENSIONS)))
+
+    def change_log_horizon(self, project_id: UUID) -> Optional[int]:
+        # Indexes older than the oldest snapshot reopen a snapshot instead
+        snapshots = self._snapshots(project_id)
+        return snapshots[0][0] if snapshots else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    async def _current_index(self, session: AsyncSession, project_id: UUID, generation: int) -> _FaissIndex:
+        """Get the project's index at its current generation, from memory, a snapshot or the database."""
+        state = self._indexes.get(project_id)
+        if state is not None and state.generation != generation:
+            state = await self._catch_up(session, project_id, state, generation)
+        if state is None:
+            state = await run_in_threadpool(self._read_snapshot, project_id)
+            if state is not None and state.generation != generation:
+                state = await self._catch_up(session, project_id, state, generation)
+        if state is None:
+            rows = await _project_rows(session, project_id)
+            state = await run_in_threadpool(self._build, project_id, generation, rows)
+        with self._lock:
+            self._indexes[project_id] = state
+        return state
+
+    async def _catch_up(
+        self, session: AsyncSession, project_id: UUID, state: _FaissIndex, generation: int
+    ) -> Optional[_FaissIndex]:
+        """Apply the URLs changed since the index's generation, or None if it must be reloaded."""
+        changed = await _changed_urls(session, project_id, state.generation, generation)
+        if changed is None:
+            return None
+        rows = await _url_rows(session, project_id, changed)
+        if not await run_in_threadpool(self._apply, project_id, state, generation, changed, rows):
+            return None
+        return state
+
+    def _search(
+        self,
+        state: _FaissIndex,
+        queries: np.ndarray,
+        top_k: int,
+        url_ids: Optional[Sequence[UUID]],
+        ef_search: int,
+        after: Optional[PageCursor],
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Chunk IDs and similarities of the top_k live rows of the given URLs (all if None) per query."""
+        with state.lock:
+            mask = state.live if url_ids is None else state.live & state.urls_mask(url_ids)
+            positions = np.flatnonzero(mask)
+            if len(positions) <= settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD:
+                chunk_ids = _uuids(state.chunk_ids[positions])
+                if len(positions):
+                    vectors = state.index.reconstruct_batch(positions.astype(np.int64))
+                else:
+                    vectors = np.empty((0, queries.shape[1]), dtype=np.float32)
+                similarities = _after_cursor(queries @ vectors.T, chunk_ids, after)
+                return [(chunk_ids[best], values) for best, values in _top_k_rows(similarities, top_k, chunk_ids)]
+
+            bitmap = np.packbits(mask, bitorder="little")
+            selector = self._faiss.IDSelectorBitmap(len(mask), self._faiss.swig_ptr(bitmap))
+            results = []
+            for query in queries:
+                # Rows before the cursor cannot be excluded by the graph search,
+                # so later pages widen the search until enough rows follow it
+                k = top_k
+                while True:
+                    params = self._faiss.SearchParametersHNSW(sel=selector, efSearch=max(ef_search, k))
+                    similarities, labels = state.index.search(query[None, :], k, params=params)
+                    # Labels are -1 when fewer than k rows pass the filter
+                    found = labels[0] >= 0
+                    chunk_ids = _uuids(state.chunk_ids[labels[0][found]])
+                    values = _after_cursor(similarities[:, found], chunk_ids, after)[0]
+                    if np.isfinite(values).sum() >= top_k or k >= len(positions):
+                        break
+                    k *= 2
+                [(best, values)] = _top_k_rows(values[None, :], top_k, chunk_ids)
+                results.append((chunk_ids[best], values))
+            return results
+
+    def _build(self, project_id: UUID, generation: int, rows: ChunkRows) -> _FaissIndex:
+        """Build a project's index and snapshot it, unless another worker just did."""
+        with _FileLock(self._directory / f".{project_id}.lock"):
+            state = self._read_snapshot(project_id)
+            if state is not None and state.generation == generation:
+                return state
+            index = self._faiss.IndexHNSWFlat(
+                settings.EMBEDDING_DIMENSIONS, settings.VECTOR_INDEX_HNSW_M, self._faiss.METRIC_INNER_PRODUCT
+            )
+            index.hnsw.efConstruction = settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION
+            index.add(_embedding_matrix(rows))
+            state = _FaissIndex(
+                index,
+                generation,
+                _uuid_bytes([chunk_id for chunk_id, _, _ in rows]),
+                _uuid_bytes([url_id for _, url_id, _ in rows]),
+                np.ones(len(rows), dtype=bool),
+                snapshot_generation=None,
+            )
+            self._write_snapshot(project_id, state)
+            return state
+
+    def _apply(
+        self,
+        project_id: UUID,
+        state: _FaissIndex,
+        generation: int,
+        url_ids: Sequence[UUID],
+        rows: ChunkRows,
+    ) -> bool:
+        """
+        Replace the rows of the given URLs in place.
+
+        Returns:
+            False when the index has too many deleted rows and must be rebuilt
+        """
+        with state.lock:
+            for url_id in url_ids:
+                state.live = state.live & ~state.url_mask(url_id)
+            if rows:
+                if state.mapped:
+                    # A mapped index does not own its storage, so neither
+                    # would a clone of it; a deserialized copy does
+                    state.index = self._faiss.deserialize_index(self._faiss.serialize_index(state.index))
+                    state.mapped = False
+                state.index.add(_embedding_matrix(rows))
+                state.chunk_ids = np.concatenate([state.chunk_ids, _uuid_bytes([row[0] for row in rows])])
+                state.url_ids = np.concatenate([state.url_ids, _uuid_bytes([row[1] for row in rows])])
+                state.live = np.concatenate([state.live, np.ones(len(rows), dtype=bool)])
+            state.generation = generation
+            if len(state.live) and 1 - state.live.mean() > _MAX_DELETED_FRACTION:
+                return False
+            if generation - (state.snapshot_generation or 0) >= settings.VECTOR_INDEX_SNAPSHOT_INTERVAL:
+                self._write_snapshot(project_id, state)
+            return True
+
+    def _read_snapshot(self, project_id: UUID) -> Optional[_FaissIndex]:
+        """Open the project's newest snapshot memory-mapped, if there is one."""
+        snapshots = self._snapshots(project_id)
+        if not snapshots:
+            return None
+        generation, path = snapshots[-1]
+        flags = getattr(self._faiss, "IO_FLAG_MMAP_IFC", self._faiss.IO_FLAG_MMAP) | self._faiss.IO_FLAG_READ_ONLY
+        return _FaissIndex(
+            self._faiss.read_index(str(path / "index.faiss"), flags),
+            generation,
+            np.load(path / "chunk_ids.npy", mmap_mode="r"),
+            np.load(path / "url_ids.npy", mmap_mode="r"),
+            np.load(path / "live.npy"),
+            snapshot_generation=generation,
+            mapped=True,
+        )
+
+    def _write_snapshot(self, project_id: UUID, state: _FaissIndex) -> None:
+        """Atomically publish a snapshot of the index and remove older ones."""
+        target = self._directory / f"{project_id}-{state.generation}"
+        staging = self._directory / f".{project_id}-{state.generation}-{os.getpid()}-{threading.get_ident()}"
+        staging.mkdir()
+        self._faiss.write_index(state.index, str(staging / "index.faiss"))
+        np.save(staging / "chunk_ids.npy", state.chunk_ids)
+        np.save(staging / "url_ids.npy", state.url_ids)
+        np.save(staging / "live.npy", state.live)
+        try:
+            staging.rename(target)
+        except OSError:
+            # Another worker published the same generation first
+            shutil.rmtree(staging, ignore_errors=True)
+        state.snapshot_generation = state.generation
+        # Unlinking is safe for processes that still have older snapshots mapped
+        for generation, path in self._snapshots(project_id):
+            if generation < state.generation:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _snapshots(self, project_id: UUID) -> List[Tuple[int, Path]]:
+        """Published snapshots of a project, oldest first."""
+        return sorted(
+            (int(path.name.rsplit("-", 1)[1]), path)
+            for path in self._directory.glob(f"{project_id}-*")
+            if path.is_dir()
+        )
+
+
+class _FileLock:
+    """Blocking advisory lock on a file, shared by all processes on the host."""
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def __enter__(self) -> "_FileLock":
+        self._file = open(self._path, "w")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+async def _project_generations(session: AsyncSession, project_ids: Sequence[UUID]) -> List[Tuple[UUID, int]]:
+    """Current index generation of each existing project."""
+    result = await session.execute(
+        select(Project.project_id, Project.index_generation).where(Project.project_id.in_(project_ids))
+    )
+    return list(result.all())
+
+
+async def _scope_url_ids(session: AsyncSession, scope: SearchScope) -> Optional[List[UUID]]:
+    """
+    URLs a search is restricted to, or None for all URLs of the scope's projects.
+
+    Metadata filters are per URL, so they are resolved to URL IDs through the
+    chunk indexes and then applied to the in-process index as a row mask.
+    """
+    if not scope.filtered:
+        return None if scope.url_id is None else [scope.url_id]
+    result = await session.execute(select(Chunk.url_id).where(*scope.criteria()).distinct())
+    return list(result.scalars().all())
+
+
+async def _project_rows(session: AsyncSession, project_id: UUID) -> ChunkRows:
+    """Load all chunks of a project for indexing."""
+    result = await session.execute(
+        select(Chunk.chunk_id, Chunk.url_id, Chunk.embedding).where(Chunk.project_id == project_id)
+    )
+    return [(chunk_id, url_id, embedding_array(embedding)) for chunk_id, url_id, embedding in result.all()]
+
+
+async def _url_rows(session: AsyncSession, project_id: UUID, url_ids: Sequence[UUID]) -> ChunkRows:
+    """Load the current chunks of some URLs of a project for indexing."""
+    if not url_ids:
+        return []
+    result = await session.execute(
+        select(Chunk.chunk_id, Chunk.url_id, Chunk.embedding)
+        .where(Chunk.project_id == project_id, Chunk.url_id.in_(url_ids))
+        .order_by(Chunk.url_id, Chunk.chunk_index)
+    )
+    return [(chunk_id, url_id, embedding_array(embedding)) for chunk_id, url_id, embedding in result.all()]
+
+
+async def _changed_urls(session: AsyncSession, project_id: UUID, since: int, until: int) -> Optional[List[UUID]]:
+    """
+    URLs whose chunks changed after generation ``since`` up to ``until``.
+
+    Returns None when the index_changes log does not cover every generation in
+    the range (e.g. generations bumped before the log existed), in which case
+    the project has to be reloaded.
+    """
+    if since > until:
+        return None
+    result = await session.execute(
+        select(IndexChange.url_id, func.count())
+        .where(
+            IndexChange.project_id == project_id,
+            IndexChange.generation > since,
+            IndexChange.generation <= until,
+        )
+        .group_by(IndexChange.url_id)
+    )
+    counts = dict(result.all())
+    if sum(counts.values()) != until - since:
+        return None
+    return list(counts)
+
+
+def _embedding_matrix(rows: ChunkRows) -> np.ndarray:
+    """L2-normalized, contiguous float32 matrix of the rows' embeddings."""
+    if not rows:
+        return np.empty((0, settings.EMBEDDING_DIMENSIONS), dtype=np.float32)
+    matrix = normalize_embeddings(np.stack([embedding for _, _, embedding in rows]))
+    return np.ascontiguousarray(matrix, dtype=np.float32)
+
+
+def _uuid_bytes(ids: Sequence[UUID]) -> np.ndarray:
+    """Pack UUIDs into a (n, 16) uint8 array, which can be saved and memory-mapped."""
+    return np.frombuffer(b"".join(uuid.bytes for uuid in ids), dtype=np.uint8).reshape(len(ids), 16)
+
+
+def _uuids(ids: np.ndarray) -> np.ndarray:
+    """Unpack a (n, 16) uint8 array into an object array of UUIDs."""
+    return np.array([UUID(bytes=row.tobytes()) for row in ids], dtype=object)
+
+
+def _top_k_rows(
+    similarities: np.ndarray,
+    top_k: int,
+    chunk_ids: np.ndarray,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Positions and values of the top_k columns of each row, skipping -inf.
+
+    Columns are ordered by similarity, then chunk ID, so that ties are broken
+    the same way as by the SQL searches and page cursors.
+    """
+    count = similarities.shape[1]
+    k = min(top_k, count)
+    results = []
+    for row in similarities:
+        if k == 0:
+            results.append((np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)))
+            continue
+        if k < count:
+            # A linear-time partition finds the k-th best value; only the
+            # columns at least that good (including ties) are sorted
+            threshold = -np.partition(-row, k - 1)[k - 1]
+            candidates = np.flatnonzero(row >= threshold)
+        else:
+            candidates = np.arange(count)
+        candidates = candidates[np.isfinite(row[candidates])]
+        best = np.array(sorted(candidates, key=lambda i: (-row[i], chunk_ids[i]))[:k], dtype=np.intp)
+        results.append((best, row[best]))
+    return results
+
+
+def _after_cursor(similarities: np.ndarray, chunk_ids: np.ndarray, after: Optional[PageCursor]) -> np.ndarray:
+    """
+    Mask out (as -inf) the rows ordered at or before a page cursor.
+
+    Rows are ordered by distance, then chunk ID, like the keyset condition of
+    the SQL searches.
+    """
+    if after is None:
+        return similarities
+    distance, chunk_id = after
+    distances = _distances(similarities)
+    before = (distances < distance) | ((distances == distance) & (chunk_ids <= chunk_id))
+    return np.where(before, -np.inf, similarities).astype(np.float32)
+
+
+def _merge_neighbors(
+    per_index: List[List[Tuple[np.ndarray, np.ndarray]]],
+    query_count: int,
+    top_k: int,
+) -> List[Neighbors]:
+    """Merge the per-project (chunk IDs, similarities) of each query into the overall top-k."""
+    results = []
+    for query_number in range(query_count):
+        if not per_index:
+            results.append([])
+            continue
+        chunk_ids = np.concatenate([found[query_number][0] for found in per_index])
+        similarities = np.concatenate([found[query_number][1] for found in per_index])
+        order = sorted(range(len(chunk_ids)), key=lambda i: (-similarities[i], chunk_ids[i]))[:top_k]
+        results.append([(chunk_ids[i], _distance(float(similarities[i]))) for i in order])
+    return results
+
+
+def _distance(similarity: float) -> float:
+    """Convert a cosine similarity into the distance reported by pgvector searches."""
+    if settings.VECTOR_SEARCH_METRIC == "inner_product":
+        return -similarity
+    return 1.0 - similarity
+
+
+def _distances(similarities: np.ndarray) -> np.ndarray:
+    """Vectorized _distance, computed in double precision like _distance."""
+    similarities = similarities.astype(np.float64)
+    if settings.VECTOR_SEARCH_METRIC == "inner_product":
+        return -similarities
+    return 1.0 - similarities
+
+
+@lru_cache
+def get_vector_backend() -> VectorSearchBackend:
+    """Get the process-wide in-process vector search backend configured in settings."""
+    if settings.VECTOR_SEARCH_BACKEND == "faiss":
+        return FaissVectorBackend(settings.VECTOR_INDEX_DIR)
+    return NumpyVectorBackend()
@@ -2,6 +2,9 @@
 
 from enum import Enum
 
+# Number of hash partitions of the chunks table (partitioned by project_id)
+CHUNK_PARTITION_COUNT = 16
+
 
 class ChunkStatus(str, Enum):
     """Status of chunk processing."""
@@ -9,3 +12,15 @@ class ChunkStatus(str, Enum):
     PROCESSING = "processing"
     STORED = "stored"
     FAILED = "failed"
+
+
+class SearchMode(str, Enum):
+    """Retrieval strategy of a chunk search."""
+    VECTOR = "vector"
+    HYBRID = "hybrid"
+
+
+class StreamFormat(str, Enum):
+    """Media type of a streamed search response, chosen with the Accept header."""
+    NDJSON = "application/x-ndjson"
+    SSE = "text/event-stream"
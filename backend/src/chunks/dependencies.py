@@ -1,13 +1,19 @@
 """Dependencies for chunk-related operations."""
 
-from fastapi import Depends, Path, Query
+from fastapi import Depends, Header, Path, Query
 from pydantic import UUID4
-from typing import Annotated
+from typing import Annotated, List, Optional
+from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.auth.dependencies import get_db
+from src.auth.dependencies import get_current_user, get_db
+from src.models import User
+from src.projects.exceptions import UnauthorizedProjectAccessException
+from src.shares.service import can_user_access_project
 from src.urls.dependencies import get_url_or_404
+from src.chunks.constants import SearchMode, StreamFormat
 from src.chunks.exceptions import InvalidQueryException
+from src.chunks.schemas import ChunkQueryRequest, ProjectBatchSearchRequest, ProjectSearchRequest
 
 
 def validate_include_vectors(
@@ -29,3 +35,55 @@ def validate_query_params(
         raise InvalidQueryException("Query parameter cannot exceed 1000 characters")
     
     return query.strip(), top_k
+
+
+def get_stream_format(
+    accept: Optional[str] = Header(None, description="application/x-ndjson or text/event-stream to stream the results")
+) -> Optional[StreamFormat]:
+    """Get the streamed response format requested by the Accept header, if any."""
+    media_types = {media_range.split(";")[0].strip().lower() for media_range in (accept or "").split(",")}
+    for stream_format in StreamFormat:
+        if stream_format.value in media_types:
+            return stream_format
+    return None
+
+
+def validate_streamable(query_data: ChunkQueryRequest) -> None:
+    """Reject options whose results cannot be sent before the whole search completes."""
+    if (
+        query_data.mode != SearchMode.VECTOR
+        or query_data.mmr_lambda is not None
+        or query_data.rerank
+        or query_data.context_window
+        or query_data.token_budget is not None
+    ):
+        raise InvalidQueryException(
+            "Streamed searches do not support hybrid mode, mmr_lambda, rerank, context_window or token_budget"
+        )
+
+
+async def get_searchable_project_ids(
+    search_data: ProjectSearchRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: AsyncSession = Depends(get_db),
+) -> List[UUID]:
+    """Verify the current user owns or was shared every project in a search request."""
+    return await _verify_project_access(session, current_user, search_data.project_ids)
+
+
+async def get_batch_searchable_project_ids(
+    search_data: ProjectBatchSearchRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: AsyncSession = Depends(get_db),
+) -> List[UUID]:
+    """Verify the current user owns or was shared every project in a batch search request."""
+    return await _verify_project_access(session, current_user, search_data.project_ids)
+
+
+async def _verify_project_access(session: AsyncSession, user: User, project_ids: List[UUID]) -> List[UUID]:
+    """Deduplicate project IDs, raising if the user cannot access any of them."""
+    project_ids = list(dict.fromkeys(project_ids))
+    for project_id in project_ids:
+        if not await can_user_access_project(session, user.user_id, project_id):
+            raise UnauthorizedProjectAccessException()
+    return project_ids
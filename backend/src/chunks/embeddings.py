@@ -0,0 +1,148 @@
+"""Text embedding models used to vectorize chunk content and search queries."""
+
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Protocol, Sequence
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from src.cache import TTLCache
+from src.config import settings
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Query embeddings keyed by (model id, normalized query text)
+query_embedding_cache: TTLCache[List[float]] = TTLCache(
+    maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+
+
+class Embedder(Protocol):
+    """Interface implemented by all embedding models."""
+    model_id: str
+    dimensions: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), dimensions) float32 matrix."""
+        ...
+
+
+class SentenceTransformerEmbedder:
+    """Embedder backed by a local sentence-transformers model."""
+
+    def __init__(self, model_name: str, dimensions: int):
+        # Imported lazily so that the API can start without loading torch
+        # until the first embedding is actually requested.
+        from sentence_transformers import SentenceTransformer
+
+        self.model_id = model_name
+        self.dimensions = dimensions
+        self._model = SentenceTransformer(model_name)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self._model.encode(list(texts), convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder using the hashing trick.
+
+    It has no model weights or external dependencies, which makes it suitable
+    for tests and local development. Texts sharing words get similar vectors.
+    """
+
+    def __init__(self, dimensions: int):
+        self.model_id = f"hashing-{dimensions}"
+        self.dimensions = dimensions
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN_PATTERN.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vectors[row, bucket] += sign
+        return vectors
+
+
+def normalize_embeddings(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row of a matrix, leaving all-zero rows untouched."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def embedding_array(embedding) -> np.ndarray:
+    """Convert a stored embedding (vector or halfvec) into a float32 array."""
+    if hasattr(embedding, "to_numpy"):
+        embedding = embedding.to_numpy()
+    return np.asarray(embedding, dtype=np.float32)
+
+
+@lru_cache
+def get_embedder() -> Embedder:
+    """Get the process-wide embedder configured in settings."""
+    if settings.EMBEDDING_PROVIDER == "hashing":
+        return HashingEmbedder(settings.EMBEDDING_DIMENSIONS)
+    return SentenceTransformerEmbedder(settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS)
+
+
+def embedding_model_id() -> str:
+    """Identifier of the configured embedding model, without loading the model."""
+    if settings.EMBEDDING_PROVIDER == "hashing":
+        return f"hashing-{settings.EMBEDDING_DIMENSIONS}"
+    return settings.EMBEDDING_MODEL
+
+
+def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """
+    Embed a batch of texts with the configured embedder.
+
+    Vectors are L2-normalized when searching by inner product, so that the
+    inner product of two embeddings is their cosine similarity.
+    """
+    vectors = get_embedder().embed(texts)
+    if settings.VECTOR_SEARCH_METRIC == "inner_product":
+        vectors = normalize_embeddings(vectors)
+    return vectors
+
+
+def normalize_query(query: str) -> str:
+    """Normalize Unicode and whitespace so trivially different queries share an embedding."""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+async def embed_query(query: str) -> List[float]:
+    """
+    Embed a single search query without blocking the event loop.
+
+    Embeddings are cached per model and normalized query text, so repeated
+    queries skip the model entirely. The returned list must not be modified.
+    """
+    embeddings = await embed_queries([query])
+    return embeddings[0]
+
+
+async def embed_queries(queries: Sequence[str]) -> List[List[float]]:
+    """Embed several search queries, with a single model call for all cache misses."""
+    model_id = embedding_model_id()
+    queries = [normalize_query(query) for query in queries]
+    embeddings = [query_embedding_cache.get((model_id, query)) for query in queries]
+
+    missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+    if missing:
+        vectors = await run_in_threadpool(embed_texts, missing)
+        computed = {query: vector.tolist() for query, vector in zip(missing, vectors)}
+        for query, embedding in computed.items():
+            query_embedding_cache.set((model_id, query), embedding)
+        embeddings = [
+            computed[query] if embedding is None else embedding
+            for query, embedding in zip(queries, embeddings)
+        ]
+    return embeddings
@@ -0,0 +1,93 @@
+"""Rerankers that rescore retrieved chunks against the query text."""
+
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional, Protocol, Sequence
+
+import numpy as np
+
+from src.config import settings
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class Reranker(Protocol):
+    """Interface implemented by all rerankers."""
+    model_id: str
+
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        """Score each text's relevance to the query; higher is more relevant."""
+        ...
+
+
+class CrossEncoderReranker:
+    """Reranker backed by a local sentence-transformers cross-encoder, run on CPU."""
+
+    def __init__(self, model_name: str):
+        # Imported lazily, like the sentence-transformers embedder
+        from sentence_transformers import CrossEncoder
+
+        self.model_id = model_name
+        self._model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        scores = self._model.predict([(query, text) for text in texts], convert_to_numpy=True)
+        return np.asarray(scores, dtype=np.float32)
+
+
+class TermOverlapReranker:
+    """
+    Deterministic reranker scoring the fraction of query terms found in each text.
+
+    It has no model weights, which makes it suitable for tests and local development.
+    """
+
+    model_id = "term-overlap"
+
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        query_terms = set(_TOKEN_PATTERN.findall(query.lower()))
+        if not query_terms:
+            return np.zeros(len(texts), dtype=np.float32)
+        return np.array(
+            [len(query_terms & set(_TOKEN_PATTERN.findall(text.lower()))) / len(query_terms) for text in texts],
+            dtype=np.float32,
+        )
+
+
+class RerankExecutor:
+    """
+    Runs reranker scoring on a few dedicated threads.
+
+    Scoring that missed its time budget cannot be interrupted and keeps its
+    thread until it finishes, so work is refused rather than queued when all
+    threads are busy. Reranking therefore never takes threads from the shared
+    threadpool, and never waits behind abandoned reranks.
+    """
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rerank")
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def submit(self, fn: Callable[..., np.ndarray], *args) -> Optional[Future]:
+        """Start fn on a free thread, or return None if all threads are busy."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+@lru_cache
+def get_rerank_executor() -> RerankExecutor:
+    """Get the process-wide rerank executor configured in settings."""
+    return RerankExecutor(settings.RERANK_WORKERS)
+
+
+@lru_cache
+def get_reranker() -> Reranker:
+    """Get the process-wide reranker configured in settings."""
+    if settings.RERANKER_PROVIDER == "term-overlap":
+        return TermOverlapReranker()
+    return CrossEncoderReranker(settings.RERANKER_MODEL)
@@ -1,15 +1,34 @@
 """Chunks router for content chunk and vector operations."""
 
 from fastapi import APIRouter, Depends, Path, status
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from uuid import UUID
 from pydantic import UUID4
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dependencies import get_db
 from src.urls.dependencies import get_url_or_404
 from src.chunks import service
-from src.chunks.schemas import ChunkResponse, ChunkQueryRequest, ChunkQueryResponse
-from src.chunks.dependencies import validate_include_vectors
+from src.chunks.constants import StreamFormat
+from src.chunks.schemas import (
+    ChunkBatchQueryRequest,
+    ChunkBatchQueryResponse,
+    ChunkResponse,
+    ChunkQueryRequest,
+    ChunkQueryResponse,
+    ProjectBatchSearchRequest,
+    ProjectBatchSearchResponse,
+    ProjectSearchRequest,
+    ProjectSearchResponse,
+)
+from src.chunks.dependencies import (
+    get_batch_searchable_project_ids,
+    get_searchable_project_ids,
+    get_stream_format,
+    validate_include_vectors,
+    validate_streamable,
+)
 
 router = APIRouter()
 
@@ -54,19 +73,184 @@ async def query_content_chunks(
     url = Depends(get_url_or_404),
     project_id: UUID4 = Path(..., description="The ID of the project"),
     url_id: UUID4 = Path(..., description="The ID of the URL"),
+    stream_format: Optional[StreamFormat] = Depends(get_stream_format),
     session: AsyncSession = Depends(get_db),
 ) -> ChunkQueryResponse:
     """
     Perform a semantic similarity query on the content chunks of a specific URL.
     
     Returns the most relevant chunks based on semantic similarity to the query text.
-    Note: This is currently a placeholder implementation.
+    Set ef_search (and oversampling, when binary quantization is enabled) to
+    trade recall against latency for this request. In hybrid mode the results
+    also match exact terms and report each side's rank. Set mmr_lambda to
+    diversify near-duplicate results, and rerank to rescore the candidates
+    with the reranker model within a time budget. Set context_window to also
+    return the chunks surrounding each hit, or token_budget to pack the best
+    results into a single text. Set min_score to drop weak matches, and pass
+    next_cursor back as cursor to fetch the next page of a vector search.
+    Set filters to only search chunks from certain hosts, URL statuses or
+    crawl dates.
+    
+    With an Accept header of application/x-ndjson or text/event-stream, the
+    results of a vector search are streamed as they are read instead.
     """
+    if stream_format is not None:
+        validate_streamable(query_data)
+        events = await service.stream_query_chunks(
+            session=session,
+            url_id=url_id,
+            project_id=project_id,
+            query=query_data.query,
+            stream_format=stream_format,
+            top_k=query_data.top_k,
+            ef_search=query_data.ef_search,
+            oversampling=query_data.oversampling,
+            min_score=query_data.min_score,
+            cursor=query_data.cursor,
+            filters=query_data.filters
+        )
+        return StreamingResponse(events, media_type=stream_format.value)
+    
     result = await service.query_chunks(
         session=session,
         url_id=url_id,
         project_id=project_id,
         query=query_data.query,
-        top_k=query_data.top_k
+        top_k=query_data.top_k,
+        ef_search=query_data.ef_search,
+        oversampling=query_data.oversampling,
+        mode=query_data.mode,
+        mmr_lambda=query_data.mmr_lambda,
+        mmr_fetch_multiplier=query_data.mmr_fetch_multiplier,
+        rerank=query_data.rerank,
+        rerank_timeout_ms=query_data.rerank_timeout_ms,
+        context_window=query_data.context_window,
+        token_budget=query_data.token_budget,
+        min_score=query_data.min_score,
+        cursor=query_data.cursor,
+        filters=query_data.filters
+    )
+    return result
+
+
+@router.post(
+    ":search",
+    response_model=ProjectSearchResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Search content across projects",
+    description="Perform a semantic similarity search across all content chunks of one or more projects."
+)
+async def search_projects(
+    search_data: ProjectSearchRequest,
+    project_ids: List[UUID] = Depends(get_searchable_project_ids),
+    stream_format: Optional[StreamFormat] = Depends(get_stream_format),
+    session: AsyncSession = Depends(get_db),
+) -> ProjectSearchResponse:
+    """
+    Perform a semantic similarity search across one or more projects.
+    
+    The caller must own or have been shared every requested project. All
+    projects are searched in a single query and the merged top-k results
+    are returned, each with the URL it was extracted from. Set token_budget
+    to pack the best results into a single text with source spans instead.
+    Results can be filtered with min_score and metadata filters and paged
+    with next_cursor, and
+    vector search results can be streamed like those of a URL query.
+    """
+    if stream_format is not None:
+        validate_streamable(search_data)
+        events = await service.stream_search_projects(
+            session=session,
+            project_ids=project_ids,
+            query=search_data.query,
+            stream_format=stream_format,
+            top_k=search_data.top_k,
+            ef_search=search_data.ef_search,
+            oversampling=search_data.oversampling,
+            min_score=search_data.min_score,
+            cursor=search_data.cursor,
+            filters=search_data.filters
+        )
+        return StreamingResponse(events, media_type=stream_format.value)
+    
+    result = await service.search_projects(
+        session=session,
+        project_ids=project_ids,
+        query=search_data.query,
+        top_k=search_data.top_k,
+        ef_search=search_data.ef_search,
+        oversampling=search_data.oversampling,
+        mode=search_data.mode,
+        mmr_lambda=search_data.mmr_lambda,
+        mmr_fetch_multiplier=search_data.mmr_fetch_multiplier,
+        rerank=search_data.rerank,
+        rerank_timeout_ms=search_data.rerank_timeout_ms,
+        context_window=search_data.context_window,
+        token_budget=search_data.token_budget,
+        min_score=search_data.min_score,
+        cursor=search_data.cursor,
+        filters=search_data.filters
+    )
+    return result
+
+
+@router.post(
+    "/{project_id}/urls/{url_id}/chunks:batchQuery",
+    response_model=ChunkBatchQueryResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Batch query content chunks",
+    description="Perform several semantic similarity queries on the content chunks of a specific URL."
+)
+async def batch_query_content_chunks(
+    query_data: ChunkBatchQueryRequest,
+    url = Depends(get_url_or_404),
+    project_id: UUID4 = Path(..., description="The ID of the project"),
+    url_id: UUID4 = Path(..., description="The ID of the URL"),
+    session: AsyncSession = Depends(get_db),
+) -> ChunkBatchQueryResponse:
+    """
+    Perform several semantic similarity queries on the content chunks of a specific URL.
+    
+    The queries are embedded together and answered in one database round trip.
+    Results are returned in request order.
+    """
+    result = await service.batch_query_chunks(
+        session=session,
+        url_id=url_id,
+        project_id=project_id,
+        queries=query_data.queries,
+        top_k=query_data.top_k,
+        ef_search=query_data.ef_search,
+        oversampling=query_data.oversampling
+    )
+    return result
+
+
+@router.post(
+    ":batchSearch",
+    response_model=ProjectBatchSearchResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Batch search content across projects",
+    description="Perform several semantic similarity searches across all content chunks of one or more projects."
+)
+async def batch_search_projects(
+    search_data: ProjectBatchSearchRequest,
+    project_ids: List[UUID] = Depends(get_batch_searchable_project_ids),
+    session: AsyncSession = Depends(get_db),
+) -> ProjectBatchSearchResponse:
+    """
+    Perform several semantic similarity searches across one or more projects.
+    
+    The caller must own or have been shared every requested project. The
+    queries are embedded together and answered in one database round trip.
+    Results are returned in request order.
+    """
+    result = await service.batch_search_projects(
+        session=session,
+        project_ids=project_ids,
+        queries=search_data.queries,
+        top_k=search_data.top_k,
+        ef_search=search_data.ef_search,
+        oversampling=search_data.oversampling
     )
     return result
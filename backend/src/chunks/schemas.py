@@ -1,10 +1,16 @@
 """Chunk-related Pydantic schemas for request/response validation."""
 
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional
+from pydantic import BaseModel, Field, StringConstraints
 from uuid import UUID
 from datetime import datetime
 
+from src.chunks.constants import SearchMode
+from src.urls.constants import URLStatus
+
+# Host names are matched exactly and case-insensitively
+Host = Annotated[str, StringConstraints(strip_whitespace=True, to_lower=True, min_length=1, max_length=255)]
+
 
 class ChunkResponse(BaseModel):
     """Response model for chunk data."""
@@ -17,21 +23,207 @@ class ChunkResponse(BaseModel):
     embedding: Optional[List[float]] = Field(default=None, description="Vector embedding (only included if requested)")
 
 
+class SearchFilters(BaseModel):
+    """Metadata filters applied before the vector search ranks chunks."""
+    hosts: Optional[List[Host]] = Field(
+        default=None,
+        min_length=1,
+        max_length=50,
+        description="Only search chunks of URLs on these hosts, e.g. 'docs.example.com'",
+    )
+    url_statuses: Optional[List[URLStatus]] = Field(
+        default=None,
+        min_length=1,
+        description="Only search chunks of URLs currently in one of these statuses, e.g. 'stored'",
+    )
+    crawled_after: Optional[datetime] = Field(default=None, description="Only search chunks crawled at or after this time")
+    crawled_before: Optional[datetime] = Field(default=None, description="Only search chunks crawled before this time")
+
+
 class ChunkQueryRequest(BaseModel):
     """Request model for querying chunks."""
     query: str = Field(..., min_length=1, max_length=1000, description="The query text for semantic similarity search")
     top_k: int = Field(default=5, ge=1, le=50, description="Number of top results to return")
+    ef_search: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=1000,
+        description="HNSW candidate list size for this query; higher values improve recall at the cost of latency",
+    )
+    oversampling: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=40,
+        description="Candidates fetched per result by the binary-quantized first pass, when enabled",
+    )
+    mode: SearchMode = Field(
+        default=SearchMode.VECTOR,
+        description="'vector' for semantic search, 'hybrid' to fuse it with full-text search using reciprocal rank fusion",
+    )
+    mmr_lambda: Optional[float] = Field(
+        default=None,
+        ge=0.0,
+        le=1.0,
+        description="Enable maximal marginal relevance diversification; 1 ranks by relevance only, 0 by diversity only",
+    )
+    mmr_fetch_multiplier: int = Field(
+        default=4,
+        ge=1,
+        le=10,
+        description="Candidates fetched per result for MMR diversification",
+    )
+    rerank: bool = Field(
+        default=False,
+        description="Rescore the retrieved candidates with the reranker model",
+    )
+    rerank_timeout_ms: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=5000,
+        description="Time budget for reranking; the retrieval order is returned when it is exceeded",
+    )
+    context_window: int = Field(
+        default=0,
+        ge=0,
+        le=5,
+        description="Number of neighboring chunks on each side of every hit to return as context",
+    )
+    token_budget: Optional[int] = Field(
+        default=None,
+        ge=16,
+        le=32000,
+        description="Pack the best results into a single text of at most this many tokens instead of returning them individually",
+    )
+    min_score: Optional[float] = Field(
+        default=None,
+        ge=-1.0,
+        le=1.0,
+        description="Only return results with at least this similarity score",
+    )
+    cursor: Optional[str] = Field(
+        default=None,
+        max_length=512,
+        description="next_cursor of the previous page, to continue a vector search after its last result",
+    )
+    filters: Optional[SearchFilters] = Field(
+        default=None,
+        description="Restrict the search to chunks whose URL matches these metadata filters",
+    )
 
 
 class ChunkQueryResult(BaseModel):
     """Single result from a chunk query."""
     chunk_id: UUID
     content: str
-    similarity_score: float = Field(..., description="Similarity score between 0 and 1")
+    similarity_score: float = Field(..., description="Cosine similarity to the query (1 - cosine distance)")
     chunk_index: int
     created_at: datetime
+    rrf_score: Optional[float] = Field(default=None, description="Fused reciprocal rank score (hybrid mode only)")
+    vector_rank: Optional[int] = Field(default=None, description="1-based rank in the vector results (hybrid mode only)")
+    lexical_rank: Optional[int] = Field(default=None, description="1-based rank in the full-text results (hybrid mode only)")
+    lexical_score: Optional[float] = Field(default=None, description="Full-text relevance from ts_rank_cd (hybrid mode only)")
+    rerank_score: Optional[float] = Field(default=None, description="Reranker relevance (only if reranking completed in time)")
+    context_index: Optional[int] = Field(default=None, description="Index of the context window containing this result (context_window > 0 only)")
+
+
+class ChunkContextWindow(BaseModel):
+    """Consecutive chunks of a URL surrounding one or more results."""
+    url_id: UUID
+    start_chunk_index: int
+    end_chunk_index: int
+    content: str = Field(..., description="Content of the chunks in the window, in document order")
+    hit_chunk_ids: List[UUID] = Field(..., description="Results contained in the window")
+
+
+class PackedSource(BaseModel):
+    """Span of packed text taken from consecutive chunks of one URL."""
+    url_id: UUID
+    url: str
+    start_chunk_index: int
+    end_chunk_index: int
+    chunk_ids: List[UUID]
+    start: int = Field(..., description="Offset of the span's first character in the packed text")
+    end: int = Field(..., description="Offset just past the span's last character in the packed text")
+
+
+class PackedContext(BaseModel):
+    """Best results packed into a token budget, for use as LLM context."""
+    text: str
+    token_count: int = Field(..., description="Estimated number of tokens in text")
+    sources: List[PackedSource]
 
 
 class ChunkQueryResponse(BaseModel):
     """Response model for chunk query results."""
     results: List[ChunkQueryResult]
+    contexts: Optional[List[ChunkContextWindow]] = Field(default=None, description="Merged context windows (context_window > 0 only)")
+    packed: Optional[PackedContext] = Field(default=None, description="Packed results; results is empty when set (token_budget only)")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor for the next page, if there may be more results")
+
+
+class ProjectSearchRequest(ChunkQueryRequest):
+    """Request model for searching chunks across one or more projects."""
+    project_ids: List[UUID] = Field(
+        ...,
+        min_length=1,
+        max_length=20,
+        description="IDs of the projects to search; the caller must own or have been shared each project",
+    )
+
+
+class ProjectSearchResult(ChunkQueryResult):
+    """Single result from a project search."""
+    url_id: UUID
+    project_id: UUID
+    url: str = Field(..., description="Original URL the chunk was extracted from")
+
+
+class ProjectSearchResponse(BaseModel):
+    """Response model for project search results."""
+    results: List[ProjectSearchResult]
+    contexts: Optional[List[ChunkContextWindow]] = Field(default=None, description="Merged context windows (context_window > 0 only)")
+    packed: Optional[PackedContext] = Field(default=None, description="Packed results; results is empty when set (token_budget only)")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor for the next page, if there may be more results")
+
+
+class ChunkBatchQueryRequest(BaseModel):
+    """Request model for running several chunk queries at once."""
+    queries: List[Annotated[str, StringConstraints(min_length=1, max_length=1000)]] = Field(
+        ...,
+        min_length=1,
+        max_length=20,
+        description="The query texts; each is answered independently",
+    )
+    top_k: int = Field(default=5, ge=1, le=50, description="Number of top results to return per query")
+    ef_search: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=1000,
+        description="HNSW candidate list size for these queries; higher values improve recall at the cost of latency",
+    )
+    oversampling: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=40,
+        description="Candidates fetched per result by the binary-quantized first pass, when enabled",
+    )
+
+
+class ChunkBatchQueryResponse(BaseModel):
+    """Response model for batched chunk queries, one response per query in request order."""
+    results: List[ChunkQueryResponse]
+
+
+class ProjectBatchSearchRequest(ChunkBatchQueryRequest):
+    """Request model for running several searches across one or more projects at once."""
+    project_ids: List[UUID] = Field(
+        ...,
+        min_length=1,
+        max_length=20,
+        description="IDs of the projects to search; the caller must own or have been shared each project",
+    )
+
+
+class ProjectBatchSearchResponse(BaseModel):
+    """Response model for batched project searches, one response per query in request order."""
+    results: List[ProjectSearchResponse]
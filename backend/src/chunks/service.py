@@ -1,13 +1,88 @@
 """Chunk service layer for business logic."""
 
-from typing import List, Optional
+import asyncio
+import base64
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
 from uuid import UUID
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Text, and_, cast, column, delete, func, literal, literal_column, or_, select, true, update
+from sqlalchemy.dialects.postgresql import ARRAY, REGCONFIG, TSVECTOR
+from pgvector.sqlalchemy import BIT
+
+from src.cache import TTLCache
+from src.config import settings
+from src.models import Chunk, IndexChange, Project, URL
+from src.chunks.backends import PageCursor, SearchScope, VectorSearchBackend, get_vector_backend
+from src.chunks.embeddings import (
+    embed_queries,
+    embed_query,
+    embedding_array,
+    embedding_model_id,
+    normalize_embeddings,
+    normalize_query,
+)
+from src.chunks.schemas import (
+    ChunkBatchQueryResponse,
+    ChunkContextWindow,
+    ChunkResponse,
+    ChunkQueryResponse,
+    ChunkQueryResult,
+    PackedContext,
+    PackedSource,
+    ProjectBatchSearchResponse,
+    SearchFilters,
+    ProjectSearchResponse,
+    ProjectSearchResult,
+)
+from src.chunks.constants import SearchMode, StreamFormat
+from src.chunks.exceptions import ChunkNotFoundException, InvalidQueryException
+from src.chunks.rerankers import get_rerank_executor, get_reranker
+from src.chunks.utils import (
+    count_tokens,
+    join_chunks,
+    maximal_marginal_relevance,
+    merge_windows,
+    pack_by_budget,
+    reciprocal_rank_fusion,
+)
+
+# Columns returned by similarity searches; embeddings are deliberately excluded
+_RESULT_COLUMNS = (
+    Chunk.chunk_id,
+    Chunk.url_id,
+    Chunk.project_id,
+    Chunk.content,
+    Chunk.chunk_index,
+    Chunk.created_at,
+    URL.original_url,
+)
+
+def _result_columns(with_embeddings: bool) -> tuple:
+    """Columns returned by similarity searches, optionally with the chunk embeddings."""
+    return _RESULT_COLUMNS + (Chunk.embedding,) if with_embeddings else _RESULT_COLUMNS
+
 
-from src.models import Chunk
-from src.chunks.schemas import ChunkResponse, ChunkQueryResponse, ChunkQueryResult
-from src.chunks.exceptions import ChunkNotFoundException
+# Per-result ranking details reported by hybrid searches and reranking
+_RANKING_FIELDS = ("rrf_score", "vector_rank", "lexical_rank", "lexical_score", "rerank_score")
+
+# Generated by the alembic migrations on PostgreSQL only, so it is not mapped on Chunk
+_CONTENT_TSV = literal_column("chunks.content_tsv", TSVECTOR)
+
+# Search responses keyed by search parameters and the index generation of the
+# searched projects, so that chunk writes make stale entries unreachable
+search_result_cache: TTLCache = TTLCache(
+    maxsize=settings.SEARCH_RESULT_CACHE_SIZE,
+    ttl=settings.SEARCH_RESULT_CACHE_TTL_SECONDS,
+)
 
 
 async def get_chunks_by_url(
@@ -47,19 +122,141 @@ async def get_chunks_by_url(
             content=chunk.content,
             chunk_index=chunk.chunk_index,
             created_at=chunk.created_at,
-            embedding=chunk.embedding if include_vectors else None
+            embedding=embedding_array(chunk.embedding).tolist() if include_vectors else None
         )
         chunk_responses.append(chunk_response)
     
     return chunk_responses
 
 
+async def replace_url_chunks(
+    session: AsyncSession,
+    url_id: UUID,
+    project_id: UUID,
+    contents: Sequence[str],
+    embeddings: np.ndarray
+) -> int:
+    """
+    Replace all chunks of a URL with newly extracted and embedded content.
+    
+    Embeddings are L2-normalized before they are written when searching by
+    inner product, whatever produced them. The URL's host and the crawl time
+    are copied onto every chunk for metadata filters. The project's index
+    generation is bumped in the same transaction, invalidating cached search
+    results, and the committed chunks are applied to the in-process vector backend.
+    
+    Args:
+        session: Database session
+        url_id: ID of the URL
+        project_id: ID of the project the URL belongs to
+        contents: Chunk texts in document order
+        embeddings: One embedding per chunk
+        
+    Returns:
+        Number of chunks stored
+    """
+    if settings.VECTOR_SEARCH_METRIC == "inner_product":
+        embeddings = normalize_embeddings(embeddings)
+    
+    await session.execute(
+        delete(Chunk).where(Chunk.url_id == url_id, Chunk.project_id == project_id)
+    )
+    
+    original_url = await session.scalar(select(URL.original_url).where(URL.url_id == url_id))
+    host = urlsplit(original_url).hostname if original_url else None
+    now = datetime.now()
+    chunks = [
+        Chunk(
+            url_id=url_id,
+            project_id=project_id,
+            content=content,
+            chunk_index=chunk_index,
+            embedding=embedding.tolist(),
+            created_at=now,
+            host=host,
+            crawled_at=now
+        )
+        for chunk_index, (content, embedding) in enumerate(zip(contents, embeddings, strict=True))
+    ]
+    session.add_all(chunks)
+    generation = await bump_index_generation(session, project_id, url_id)
+    await session.commit()
+    
+    await apply_index_change(
+        session,
+        project_id,
+        generation,
+        lambda backend: backend.replace_url(
+            project_id, url_id, generation, [chunk.chunk_id for chunk in chunks], np.asarray(embeddings)
+        ),
+    )
+    return len(contents)
+
+
+async def bump_index_generation(session: AsyncSession, project_id: UUID, url_id: UUID) -> int:
+    """
+    Mark the chunks of a URL as changed.
+    
+    Must be called in the transaction that inserts, deletes or re-embeds the
+    URL's chunks; the caller commits. Unless pgvector serves the searches,
+    the change is logged in index_changes, from which in-process vector
+    indexes catch up.
+    
+    Returns:
+        The project's new index generation
+    """
+    generation = await session.scalar(
+        update(Project)
+        .where(Project.project_id == project_id)
+        .values(index_generation=Project.index_generation + 1)
+        .returning(Project.index_generation)
+    )
+    if not _uses_pgvector(session):
+        session.add(IndexChange(project_id=project_id, generation=generation, url_id=url_id))
+    return generation
+
+
+async def apply_index_change(
+    session: AsyncSession, project_id: UUID, generation: int, apply: Callable[[VectorSearchBackend], None]
+) -> None:
+    """
+    Apply a committed chunk change to the in-process vector backend.
+    
+    The backend may copy or snapshot its index, so it is updated in a worker
+    thread rather than on the event loop. index_changes rows older than
+    VECTOR_INDEX_CHANGE_LOG_RETENTION generations, or than the backend's own
+    horizon if that is later, are then deleted.
+    """
+    backend = get_vector_backend()
+    await run_in_threadpool(apply, backend)
+    horizon = generation - settings.VECTOR_INDEX_CHANGE_LOG_RETENTION
+    backend_horizon = await run_in_threadpool(backend.change_log_horizon, project_id)
+    if backend_horizon is not None:
+        horizon = max(horizon, backend_horizon)
+    await session.execute(
+        delete(IndexChange).where(IndexChange.project_id == project_id, IndexChange.generation <= horizon)
+    )
+    await session.commit()
+
+
 async def query_chunks(
     session: AsyncSession,
     url_id: UUID,
     project_id: UUID,
     query: str,
-    top_k: int = 5
+    top_k: int = 5,
+    ef_search: Optional[int] = None,
+    oversampling: Optional[int] = None,
+    mode: SearchMode = SearchMode.VECTOR,
+    mmr_lambda: Optional[float] = None,
+    mmr_fetch_multiplier: int = 4,
+    rerank: bool = False,
+    rerank_timeout_ms: Optional[int] = None,
+    context_window: int = 0,
+    token_budget: Optional[int] = None,
+    min_score: Optional[float] = None,
+    cursor: Optional[str] = None,
+    filters: Optional[SearchFilters] = None
 ) -> ChunkQueryResponse:
     """
     Perform semantic similarity search on chunks for a specific URL.
@@ -70,40 +267,1113 @@ async def query_chunks(
         project_id: ID of the project (for access control)
         query: The query text for similarity search
         top_k: Number of top results to return
+        ef_search: HNSW candidate list size for this request (defaults to settings)
+        oversampling: Binary-quantized candidates fetched per result (defaults to settings)
+        mode: Vector search, or hybrid vector and full-text search fused with RRF
+        mmr_lambda: Diversify the results with MMR using this lambda (disabled if None)
+        mmr_fetch_multiplier: Candidates fetched per result for MMR
+        rerank: Rescore the candidates with the reranker
+        rerank_timeout_ms: Reranking time budget (defaults to settings)
+        context_window: Neighboring chunks on each side of every hit to return as context
+        token_budget: Pack the best results, as many as fit, into one text of at most this many tokens
+        min_score: Drop results with a lower similarity score
+        cursor: next_cursor of the previous page (plain vector search only)
+        filters: Only search chunks whose URL matches these metadata filters
         
     Returns:
         Query response with similarity results
     """
-    # PLACEHOLDER: This is a complex implementation that would involve:
-    # 1. Converting the query text to a vector embedding using the same model
-    # 2. Performing vector similarity search using pgvector's capabilities
-    # 3. Returning results sorted by similarity score
+    scope = _search_scope([project_id], url_id, filters)
+    pageable = _is_pageable(mode, mmr_lambda, rerank, token_budget)
+    fingerprint = _cursor_fingerprint("url", [url_id], query, scope.filters())
+    after = _decode_cursor(cursor, fingerprint, pageable) if cursor else None
+    cache_key = None
+    if _is_cacheable(scope):
+        cache_key = await _search_cache_key(
+            session, [project_id], "url", url_id, query, top_k, ef_search, oversampling, mode,
+            mmr_lambda, mmr_fetch_multiplier, rerank, context_window, token_budget, min_score, cursor, scope.filters()
+        )
+        cached = search_result_cache.get(cache_key)
+        if cached is not None:
+            return cached
     
-    # For now, return a placeholder response
-    # TODO: Implement actual vector similarity search
+    rows, complete = await _ranked_chunks(
+        session,
+        query,
+        scope=scope,
+        top_k=top_k,
+        ef_search=ef_search,
+        oversampling=oversampling,
+        mode=mode,
+        mmr_lambda=mmr_lambda,
+        mmr_fetch_multiplier=mmr_fetch_multiplier,
+        rerank=rerank,
+        rerank_timeout_ms=rerank_timeout_ms,
+        min_score=min_score,
+        after=after,
+        token_budget=token_budget,
+    )
     
-    # Query existing chunks to return as placeholder
-    stmt = select(Chunk).where(
-        Chunk.url_id == url_id,
-        Chunk.project_id == project_id
-    ).order_by(Chunk.chunk_index).limit(top_k)
+    if token_budget is not None:
+        response = ChunkQueryResponse(results=[], packed=_pack_results(rows, token_budget))
+    else:
+        response = ChunkQueryResponse(results=[_chunk_query_result(row) for row in rows])
+    if context_window and token_budget is None:
+        response.contexts = await _attach_context_windows(session, rows, response.results, context_window)
+    if pageable and len(rows) == top_k:
+        response.next_cursor = _encode_cursor(rows[-1], fingerprint)
+    if complete and cache_key is not None:
+        search_result_cache.set(cache_key, response)
+    return response
+
+
+async def search_projects(
+    session: AsyncSession,
+    project_ids: List[UUID],
+    query: str,
+    top_k: int = 5,
+    ef_search: Optional[int] = None,
+    oversampling: Optional[int] = None,
+    mode: SearchMode = SearchMode.VECTOR,
+    mmr_lambda: Optional[float] = None,
+    mmr_fetch_multiplier: int = 4,
+    rerank: bool = False,
+    rerank_timeout_ms: Optional[int] = None,
+    context_window: int = 0,
+    token_budget: Optional[int] = None,
+    min_score: Optional[float] = None,
+    cursor: Optional[str] = None,
+    filters: Optional[SearchFilters] = None
+) -> ProjectSearchResponse:
+    """
+    Perform semantic similarity search across all chunks of one or more projects.
     
-    result = await session.execute(stmt)
-    chunks = result.scalars().all()
+    The projects are searched with a single filtered ANN query, so the results
+    are already merged and ranked across projects. Access to the projects must
+    be verified by the caller.
     
-    # Create placeholder results with dummy similarity scores
-    query_results = []
-    for i, chunk in enumerate(chunks):
-        # Placeholder similarity score (decreasing from 1.0)
-        similarity_score = 1.0 - (i * 0.1)
+    Args:
+        session: Database session
+        project_ids: IDs of the projects to search
+        query: The query text for similarity search
+        top_k: Number of top results to return
+        ef_search: HNSW candidate list size for this request (defaults to settings)
+        oversampling: Binary-quantized candidates fetched per result (defaults to settings)
+        mode: Vector search, or hybrid vector and full-text search fused with RRF
+        mmr_lambda: Diversify the results with MMR using this lambda (disabled if None)
+        mmr_fetch_multiplier: Candidates fetched per result for MMR
+        rerank: Rescore the candidates with the reranker
+        rerank_timeout_ms: Reranking time budget (defaults to settings)
+        context_window: Neighboring chunks on each side of every hit to return as context
+        token_budget: Pack the best results, as many as fit, into one text of at most this many tokens
+        min_score: Drop results with a lower similarity score
+        cursor: next_cursor of the previous page (plain vector search only)
+        filters: Only search chunks whose URL matches these metadata filters
         
-        query_result = ChunkQueryResult(
-            chunk_id=chunk.chunk_id,
-            content=chunk.content,
-            similarity_score=similarity_score,
-            chunk_index=chunk.chunk_index,
-            created_at=chunk.created_at
+    Returns:
+        Search response with the merged top-k results
+    """
+    scope = _search_scope(project_ids, None, filters)
+    pageable = _is_pageable(mode, mmr_lambda, rerank, token_budget)
+    fingerprint = _cursor_fingerprint("projects", project_ids, query, scope.filters())
+    after = _decode_cursor(cursor, fingerprint, pageable) if cursor else None
+    cache_key = None
+    if _is_cacheable(scope):
+        cache_key = await _search_cache_key(
+            session, project_ids, "projects", None, query, top_k, ef_search, oversampling, mode,
+            mmr_lambda, mmr_fetch_multiplier, rerank, context_window, token_budget, min_score, cursor, scope.filters()
+        )
+        cached = search_result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    rows, complete = await _ranked_chunks(
+        session,
+        query,
+        scope=scope,
+        top_k=top_k,
+        ef_search=ef_search,
+        oversampling=oversampling,
+        mode=mode,
+        mmr_lambda=mmr_lambda,
+        mmr_fetch_multiplier=mmr_fetch_multiplier,
+        rerank=rerank,
+        rerank_timeout_ms=rerank_timeout_ms,
+        min_score=min_score,
+        after=after,
+        token_budget=token_budget,
+    )
+    
+    if token_budget is not None:
+        response = ProjectSearchResponse(results=[], packed=_pack_results(rows, token_budget))
+    else:
+        response = ProjectSearchResponse(results=[_project_search_result(row) for row in rows])
+    if context_window and token_budget is None:
+        response.contexts = await _attach_context_windows(session, rows, response.results, context_window)
+    if pageable and len(rows) == top_k:
+        response.next_cursor = _encode_cursor(rows[-1], fingerprint)
+    if complete and cache_key is not None:
+        search_result_cache.set(cache_key, response)
+    return response
+
+
+async def stream_query_chunks(
+    session: AsyncSession,
+    url_id: UUID,
+    project_id: UUID,
+    query: str,
+    stream_format: StreamFormat,
+    top_k: int = 5,
+    ef_search: Optional[int] = None,
+    oversampling: Optional[int] = None,
+    min_score: Optional[float] = None,
+    cursor: Optional[str] = None,
+    filters: Optional[SearchFilters] = None
+) -> AsyncIterator[str]:
+    """
+    Start a streamed semantic similarity search on chunks for a specific URL.
+    
+    The query is validated and embedded before returning, so errors are still
+    raised as HTTP errors; the returned iterator then yields each result as
+    its row arrives from the database (see _stream_results).
+    
+    Args:
+        session: Database session of the request, used only for its bind
+        url_id: ID of the URL
+        project_id: ID of the project (for access control)
+        query: The query text for similarity search
+        stream_format: NDJSON lines or server-sent events
+        top_k: Number of top results to return
+        ef_search: HNSW candidate list size for this request (defaults to settings)
+        oversampling: Binary-quantized candidates fetched per result (defaults to settings)
+        min_score: Drop results with a lower similarity score
+        cursor: next_cursor of the previous page
+        filters: Only search chunks whose URL matches these metadata filters
+        
+    Returns:
+        Iterator over the encoded events of the response body
+    """
+    scope = _search_scope([project_id], url_id, filters)
+    fingerprint = _cursor_fingerprint("url", [url_id], query, scope.filters())
+    after = _decode_cursor(cursor, fingerprint, True) if cursor else None
+    query_embedding = await embed_query(query)
+    return _stream_results(
+        session, query_embedding, scope, top_k, ef_search, oversampling,
+        min_score, after, fingerprint, _chunk_query_result, stream_format
+    )
+
+
+async def stream_search_projects(
+    session: AsyncSession,
+    project_ids: List[UUID],
+    query: str,
+    stream_format: StreamFormat,
+    top_k: int = 5,
+    ef_search: Optional[int] = None,
+    oversampling: Optional[int] = None,
+    min_score: Optional[float] = None,
+    cursor: Optional[str] = None,
+    filters: Optional[SearchFilters] = None
+) -> AsyncIterator[str]:
+    """
+    Start a streamed semantic similarity search across one or more projects.
+    
+    Access to the projects must be verified by the caller. See
+    stream_query_chunks for the arguments.
+    
+    Returns:
+        Iterator over the encoded events of the response body
+    """
+    scope = _search_scope(project_ids, None, filters)
+    fingerprint = _cursor_fingerprint("projects", project_ids, query, scope.filters())
+    after = _decode_cursor(cursor, fingerprint, True) if cursor else None
+    query_embedding = await embed_query(query)
+    return _stream_results(
+        session, query_embedding, scope, top_k, ef_search, oversampling,
+        min_score, after, fingerprint, _project_search_result, stream_format
+    )
+
+
+async def batch_query_chunks(
+    session: AsyncSession,
+    url_id: UUID,
+    project_id: UUID,
+    queries: List[str],
+    top_k: int = 5,
+    ef_search: Optional[int] = None,
+    oversampling: Optional[int] = None
+) -> ChunkBatchQueryResponse:
+    """
+    Perform several semantic similarity searches on the chunks of a URL at once.
+    
+    All queries are embedded in one model call and answered by one SQL statement.
+    
+    Args:
+        session: Database session
+        url_id: ID of the URL
+        project_id: ID of the project (for access control)
+        queries: The query texts, answered in order
+        top_k: Number of top results to return per query
+        ef_search: HNSW candidate list size for this request (defaults to settings)
+        oversampling: Binary-quantized candidates fetched per result (defaults to settings)
+        
+    Returns:
+        One query response per query, in request order
+    """
+    query_embeddings = await embed_queries(queries)
+    
+    results = await _batch_nearest_chunks(
+        session,
+        query_embeddings,
+        top_k=top_k,
+        ef_search=ef_search,
+        oversampling=oversampling,
+        scope=SearchScope((project_id,), url_id),
+    )
+    
+    return ChunkBatchQueryResponse(results=[
+        ChunkQueryResponse(results=[_chunk_query_result(row) for row in rows])
+        for rows in results
+    ])
+
+
+async def batch_search_projects(
+    session: AsyncSession,
+    project_ids: List[UUID],
+    queries: List[str],
+    top_k: int = 5,
+    ef_search: Optional[int] = None,
+    oversampling: Optional[int] = None
+) -> ProjectBatchSearchResponse:
+    """
+    Perform several semantic similarity searches across one or more projects at once.
+    
+    All queries are embedded in one model call and answered by one SQL statement.
+    Access to the projects must be verified by the caller.
+    
+    Args:
+        session: Database session
+        project_ids: IDs of the projects to search
+        queries: The query texts, answered in order
+        top_k: Number of top results to return per query
+        ef_search: HNSW candidate list size for this request (defaults to settings)
+        oversampling: Binary-quantized candidates fetched per result (defaults to settings)
+        
+    Returns:
+        One search response per query, in request order
+    """
+    query_embeddings = await embed_queries(queries)
+    
+    results = await _batch_nearest_chunks(
+        session,
+        query_embeddings,
+        top_k=top_k,
+        ef_search=ef_search,
+        oversampling=oversampling,
+        scope=SearchScope(tuple(project_ids)),
+    )
+    
+    return ProjectBatchSearchResponse(results=[
+        ProjectSearchResponse(results=[_project_search_result(row) for row in rows])
+        for rows in results
+    ])
+
+
+async def _ranked_chunks(
+    session: AsyncSession,
+    query: str,
+    scope: SearchScope,
+    top_k: int,
+    ef_search: Optional[int],
+    oversampling: Optional[int],
+    mode: SearchMode,
+    mmr_lambda: Optional[float],
+    mmr_fetch_multiplier: int,
+    rerank: bool,
+    rerank_timeout_ms: Optional[int],
+    min_score: Optional[float] = None,
+    after: Optional[PageCursor] = None,
+    token_budget: Optional[int] = None,
+) -> Tuple[list, bool]:
+    """
+    Retrieve candidates, then optionally rerank and diversify them.
+    
+    Candidates below min_score are dropped before reranking, and a vector
+    search continues after the given page cursor. With a token budget,
+    top_k is only the first number of rows retrieved: four times as many are
+    retrieved while the packed rows leave budget unused and more candidates
+    may exist, up to TOKEN_BUDGET_MAX_CANDIDATES rows.
+    
+    Returns:
+        The top_k rows (enough rows to fill the token budget, if given), and
+        whether every requested stage completed (False when reranking ran
+        out of time or was skipped and the retrieval order was kept)
+    """
+    query_embedding = await embed_query(query)
+    max_candidates = max(top_k, settings.TOKEN_BUDGET_MAX_CANDIDATES)
+    while True:
+        rows, complete = await _ranked_candidates(
+            session, query, query_embedding, scope, top_k, ef_search, oversampling, mode,
+            mmr_lambda, mmr_fetch_multiplier, rerank, rerank_timeout_ms, min_score, after,
+        )
+        if token_budget is None:
+            return rows, complete
+        _, used = pack_by_budget([row.content for row in rows], token_budget)
+        if used >= token_budget or len(rows) < top_k or top_k >= max_candidates:
+            return rows, complete
+        top_k = min(top_k * 4, max_candidates)
+
+
+async def _ranked_candidates(
+    session: AsyncSession,
+    query: str,
+    query_embedding: List[float],
+    scope: SearchScope,
+    top_k: int,
+    ef_search: Optional[int],
+    oversampling: Optional[int],
+    mode: SearchMode,
+    mmr_lambda: Optional[float],
+    mmr_fetch_multiplier: int,
+    rerank: bool,
+    rerank_timeout_ms: Optional[int],
+    min_score: Optional[float],
+    after: Optional[PageCursor],
+) -> Tuple[list, bool]:
+    """Retrieve, rerank and diversify the top_k rows of one _ranked_chunks pass."""
+    diversify = mmr_lambda is not None
+    fetch_k = top_k * mmr_fetch_multiplier if diversify else top_k
+    if rerank:
+        fetch_k = max(fetch_k, settings.RERANK_CANDIDATES)
+    rows = await _search_chunks(
+        session,
+        query_embedding,
+        query,
+        mode=mode,
+        top_k=fetch_k,
+        ef_search=ef_search,
+        oversampling=oversampling,
+        scope=scope,
+        with_embeddings=diversify,
+        after=after,
+    )
+    if min_score is not None:
+        rows = [row for row in rows if _similarity(row.distance) >= min_score]
+    
+    complete = True
+    if rerank:
+        rows, complete = await _rerank(rows, query, rerank_timeout_ms)
+    if diversify:
+        rows = _diversify(rows[:top_k * mmr_fetch_multiplier], query_embedding, top_k, mmr_lambda)
+    return rows[:top_k], complete
+
+
+async def _rerank(rows: list, query: str, timeout_ms: Optional[int]) -> Tuple[list, bool]:
+    """
+    Reorder rows by reranker score within a time budget.
+    
+    The model runs on the rerank executor's threads. When they are all busy,
+    or the model misses the budget, the rows are returned in retrieval order;
+    late scoring finishes in the background, holding its thread until then.
+    """
+    if not rows:
+        return rows, True
+    future = get_rerank_executor().submit(_rerank_scores, query, [row.content for row in rows])
+    if future is None:
+        return rows, False
+    timeout = (timeout_ms or settings.RERANK_TIMEOUT_MS) / 1000
+    try:
+        scores = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        return rows, False
+    
+    order = np.argsort(-scores, kind="stable")
+    return [SimpleNamespace(**_row_fields(rows[i]), rerank_score=float(scores[i])) for i in order], True
+
+
+def _rerank_scores(query: str, texts: List[str]) -> np.ndarray:
+    """Score texts with the configured reranker, loading it on first use."""
+    return get_reranker().score(query, texts)
+
+
+def _row_fields(row) -> dict:
+    """Fields of a database row or of a row built by a search stage."""
+    return row._asdict() if hasattr(row, "_asdict") else dict(vars(row))
+
+
+def _diversify(rows: list, query_embedding: List[float], top_k: int, mmr_lambda: float) -> list:
+    """Select top_k of the over-fetched rows with maximal marginal relevance."""
+    if not rows:
+        return rows
+    candidates = np.stack([embedding_array(row.embedding) for row in rows])
+    selected = maximal_marginal_relevance(np.asarray(query_embedding), candidates, top_k, mmr_lambda)
+    return [rows[i] for i in selected]
+
+
+async def _attach_context_windows(
+    session: AsyncSession,
+    rows: list,
+    results: list,
+    window: int,
+) -> List[ChunkContextWindow]:
+    """
+    Load the chunks surrounding every hit and link each result to its window.
+    
+    Overlapping windows of the same URL are merged, without repeating the
+    text that adjacent chunks share, and all windows are read
+    in one range query served by the (url_id, chunk_index) index. Embeddings
+    are not loaded.
+    """
+    merged = merge_windows([((row.project_id, row.url_id), row.chunk_index) for row in rows], window)
+    if not merged:
+        return []
+    
+    ranges = [
+        and_(Chunk.project_id == project_id, Chunk.url_id == url_id, Chunk.chunk_index.between(start, end))
+        for (project_id, url_id), start, end, _ in merged
+    ]
+    result = await session.execute(
+        select(Chunk.url_id, Chunk.chunk_index, Chunk.content)
+        .where(or_(*ranges))
+        .order_by(Chunk.url_id, Chunk.chunk_index)
+    )
+    chunks_by_url = defaultdict(list)
+    for chunk in result.all():
+        chunks_by_url[chunk.url_id].append(chunk)
+    
+    contexts = []
+    for (_, url_id), start, end, positions in merged:
+        chunks = [chunk for chunk in chunks_by_url[url_id] if start <= chunk.chunk_index <= end]
+        if not chunks:
+            # The URL was re-chunked or deleted since the search; its hits
+            # are returned without a window
+            for position in positions:
+                results[position].context_index = None
+            continue
+        context_index = len(contexts)
+        contexts.append(ChunkContextWindow(
+            url_id=url_id,
+            start_chunk_index=chunks[0].chunk_index,
+            end_chunk_index=chunks[-1].chunk_index,
+            content=join_chunks([chunk.content for chunk in chunks], settings.CHUNK_OVERLAP_TOKENS),
+            hit_chunk_ids=[rows[position].chunk_id for position in positions],
+        ))
+        for position in positions:
+            results[position].context_index = context_index
+    return contexts
+
+
+def _pack_results(rows: list, token_budget: int) -> PackedContext:
+    """
+    Pack the best rows into one text within a token budget.
+    
+    Rows are selected greedily in rank order, skipping duplicates and rows
+    that do not fit. Selected chunks that are adjacent in the same URL are
+    merged into one span without repeating their overlap, and spans are
+    ordered by their best ranked chunk. The token count is that of the
+    merged text.
+    """
+    selected, _ = pack_by_budget([row.content for row in rows], token_budget)
+    
+    spans = []
+    for (_, url_id), start, end, positions in merge_windows(
+        [((rows[i].project_id, rows[i].url_id), rows[i].chunk_index) for i in selected], 0
+    ):
+        chunks = sorted((rows[selected[position]] for position in positions), key=lambda row: row.chunk_index)
+        spans.append((min(positions), url_id, start, end, chunks))
+    spans.sort(key=lambda span: span[0])
+    
+    parts, sources, offset = [], [], 0
+    for _, url_id, start, end, chunks in spans:
+        content = join_chunks([chunk.content for chunk in chunks], settings.CHUNK_OVERLAP_TOKENS)
+        if parts:
+            offset += 2
+        sources.append(PackedSource(
+            url_id=url_id,
+            url=chunks[0].original_url,
+            start_chunk_index=start,
+            end_chunk_index=end,
+            chunk_ids=[chunk.chunk_id for chunk in chunks],
+            start=offset,
+            end=offset + len(content),
+        ))
+        parts.append(content)
+        offset += len(content)
+    text = "\n\n".join(parts)
+    return PackedContext(text=text, token_count=count_tokens(text), sources=sources)
+
+
+def _chunk_query_result(row) -> ChunkQueryResult:
+    """Build a URL query result from a search row."""
+    return ChunkQueryResult(
+        chunk_id=row.chunk_id,
+        content=row.content,
+        similarity_score=_similarity(row.distance),
+        chunk_index=row.chunk_index,
+        created_at=row.created_at,
+        **{field: getattr(row, field, None) for field in _RANKING_FIELDS}
+    )
+
+
+def _project_search_result(row) -> ProjectSearchResult:
+    """Build a project search result from a search row."""
+    return ProjectSearchResult(
+        chunk_id=row.chunk_id,
+        url_id=row.url_id,
+        project_id=row.project_id,
+        url=row.original_url,
+        content=row.content,
+        similarity_score=_similarity(row.distance),
+        chunk_index=row.chunk_index,
+        created_at=row.created_at,
+        **{field: getattr(row, field, None) for field in _RANKING_FIELDS}
+    )
+
+
+async def _stream_results(
+    session: AsyncSession,
+    query_embedding: List[float],
+    scope: SearchScope,
+    top_k: int,
+    ef_search: Optional[int],
+    oversampling: Optional[int],
+    min_score: Optional[float],
+    after: Optional[PageCursor],
+    fingerprint: str,
+    build_result: Callable,
+    stream_format: StreamFormat,
+) -> AsyncIterator[str]:
+    """
+    Yield a "result" event per search row, then an "end" event with next_cursor.
+    
+    The body is sent after the request's dependencies have exited, so the
+    search runs in its own session on the same bind. On PostgreSQL the rows
+    are read from a server-side cursor, so only one row is held in memory at
+    a time; the in-process backends return their hits at once. Rows arrive
+    best first, so the stream ends at the first row below min_score.
+    Streamed responses are not cached.
+    """
+    async with AsyncSession(session.bind) as stream_session:
+        if _uses_pgvector(stream_session):
+            stmt = await _nearest_statement(
+                stream_session, query_embedding, top_k, ef_search, scope, oversampling, after=after
+            )
+            rows = await stream_session.stream(stmt)
+        else:
+            [found] = await _backend_nearest_chunks(
+                stream_session, [query_embedding], top_k, scope, ef_search, after=after
+            )
+            rows = _iterate(found)
+        
+        count, last, next_cursor = 0, None, None
+        async for row in rows:
+            if min_score is not None and _similarity(row.distance) < min_score:
+                break
+            count, last = count + 1, row
+            yield _encode_event("result", build_result(row).model_dump(mode="json"), stream_format)
+        if count == top_k:
+            next_cursor = _encode_cursor(last, fingerprint)
+        yield _encode_event("end", {"next_cursor": next_cursor}, stream_format)
+
+
+async def _iterate(rows: list) -> AsyncIterator:
+    """Iterate over rows already in memory like over a streamed result."""
+    for row in rows:
+        yield row
+
+
+def _encode_event(event: str, data: dict, stream_format: StreamFormat) -> str:
+    """Encode one event of a streamed search response."""
+    if stream_format == StreamFormat.SSE:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+
+def _is_pageable(
+    mode: SearchMode,
+    mmr_lambda: Optional[float],
+    rerank: bool,
+    token_budget: Optional[int],
+) -> bool:
+    """Check whether results are ordered by distance alone, so they can be paged with a cursor."""
+    return mode == SearchMode.VECTOR and mmr_lambda is None and not rerank and token_budget is None
+
+
+def _search_scope(project_ids: Sequence[UUID], url_id: Optional[UUID], filters: Optional[SearchFilters]) -> SearchScope:
+    """Scope of a search of some projects or of one URL, narrowed by the request's filters."""
+    if filters is None:
+        return SearchScope(tuple(project_ids), url_id)
+    return SearchScope(
+        tuple(project_ids),
+        url_id,
+        hosts=tuple(sorted(set(filters.hosts or ()))),
+        url_statuses=tuple(sorted({status.value for status in filters.url_statuses or ()})),
+        crawled_after=filters.crawled_after,
+        crawled_before=filters.crawled_before,
+    )
+
+
+def _cursor_fingerprint(scope: str, scope_ids: Sequence[UUID], query: str, filters: tuple = ()) -> str:
+    """Identify the search a cursor belongs to, so it cannot resume another one."""
+    key = "|".join([scope, *sorted(str(scope_id) for scope_id in scope_ids), normalize_query(query), repr(filters)])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _encode_cursor(row, fingerprint: str) -> str:
+    """Opaque cursor pointing after a result row."""
+    payload = json.dumps({"d": float(row.distance), "c": str(row.chunk_id), "f": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, fingerprint: str, pageable: bool) -> PageCursor:
+    """Decode a cursor of the same search into its (distance, chunk ID)."""
+    if not pageable:
+        raise InvalidQueryException("cursor can only be used with vector searches without mmr_lambda, rerank or token_budget")
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["f"] != fingerprint:
+            raise ValueError("cursor belongs to another search")
+        return float(payload["d"]), UUID(payload["c"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidQueryException("Invalid cursor") from e
+
+
+def _is_cacheable(scope: SearchScope) -> bool:
+    """
+    Check whether a search's results may be cached.
+    
+    Cached results are invalidated by index generation bumps, which chunk
+    writes make but URL status changes do not, so searches filtered by URL
+    status are never cached.
+    """
+    return not scope.url_statuses
+
+
+async def _search_cache_key(
+    session: AsyncSession,
+    project_ids: List[UUID],
+    scope: str,
+    scope_id: Optional[UUID],
+    query: str,
+    *params,
+) -> tuple:
+    """
+    Build the result cache key of a search.
+    
+    The key includes the current index generation of every searched project,
+    read in the search's transaction, so a chunk write in any of them makes
+    older entries unreachable without scanning the cache.
+    """
+    result = await session.execute(
+        select(Project.project_id, Project.index_generation)
+        .where(Project.project_id.in_(project_ids))
+        .order_by(Project.project_id)
+    )
+    generations = tuple(tuple(row) for row in result.all())
+    query_hash = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+    return (scope, scope_id, generations, embedding_model_id(), query_hash, *params)
+
+
+def _supports_pgvector(session: AsyncSession) -> bool:
+    """Check whether the session is bound to PostgreSQL (and thus pgvector)."""
+    return session.bind.dialect.name == "postgresql"
+
+
+def _uses_pgvector(session: AsyncSession) -> bool:
+    """Check whether vector searches run in the database rather than in process."""
+    return settings.VECTOR_SEARCH_BACKEND == "pgvector" and _supports_pgvector(session)
+
+
+def _distance(query_embedding: List[float]):
+    """Distance expression matching the operator class of the embedding index."""
+    if settings.VECTOR_SEARCH_METRIC == "inner_product":
+        # <#> is the negative inner product, i.e. -cosine similarity for unit vectors
+        return Chunk.embedding.max_inner_product(query_embedding)
+    return Chunk.embedding.cosine_distance(query_embedding)
+
+
+def _similarity(distance: float) -> float:
+    """Convert a distance returned by _distance into a cosine similarity."""
+    if settings.VECTOR_SEARCH_METRIC == "inner_product":
+        return -distance
+    return 1.0 - distance
+
+
+async def _search_chunks(
+    session: AsyncSession,
+    query_embedding: List[float],
+    query: str,
+    mode: SearchMode,
+    top_k: int,
+    ef_search: Optional[int],
+    oversampling: Optional[int],
+    scope: SearchScope,
+    with_embeddings: bool = False,
+    after: Optional[PageCursor] = None,
+) -> list:
+    """Run a vector or hybrid search, returning rows ordered best first."""
+    if mode == SearchMode.HYBRID:
+        return await _hybrid_chunks(
+            session, query_embedding, query, top_k, ef_search, oversampling, scope, with_embeddings
+        )
+    return await _nearest_chunks(
+        session,
+        query_embedding,
+        top_k=top_k,
+        ef_search=ef_search,
+        oversampling=oversampling,
+        scope=scope,
+        with_embeddings=with_embeddings,
+        after=after,
+    )
+
+
+async def _hybrid_chunks(
+    session: AsyncSession,
+    query_embedding: List[float],
+    query: str,
+    top_k: int,
+    ef_search: Optional[int],
+    oversampling: Optional[int],
+    scope: SearchScope,
+    with_embeddings: bool = False,
+) -> list:
+    """
+    Fuse vector and full-text search results with reciprocal rank fusion.
+    
+    Both sides fetch HYBRID_SEARCH_CANDIDATES candidates. They run
+    concurrently, the full-text query on its own connection, since a session
+    cannot execute two statements at once. Databases without PostgreSQL full-text
+    search fall back to the vector ranking alone.
+    """
+    candidates = max(top_k, settings.HYBRID_SEARCH_CANDIDATES)
+    vector_search = _nearest_chunks(
+        session,
+        query_embedding,
+        top_k=candidates,
+        ef_search=ef_search,
+        oversampling=oversampling,
+        scope=scope,
+        with_embeddings=with_embeddings,
+    )
+    if _supports_pgvector(session):
+        vector_rows, lexical_rows = await asyncio.gather(
+            vector_search,
+            _lexical_chunks(session.bind, query_embedding, query, candidates, scope.criteria(), with_embeddings),
+        )
+    else:
+        vector_rows, lexical_rows = await vector_search, []
+    
+    vector_ids = [row.chunk_id for row in vector_rows]
+    lexical_ids = [row.chunk_id for row in lexical_rows]
+    scores = reciprocal_rank_fusion([vector_ids, lexical_ids], k=settings.HYBRID_SEARCH_RRF_K)
+    vector_ranks = {chunk_id: rank for rank, chunk_id in enumerate(vector_ids, start=1)}
+    lexical_ranks = {chunk_id: rank for rank, chunk_id in enumerate(lexical_ids, start=1)}
+    lexical_scores = {row.chunk_id: row.lexical_score for row in lexical_rows}
+    rows = {row.chunk_id: row for row in [*lexical_rows, *vector_rows]}
+    
+    ranked = sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)[:top_k]
+    return [
+        SimpleNamespace(
+            **{column.key: getattr(rows[chunk_id], column.key) for column in _result_columns(with_embeddings)},
+            distance=rows[chunk_id].distance,
+            rrf_score=scores[chunk_id],
+            vector_rank=vector_ranks.get(chunk_id),
+            lexical_rank=lexical_ranks.get(chunk_id),
+            lexical_score=lexical_scores.get(chunk_id),
+        )
+        for chunk_id in ranked
+    ]
+
+
+async def _lexical_chunks(
+    bind,
+    query_embedding: List[float],
+    query: str,
+    limit: int,
+    criteria: list,
+    with_embeddings: bool = False,
+) -> list:
+    """Full-text search on its own session, so it can run alongside the vector search."""
+    async with AsyncSession(bind) as session:
+        result = await session.execute(
+            _lexical_statement(query_embedding, query, limit, criteria, with_embeddings)
         )
-        query_results.append(query_result)
+        return list(result.all())
+
+
+def _lexical_statement(
+    query_embedding: List[float],
+    query: str,
+    limit: int,
+    criteria: list,
+    with_embeddings: bool = False,
+):
+    """
+    Rank chunks matching the query terms through the GIN index on content_tsv.
+    
+    ts_rank_cd normalization 1 divides by the log of the document length, the
+    closest built-in analogue of BM25 length normalization. The vector distance
+    is computed for the matches too, so lexical-only results still report a
+    similarity score.
+    """
+    tsquery = func.websearch_to_tsquery(cast(settings.TEXT_SEARCH_CONFIG, REGCONFIG), query)
+    lexical_score = func.ts_rank_cd(_CONTENT_TSV, tsquery, 1).label("lexical_score")
+    return (
+        select(
+            *_result_columns(with_embeddings),
+            _distance(query_embedding).label("distance"),
+            lexical_score,
+        )
+        .join(URL, URL.url_id == Chunk.url_id)
+        .where(*criteria, _CONTENT_TSV.op("@@")(tsquery))
+        .order_by(lexical_score.desc(), Chunk.chunk_id)
+        .limit(limit)
+    )
+
+
+async def _nearest_chunks(
+    session: AsyncSession,
+    query_embedding: List[float],
+    top_k: int,
+    ef_search: Optional[int],
+    scope: SearchScope,
+    oversampling: Optional[int] = None,
+    with_embeddings: bool = False,
+    after: Optional[PageCursor] = None,
+) -> list:
+    """
+    Find the chunks closest to the query embedding.
+    
+    On PostgreSQL the search strategy depends on the size of the filtered scope:
+    
+    - Small scopes (a URL, a small project) are scanned exactly. The HNSW index
+      is disabled for the transaction so the planner filters through the btree
+      indexes and sorts the few matching rows, which gives perfect recall.
+    - Large scopes use an ordered ``embedding <#> :q`` HNSW scan with pgvector
+      iterative scans, which keep walking the graph until enough rows pass the
+      filter instead of returning a starved top-k.
+    - With binary quantization enabled, large scopes instead scan the much
+      smaller Hamming-distance index over ``binary_quantize(embedding)`` for
+      ``top_k * oversampling`` candidates and rerank them by exact distance.
+    
+    Rows are ordered by distance, then chunk ID. With a page cursor, the scan
+    resumes after the cursor's row through a keyset condition instead of
+    re-reading the previous pages.
+    
+    All settings are transaction-local, so each request can trade recall against
+    latency independently. Other databases, or the "numpy" backend setting,
+    search in process memory instead (see _backend_nearest_chunks).
+    """
+    if not _uses_pgvector(session):
+        results = await _backend_nearest_chunks(
+            session, [query_embedding], top_k, scope, ef_search, with_embeddings, after
+        )
+        return results[0]
+    
+    stmt = await _nearest_statement(
+        session, query_embedding, top_k, ef_search, scope, oversampling, with_embeddings, after
+    )
+    result = await session.execute(stmt)
+    return list(result.all())
+
+
+async def _nearest_statement(
+    session: AsyncSession,
+    query_embedding: List[float],
+    top_k: int,
+    ef_search: Optional[int],
+    scope: SearchScope,
+    oversampling: Optional[int] = None,
+    with_embeddings: bool = False,
+    after: Optional[PageCursor] = None,
+):
+    """Configure the transaction and build the pgvector statement of _nearest_chunks."""
+    criteria = scope.criteria()
+    candidate_limit = await _prepare_index_scan(session, top_k, ef_search, oversampling, criteria)
+    candidates = _candidate_statement(
+        query_embedding, top_k, candidate_limit, criteria + _page_criteria(query_embedding, after), with_embeddings
+    ).subquery()
+    # Relaxed iterative scans may return rows slightly out of order, and
+    # quantized candidates still have to be reranked
+    return select(candidates).order_by(candidates.c.distance, candidates.c.chunk_id).limit(top_k)
+
+
+async def _batch_nearest_chunks(
+    session: AsyncSession,
+    query_embeddings: List[List[float]],
+    top_k: int,
+    ef_search: Optional[int],
+    scope: SearchScope,
+    oversampling: Optional[int] = None,
+) -> List[list]:
+    """
+    Find the chunks closest to each of several query embeddings in one statement.
+    
+    The query vectors are sent as a single array, unnested WITH ORDINALITY and
+    joined LATERAL to the same top-k subquery used by _nearest_chunks, so the
+    scan strategy is chosen once for the whole batch.
+    """
+    if not _uses_pgvector(session):
+        return await _backend_nearest_chunks(session, query_embeddings, top_k, scope, ef_search)
+    
+    criteria = scope.criteria()
+    candidate_limit = await _prepare_index_scan(session, top_k, ef_search, oversampling, criteria)
+    embedding_type = Chunk.__table__.c.embedding.type
+    # Bound as text[] and cast, since drivers cannot adapt a list of vectors
+    vectors = cast(
+        literal([_vector_literal(embedding) for embedding in query_embeddings], ARRAY(Text)),
+        ARRAY(embedding_type),
+    )
+    queries = func.unnest(vectors).table_valued(
+        column("embedding", embedding_type), with_ordinality="query_index"
+    ).render_derived(name="queries")
+    
+    candidates = (
+        _candidate_statement(queries.c.embedding, top_k, candidate_limit, criteria)
+        .correlate(queries)
+        .subquery()
+    )
+    nearest = (
+        select(candidates)
+        .order_by(candidates.c.distance, candidates.c.chunk_id)
+        .limit(top_k)
+        .lateral("nearest")
+    )
+    stmt = (
+        select(queries.c.query_index, nearest)
+        .select_from(queries)
+        .join(nearest, true())
+        .order_by(queries.c.query_index, nearest.c.distance, nearest.c.chunk_id)
+    )
+    
+    result = await session.execute(stmt)
+    results: List[list] = [[] for _ in query_embeddings]
+    for row in result.all():
+        # WITH ORDINALITY numbers rows from 1
+        results[row.query_index - 1].append(row)
+    return results
+
+
+async def _prepare_index_scan(
+    session: AsyncSession,
+    top_k: int,
+    ef_search: Optional[int],
+    oversampling: Optional[int],
+    criteria: list,
+) -> Optional[int]:
+    """
+    Choose the scan strategy for the filtered scope and configure the transaction.
+    
+    Returns:
+        Number of binary-quantized candidates to fetch, or None when the
+        candidates are ordered by full-precision distance
+    """
+    if await _is_small_scope(session, criteria):
+        await _set_local_config(session, {"enable_indexscan": "off"})
+        return None
+    
+    candidate_limit = None
+    if settings.VECTOR_SEARCH_BINARY_QUANTIZATION:
+        candidate_limit = top_k * (oversampling or settings.VECTOR_SEARCH_BINARY_OVERSAMPLING)
+    await _set_local_config(session, {
+        # The index can never return more than ef_search rows per scan
+        "hnsw.ef_search": max(ef_search or settings.VECTOR_SEARCH_EF_SEARCH, candidate_limit or top_k),
+        "hnsw.iterative_scan": settings.VECTOR_SEARCH_ITERATIVE_SCAN,
+        "hnsw.max_scan_tuples": settings.VECTOR_SEARCH_MAX_SCAN_TUPLES,
+    })
+    return candidate_limit
+
+
+def _candidate_statement(
+    query,
+    top_k: int,
+    candidate_limit: Optional[int],
+    criteria: list,
+    with_embeddings: bool = False,
+):
+    """Select the candidate chunks of one query, nearest first by index order."""
+    distance = _distance(query).label("distance")
+    candidates = (
+        select(*_result_columns(with_embeddings), distance)
+        .join(URL, URL.url_id == Chunk.url_id)
+        .where(*criteria)
+    )
+    # Ordered by the distance expression alone, so the HNSW index can serve
+    # the scan; ties are broken by chunk ID in the re-ranking query
+    if candidate_limit is not None:
+        # Only the over-fetched candidates have their full-precision distance computed
+        return candidates.order_by(_hamming_distance(query)).limit(candidate_limit)
+    return candidates.order_by(distance).limit(top_k)
+
+
+def _page_criteria(query_embedding: List[float], after: Optional[PageCursor]) -> list:
+    """Keyset condition selecting the rows ordered after a page cursor."""
+    if after is None:
+        return []
+    distance, chunk_id = after
+    expression = _distance(query_embedding)
+    return [or_(expression > distance, and_(expression == distance, Chunk.chunk_id > chunk_id))]
+
+
+def _vector_literal(embedding: List[float]) -> str:
+    """Text representation of an embedding, accepted by both vector and halfvec."""
+    return "[" + ",".join(str(float(value)) for value in embedding) + "]"
+
+
+def _hamming_distance(query):
+    """Hamming distance between binary-quantized embeddings, matching the bit index."""
+    embedding_type = Chunk.__table__.c.embedding.type
+    if isinstance(query, list):
+        query = literal(query, embedding_type)
+    quantized_embedding = cast(func.binary_quantize(Chunk.embedding), BIT(embedding_type.dim))
+    return quantized_embedding.hamming_distance(func.binary_quantize(query))
+
+
+async def _is_small_scope(session: AsyncSession, criteria: list) -> bool:
+    """Check whether the filtered scope is small enough for an exact scan."""
+    threshold = settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD
+    # Bounded count, so large projects cost at most threshold + 1 index entries
+    scope = select(Chunk.chunk_id).where(*criteria).limit(threshold + 1).subquery()
+    count = await session.scalar(select(func.count()).select_from(scope))
+    return count <= threshold
+
+
+async def _set_local_config(session: AsyncSession, values: dict) -> None:
+    """Set run-time parameters for the current transaction in a single round trip."""
+    await session.execute(
+        select(*(func.set_config(name, str(value), True) for name, value in values.items()))
+    )
+
+
+async def _backend_nearest_chunks(
+    session: AsyncSession,
+    query_embeddings: List[List[float]],
+    top_k: int,
+    scope: SearchScope,
+    ef_search: Optional[int] = None,
+    with_embeddings: bool = False,
+    after: Optional[PageCursor] = None,
+) -> List[list]:
+    """
+    Search with the in-process vector backend, using the same distance.
+    
+    The backend returns chunk IDs only; the result columns of all hits are
+    then read in one primary-key lookup.
+    """
+    neighbors = await get_vector_backend().search(session, query_embeddings, top_k, scope, ef_search, after)
+    chunk_ids = {chunk_id for found in neighbors for chunk_id, _ in found}
+    if not chunk_ids:
+        return [[] for _ in query_embeddings]
     
-    return ChunkQueryResponse(results=query_results)
+    result = await session.execute(
+        select(*_result_columns(with_embeddings))
+        .join(URL, URL.url_id == Chunk.url_id)
+        .where(*scope.criteria(), Chunk.chunk_id.in_(chunk_ids))
+    )
+    rows = {row.chunk_id: row for row in result.all()}
+    # Chunks deleted since the index was loaded are skipped
+    return [
+        [SimpleNamespace(**rows[chunk_id]._asdict(), distance=distance) for chunk_id, distance in found if chunk_id in rows]
+        for found in neighbors
+    ]
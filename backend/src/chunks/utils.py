@@ -0,0 +1,269 @@
+"""Ranking helpers for chunk search results, and splitting of text into chunks."""
+
+import re
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+# Words and individual punctuation marks, roughly one subword token each
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Sentence boundaries: whitespace following terminal punctuation
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> Dict[Hashable, float]:
+    """
+    Fuse several rankings with reciprocal rank fusion (Cormack et al., 2009).
+
+    Each item scores the sum of 1 / (k + rank) over the rankings it appears in,
+    with 1-based ranks. Only ranks matter, so rankings with incomparable scores
+    (e.g. cosine similarity and full-text relevance) can be combined.
+
+    Args:
+        rankings: Item keys of each ranking, best first
+        k: Smoothing constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        Fused score per item, in no particular order
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float,
+) -> List[int]:
+    """
+    Select a relevant but diverse subset of candidates (Carbonell & Goldstein, 1998).
+
+    Each step picks the candidate maximizing
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))``
+    with cosine similarities. The similarities to the selected set are updated
+    with one matrix-vector product per step instead of per-pair comparisons.
+
+    Args:
+        query: Query embedding of shape (dimensions,)
+        candidates: Candidate embeddings of shape (n, dimensions)
+        k: Number of candidates to select
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    candidates = np.asarray(candidates, dtype=np.float32)
+    if len(candidates) == 0:
+        return []
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected: List[int] = []
+    for _ in range(min(k, len(candidates))):
+        # Nothing is redundant before the first pick
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return selected
+
+
+def merge_windows(
+    hits: Sequence[Tuple[Hashable, int]],
+    window: int,
+) -> List[Tuple[Hashable, int, int, List[int]]]:
+    """
+    Merge the ``[index - window, index + window]`` ranges of hits per document.
+
+    Overlapping or adjacent ranges in the same document become one range.
+
+    Args:
+        hits: (document key, chunk index) of each hit
+        window: Number of neighbors to include on each side
+
+    Returns:
+        (document key, first index, last index, positions of the hits in
+        ``hits``) per merged range, ordered by document and first index
+    """
+    by_document: Dict[Hashable, List[Tuple[int, int]]] = {}
+    for position, (key, index) in enumerate(hits):
+        by_document.setdefault(key, []).append((index, position))
+
+    merged: List[Tuple[Hashable, int, int, List[int]]] = []
+    for key, indexed in by_document.items():
+        current = None
+        for index, position in sorted(indexed):
+            start, end = max(index - window, 0), index + window
+            if current is not None and start <= current[2] + 1:
+                current = (key, current[1], max(current[2], end), current[3] + [position])
+            else:
+                if current is not None:
+                    merged.append(current)
+                current = (key, start, end, [position])
+        merged.append(current)
+    return merged
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text.
+
+    Counts words and punctuation marks, plus one extra token per 8 characters
+    of long words, which subword tokenizers split. This needs no tokenizer
+    model and is close enough for budgeting context.
+    """
+    return sum(1 + len(token) // 8 for token in _TOKEN_PATTERN.findall(text))
+
+
+def pack_by_budget(texts: Sequence[str], budget: int) -> Tuple[List[int], int]:
+    """
+    Greedily select texts, best first, until a token budget is filled.
+
+    Texts that would overflow the budget are skipped so that smaller, lower
+    ranked texts can still use the remaining space. Texts that repeat an
+    already selected text (ignoring case and whitespace) are dropped.
+
+    Args:
+        texts: Candidate texts, best first
+        budget: Maximum total number of tokens, as estimated by count_tokens
+
+    Returns:
+        Indices of the selected texts in rank order, and their total token count
+    """
+    selected: List[int] = []
+    seen = set()
+    used = 0
+    for i, text in enumerate(texts):
+        fingerprint = " ".join(text.lower().split())
+        if fingerprint in seen:
+            continue
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            continue
+        seen.add(fingerprint)
+        selected.append(i)
+        used += tokens
+        if used == budget:
+            break
+    return selected, used
+
+
+def split_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Split a text into chunks of at most max_tokens tokens, as estimated by count_tokens.
+
+    Paragraphs (separated by blank lines) are split into sentences, which are
+    packed greedily into chunks; a sentence is only cut between words when it
+    alone exceeds max_tokens. Each chunk starts with the last whole sentences
+    of the previous one, up to overlap_tokens, so that a passage spanning a
+    chunk boundary is also found intact in one chunk.
+
+    Args:
+        text: Text with paragraphs separated by blank lines
+        max_tokens: Maximum number of tokens per chunk
+        overlap_tokens: Maximum number of tokens repeated from the previous chunk
+
+    Returns:
+        Chunk texts in document order, with whitespace collapsed
+    """
+    pieces: List[Tuple[str, int]] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        for sentence in _SENTENCE_BOUNDARY.split(" ".join(paragraph.split())):
+            tokens = count_tokens(sentence)
+            if tokens <= max_tokens:
+                pieces.append((sentence, tokens))
+            else:
+                pieces.extend(_split_words(sentence, max_tokens))
+
+    chunks: List[str] = []
+    current: List[Tuple[str, int]] = []
+    used = 0
+    for piece, tokens in pieces:
+        if not tokens:
+            continue
+        if current and used + tokens > max_tokens:
+            chunks.append(" ".join(part for part, _ in current))
+            overlap: List[Tuple[str, int]] = []
+            carried = 0
+            for previous, previous_tokens in reversed(current):
+                if carried + previous_tokens > min(overlap_tokens, max_tokens - tokens):
+                    break
+                overlap.insert(0, (previous, previous_tokens))
+                carried += previous_tokens
+            current, used = overlap, carried
+        current.append((piece, tokens))
+        used += tokens
+    if current:
+        chunks.append(" ".join(part for part, _ in current))
+    return chunks
+
+
+def join_chunks(contents: Sequence[str], overlap_tokens: int) -> str:
+    """
+    Join consecutive chunks of a document without repeating their overlap.
+
+    split_text starts each chunk with up to overlap_tokens tokens of the
+    previous one. The longest such prefix that the previous chunk ends with
+    (at word boundaries) is dropped and the rest continues the previous chunk
+    after a space; chunks sharing no text are joined with a newline.
+
+    Args:
+        contents: Chunk texts, in document order without gaps
+        overlap_tokens: Maximum number of tokens a chunk repeats from the previous one
+
+    Returns:
+        The joined text
+    """
+    text = ""
+    for position, content in enumerate(contents):
+        if not position:
+            text = content
+            continue
+        shared = _overlap_length(contents[position - 1], content, overlap_tokens)
+        if not shared:
+            text += "\n" + content
+        elif shared < len(content):
+            text += " " + content[shared:].lstrip()
+    return text
+
+
+def _overlap_length(previous: str, content: str, overlap_tokens: int) -> int:
+    """Length of the longest prefix of content, of at most overlap_tokens tokens, that ends previous."""
+    longest = end = used = 0
+    for word in content.split(" "):
+        used += count_tokens(word)
+        if used > overlap_tokens:
+            break
+        end += len(word) + (1 if end else 0)
+        prefix = content[:end]
+        if previous == prefix or previous.endswith(" " + prefix):
+            longest = end
+    return longest
+
+
+def _split_words(sentence: str, max_tokens: int) -> List[Tuple[str, int]]:
+    """Cut an oversized sentence between words into pieces of at most max_tokens tokens."""
+    pieces: List[Tuple[str, int]] = []
+    words: List[str] = []
+    used = 0
+    for word in sentence.split():
+        tokens = count_tokens(word)
+        if words and used + tokens > max_tokens:
+            pieces.append((" ".join(words), used))
+            words, used = [], 0
+        words.append(word)
+        used += tokens
+    if words:
+        pieces.append((" ".join(words), used))
+    return pieces
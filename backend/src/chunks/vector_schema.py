@@ -0,0 +1,185 @@
+"""
+Chunk search schema modes: embedding storage, distance, binary index, text search.
+
+The alembic revisions always build the default schema (vector(384) storage,
+an inner-product HNSW index, no binary-quantized index, an "english"
+content_tsv column). The VECTOR_STORAGE, VECTOR_SEARCH_METRIC,
+VECTOR_SEARCH_BINARY_QUANTIZATION and TEXT_SEARCH_CONFIG settings are
+applied to the live database by this module instead, so that a revision
+produces the same schema in every environment:
+
+    python -m src.chunks.vector_schema check
+    python -m src.chunks.vector_schema apply
+
+The API refuses to start while the live schema and the settings disagree.
+"""
+
+import argparse
+import asyncio
+import re
+import sys
+from dataclasses import dataclass, fields
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.chunks.constants import CHUNK_PARTITION_COUNT
+from src.config import settings
+from src.database import engine as default_engine
+
+# Expression of the binary-quantized index; must match the ORDER BY of the
+# first-pass search exactly
+_BINARY_EXPRESSION = "(binary_quantize(embedding)::bit(384)) bit_hamming_ops"
+
+
+@dataclass(frozen=True)
+class VectorSchema:
+    """Search-related schema modes of the chunks table."""
+    storage: Optional[str]
+    metric: Optional[str]
+    binary_quantization: bool
+    text_search_config: Optional[str]
+
+
+def configured_schema() -> VectorSchema:
+    """Get the schema modes configured in settings."""
+    return VectorSchema(
+        storage=settings.VECTOR_STORAGE,
+        metric=settings.VECTOR_SEARCH_METRIC,
+        binary_quantization=settings.VECTOR_SEARCH_BINARY_QUANTIZATION,
+        text_search_config=settings.TEXT_SEARCH_CONFIG,
+    )
+
+
+async def live_schema(conn: AsyncConnection) -> VectorSchema:
+    """Read the schema modes of the chunks table from the Postgres catalogs."""
+    column_type = await conn.scalar(text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = 'chunks'::regclass AND attname = 'embedding'"
+    ))
+    opclass = await conn.scalar(text(
+        "SELECT opc.opcname FROM pg_index i "
+        "JOIN pg_opclass opc ON opc.oid = i.indclass[0] "
+        "WHERE i.indexrelid = to_regclass('idx_chunks_embedding')"
+    ))
+    binary_index = await conn.scalar(text("SELECT to_regclass('idx_chunks_embedding_bq') IS NOT NULL"))
+    tsv_expression = await conn.scalar(text(
+        "SELECT pg_get_expr(d.adbin, d.adrelid) FROM pg_attrdef d "
+        "JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum "
+        "WHERE d.adrelid = 'chunks'::regclass AND a.attname = 'content_tsv'"
+    ))
+    metric = None
+    if opclass is not None:
+        # e.g. vector_ip_ops, halfvec_cosine_ops
+        metric = {"ip": "inner_product", "cosine": "cosine"}.get(opclass.split("_")[1], opclass)
+    text_search_config = None
+    if tsv_expression is not None:
+        match = re.search(r"'([^']+)'::regconfig", tsv_expression)
+        text_search_config = match.group(1) if match else tsv_expression
+    return VectorSchema(
+        storage=column_type.split("(")[0] if column_type else None,
+        metric=metric,
+        binary_quantization=bool(binary_index),
+        text_search_config=text_search_config,
+    )
+
+
+def schema_mismatches(live: VectorSchema, configured: VectorSchema) -> List[str]:
+    """Describe each mode in which the live schema differs from the configured one."""
+    return [
+        f"{field.name}: database has {getattr(live, field.name)!r}, settings have {getattr(configured, field.name)!r}"
+        for field in fields(VectorSchema)
+        if getattr(live, field.name) != getattr(configured, field.name)
+    ]
+
+
+async def check_vector_schema(engine: AsyncEngine) -> None:
+    """
+    Check that the live chunks table matches the configured schema modes.
+
+    Databases without pgvector (e.g. SQLite) are not checked.
+
+    Raises:
+        RuntimeError: If they differ, listing the differences
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    async with engine.connect() as conn:
+        mismatches = schema_mismatches(await live_schema(conn), configured_schema())
+    if mismatches:
+        raise RuntimeError(
+            "Chunk search schema does not match the settings ("
+            + "; ".join(mismatches)
+            + "). Run `python -m src.chunks.vector_schema apply` or change the settings."
+        )
+
+
+async def apply_vector_schema(conn: AsyncConnection, live: VectorSchema, configured: VectorSchema) -> None:
+    """Change the chunks table from the live to the configured schema modes."""
+    storage_changed = live.storage != configured.storage
+    if storage_changed or (live.binary_quantization and not configured.binary_quantization):
+        # Also dropped before a storage change, since it indexes the column
+        await conn.execute(text("DROP INDEX IF EXISTS idx_chunks_embedding_bq"))
+    if storage_changed or live.metric != configured.metric:
+        await conn.execute(text("DROP INDEX IF EXISTS idx_chunks_embedding"))
+    if storage_changed:
+        column_type = f"{configured.storage}(384)"
+        await conn.execute(text(
+            f"ALTER TABLE chunks ALTER COLUMN embedding TYPE {column_type} USING embedding::{column_type}"
+        ))
+    if live.metric != configured.metric and configured.metric == "inner_product":
+        # Inner product equals cosine similarity on unit vectors only
+        await conn.execute(text("UPDATE chunks SET embedding = l2_normalize(embedding)"))
+    if storage_changed or live.metric != configured.metric:
+        metric = "ip" if configured.metric == "inner_product" else "cosine"
+        await _create_partitioned_index(
+            conn, "idx_chunks_embedding", "embedding", "hnsw", f"embedding {configured.storage}_{metric}_ops"
+        )
+    if configured.binary_quantization and (storage_changed or not live.binary_quantization):
+        await _create_partitioned_index(conn, "idx_chunks_embedding_bq", "embedding_bq", "hnsw", _BINARY_EXPRESSION)
+    if live.text_search_config != configured.text_search_config:
+        # Dropping the generated column drops its indexes
+        await conn.execute(text("ALTER TABLE chunks DROP COLUMN IF EXISTS content_tsv"))
+        await conn.execute(
+            text(
+                "ALTER TABLE chunks ADD COLUMN content_tsv tsvector GENERATED ALWAYS AS "
+                f"(to_tsvector({_quote_literal(configured.text_search_config)}::regconfig, content)) STORED"
+            )
+        )
+        await _create_partitioned_index(conn, "idx_chunks_content_tsv", "content_tsv", "gin", "content_tsv")
+
+
+async def _create_partitioned_index(
+    conn: AsyncConnection, name: str, suffix: str, method: str, expression: str
+) -> None:
+    """Create an index on the partitioned chunks table and attach one per partition."""
+    await conn.execute(text(f"CREATE INDEX {name} ON ONLY chunks USING {method} ({expression})"))
+    for remainder in range(CHUNK_PARTITION_COUNT):
+        partition = f"chunks_p{remainder:02d}"
+        await conn.execute(
+            text(f"CREATE INDEX {partition}_{suffix}_idx ON {partition} USING {method} ({expression})")
+        )
+        await conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {partition}_{suffix}_idx"))
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+async def main(command: str) -> int:
+    async with default_engine.begin() as conn:
+        live, configured = await live_schema(conn), configured_schema()
+        mismatches = schema_mismatches(live, configured)
+        for mismatch in mismatches:
+            print(mismatch)
+        if command == "apply" and mismatches:
+            await apply_vector_schema(conn, live, configured)
+            print("Applied.")
+    return 1 if command == "check" and mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check or apply the chunk search schema modes of the settings.")
+    parser.add_argument("command", choices=["check", "apply"])
+    sys.exit(asyncio.run(main(parser.parse_args().command)))
@@ -69,6 +69,120 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # Embedding model used for chunks and search queries
+    EMBEDDING_PROVIDER: Literal["sentence-transformers", "hashing"] = "sentence-transformers"
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_DIMENSIONS: int = 384
+    # Optional reranking of retrieved candidates. Reranking is abandoned in
+    # favour of the retrieval order when it exceeds its time budget, or is
+    # skipped when all RERANK_WORKERS threads of the process are busy.
+    RERANKER_PROVIDER: Literal["cross-encoder", "term-overlap"] = "cross-encoder"
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 50
+    RERANK_TIMEOUT_MS: int = 150
+    RERANK_WORKERS: int = 2
+    # In-process LRU cache of query embeddings, so repeated queries skip the model
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+
+    # Distance used for similarity search. "inner_product" stores L2-normalized
+    # embeddings and searches with <#> on a vector_ip_ops index, which equals
+    # cosine similarity without per-candidate norm computations.
+    # This and the other schema modes below (VECTOR_STORAGE,
+    # VECTOR_SEARCH_BINARY_QUANTIZATION, TEXT_SEARCH_CONFIG) are applied to
+    # the database by `python -m src.chunks.vector_schema apply`, not by the
+    # migrations; the API does not start while they disagree.
+    VECTOR_SEARCH_METRIC: Literal["cosine", "inner_product"] = "inner_product"
+    # Column type of chunk embeddings. "halfvec" stores half-precision floats,
+    # halving the table and HNSW index size so twice as many chunks stay in
+    # shared_buffers.
+    VECTOR_STORAGE: Literal["vector", "halfvec"] = "vector"
+
+    # Where vector searches run. "pgvector" searches the database indexes;
+    # "numpy" searches per-project embedding matrices held in process memory,
+    # loaded lazily and kept in sync with chunk writes. "faiss" (requires
+    # faiss-cpu) keeps per-project HNSW indexes in process, persisted as
+    # snapshots in VECTOR_INDEX_DIR that workers memory-map and share.
+    # Databases without pgvector (e.g. SQLite) use "numpy" unless "faiss" is set.
+    VECTOR_SEARCH_BACKEND: Literal["pgvector", "numpy", "faiss"] = "pgvector"
+    VECTOR_INDEX_DIR: str = "/var/lib/app/vector-indexes"
+    VECTOR_INDEX_HNSW_M: int = 32
+    VECTOR_INDEX_HNSW_EF_CONSTRUCTION: int = 80
+    # Generations applied incrementally before a new snapshot is written
+    VECTOR_INDEX_SNAPSHOT_INTERVAL: int = 50
+    # Generations of index_changes kept per project for in-process indexes to
+    # catch up from; older indexes are reloaded (or reopen a FAISS snapshot).
+    # Not written at all while pgvector serves the searches.
+    VECTOR_INDEX_CHANGE_LOG_RETENTION: int = 1000
+    # Default HNSW candidate list size (pgvector hnsw.ef_search) for searches
+    # that do not set their own value
+    VECTOR_SEARCH_EF_SEARCH: int = 40
+    # pgvector 0.8 iterative index scans keep walking the HNSW graph until
+    # enough rows pass the project/URL filter, up to max_scan_tuples
+    VECTOR_SEARCH_ITERATIVE_SCAN: Literal["off", "relaxed_order", "strict_order"] = "relaxed_order"
+    VECTOR_SEARCH_MAX_SCAN_TUPLES: int = 20000
+    # Scopes with at most this many chunks are searched exactly, bypassing HNSW
+    VECTOR_SEARCH_EXACT_SCAN_THRESHOLD: int = 10000
+    # Two-stage search for large scopes: a Hamming-distance HNSW scan over
+    # binary-quantized embeddings (bit(384), 48 bytes per chunk) fetches
+    # top_k * oversampling candidates, which are then reranked by exact
+    # distance on the stored embeddings. Needs the binary index, see
+    # VECTOR_SEARCH_METRIC.
+    VECTOR_SEARCH_BINARY_QUANTIZATION: bool = False
+    VECTOR_SEARCH_BINARY_OVERSAMPLING: int = 4
+    # Hybrid search fuses the vector and full-text rankings with reciprocal rank
+    # fusion. Each side contributes this many candidates (at least top_k).
+    # TEXT_SEARCH_CONFIG is the Postgres text search configuration of the
+    # generated chunks.content_tsv column, see VECTOR_SEARCH_METRIC.
+    TEXT_SEARCH_CONFIG: str = "english"
+    HYBRID_SEARCH_CANDIDATES: int = 50
+    HYBRID_SEARCH_RRF_K: int = 60
+    # In-process cache of search results. Entries are keyed by the index
+    # generation of the searched projects, so chunk writes invalidate them.
+    # Searches filtered by URL status are not cached.
+    SEARCH_RESULT_CACHE_SIZE: int = 2048
+    SEARCH_RESULT_CACHE_TTL_SECONDS: int = 600
+    # Searches with a token_budget retrieve more than top_k results until the
+    # budget is filled, up to this many
+    TOKEN_BUDGET_MAX_CANDIDATES: int = 200
+    # URL ingestion pipeline (src/tasks/pipeline.py). Pages larger than
+    # CRAWL_MAX_BYTES are rejected; timeouts, 429s and 5xx responses are
+    # retried with exponential backoff up to CRAWL_MAX_RETRIES times.
+    CRAWL_TIMEOUT_SECONDS: float = 30.0
+    CRAWL_MAX_BYTES: int = 5_000_000
+    CRAWL_MAX_RETRIES: int = 3
+    CRAWL_USER_AGENT: str = "WebContentVectorizer/0.1"
+    # Redirects followed per page; each hop is checked against its own
+    # host's robots.txt and concurrency limit
+    CRAWL_MAX_REDIRECTS: int = 5
+    # Each crawl worker process fetches through one pooled HTTP client, with
+    # at most CRAWL_MAX_IN_FLIGHT requests at once and at most
+    # CRAWL_PER_HOST_CONCURRENCY of them to any single host. HTTP/2 requires
+    # the h2 package.
+    CRAWL_MAX_IN_FLIGHT: int = 256
+    CRAWL_PER_HOST_CONCURRENCY: int = 8
+    CRAWL_HTTP2: bool = True
+    # Per crawl worker process: parsed robots.txt files are cached per origin
+    # and resolved addresses per host name, so that only the first page of a
+    # site pays for the robots.txt fetch and the DNS lookup.
+    CRAWL_ROBOTS_CACHE_SIZE: int = 4096
+    CRAWL_ROBOTS_CACHE_TTL_SECONDS: int = 86400
+    CRAWL_DNS_CACHE_SIZE: int = 4096
+    CRAWL_DNS_CACHE_TTL_SECONDS: int = 300
+    # Cluster-wide politeness: every host gets a token bucket refilled at
+    # CRAWL_HOST_RATE requests per second, holding up to CRAWL_HOST_BURST
+    # tokens. Crawls of a host without a free token are re-queued with a
+    # countdown instead of sleeping in a worker; slots are reserved at most
+    # CRAWL_MAX_SCHEDULE_DELAY_SECONDS ahead. "postgres" shares the buckets
+    # between all workers; "memory" keeps them per process (tests only).
+    CRAWL_RATE_LIMITER: Literal["postgres", "memory"] = "postgres"
+    CRAWL_HOST_RATE: float = 1.0
+    CRAWL_HOST_BURST: int = 5
+    CRAWL_MAX_SCHEDULE_DELAY_SECONDS: float = 300.0
+    # Chunk size and the overlap between consecutive chunks, in estimated tokens
+    CHUNK_MAX_TOKENS: int = 256
+    CHUNK_OVERLAP_TOKENS: int = 32
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -2,10 +2,16 @@ import uuid
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Column, Float, UniqueConstraint
+from sqlalchemy import DDL, JSON, Column, Float, Index, LargeBinary, UniqueConstraint, event
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlmodel import Field, Relationship, SQLModel
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import HALFVEC, Vector
+
+from src.chunks.constants import CHUNK_PARTITION_COUNT
+from src.config import settings
+
+# Half-precision storage halves the size of the chunks table and its HNSW index
+EmbeddingVector = HALFVEC if settings.VECTOR_STORAGE == "halfvec" else Vector
 
 
 # User related models
@@ -56,11 +62,14 @@ class Project(ProjectBase, table=True):
     project_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     user_id: uuid.UUID = Field(foreign_key="users.user_id", nullable=False)
     created_at: datetime = Field(default_factory=datetime.now)
+    # Bumped whenever the project's chunks change, invalidating cached search results
+    index_generation: int = Field(default=0, nullable=False)
     
     # Relationships
     user: User = Relationship(back_populates="projects")
     urls: List["URL"] = Relationship(back_populates="project", sa_relationship_kwargs={"cascade": "all, delete"})
     shared_projects: List["SharedProject"] = Relationship(back_populates="project", sa_relationship_kwargs={"cascade": "all, delete"})
+    index_changes: List["IndexChange"] = Relationship(back_populates="project", sa_relationship_kwargs={"cascade": "all, delete"})
     
     __table_args__ = (
         UniqueConstraint("user_id", "project_name", name="uq_projects_user_id_project_name"),
@@ -118,10 +127,15 @@ class URL(URLBase, table=True):
     project_id: uuid.UUID = Field(foreign_key="projects.project_id", nullable=False)
     submitted_at: datetime = Field(default_factory=datetime.now)
     last_updated_at: datetime = Field(default_factory=datetime.now)
+    # Validators of the stored chunks' page, for conditional re-crawls
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = Field(default=None, max_length=64)
     
     # Relationships
     project: Project = Relationship(back_populates="urls")
     chunks: List["Chunk"] = Relationship(back_populates="url", sa_relationship_kwargs={"cascade": "all, delete"})
+    artifacts: List["PipelineArtifact"] = Relationship(back_populates="url", sa_relationship_kwargs={"cascade": "all, delete"})
     
     __table_args__ = (
         UniqueConstraint("project_id", "original_url", name="uq_urls_project_id_original_url"),
@@ -152,15 +166,83 @@ class Chunk(ChunkBase, table=True):
     
     chunk_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     url_id: uuid.UUID = Field(foreign_key="urls.url_id", nullable=False)
-    project_id: uuid.UUID = Field(foreign_key="projects.project_id", nullable=False)
+    # Part of the primary key because chunks are hash-partitioned by project_id
+    project_id: uuid.UUID = Field(foreign_key="projects.project_id", primary_key=True, index=True)
     embedding: Optional[list[float]] = Field(
-        sa_column=Column(Vector(384), nullable=False),
+        sa_column=Column(EmbeddingVector(384), nullable=False),
         default=None
     )
     created_at: datetime = Field(default_factory=datetime.now)
+    # Copied from the URL when its chunks are stored, so that metadata filters
+    # are served by chunk indexes instead of a join
+    host: Optional[str] = Field(default=None, max_length=255)
+    crawled_at: Optional[datetime] = Field(default=None)
     
     # Relationships
     url: URL = Relationship(back_populates="chunks")
+    
+    __table_args__ = (
+        Index("ix_chunks_url_id_chunk_index", "url_id", "chunk_index"),
+        Index("ix_chunks_project_id_host_crawled_at", "project_id", "host", "crawled_at"),
+        Index("ix_chunks_project_id_crawled_at", "project_id", "crawled_at"),
+        {"postgresql_partition_by": "HASH (project_id)"},
+    )
+
+
+# Database model for index_changes table: one row per index generation, naming
+# the URL whose chunks changed, so in-process indexes can catch up incrementally
+class IndexChange(SQLModel, table=True):
+    __tablename__ = "index_changes"
+    
+    project_id: uuid.UUID = Field(foreign_key="projects.project_id", primary_key=True)
+    generation: int = Field(primary_key=True)
+    # Not a foreign key: deleted URLs are recorded too
+    url_id: uuid.UUID = Field(nullable=False)
+    changed_at: datetime = Field(default_factory=datetime.now)
+    
+    # Relationships
+    project: Project = Relationship(back_populates="index_changes")
+
+
+# Database model for crawl_host_slots table: per-host token bucket of the
+# crawl scheduler, stored as the theoretical arrival time of the next request
+class CrawlHostSlot(SQLModel, table=True):
+    __tablename__ = "crawl_host_slots"
+    
+    host: str = Field(max_length=255, primary_key=True)
+    next_slot_at: datetime = Field(nullable=False)
+
+
+# Database model for pipeline_artifacts table: the output of one ingestion
+# pipeline run's latest stage, read by its next stage, so that task messages
+# carry an ID instead of page text and embeddings
+class PipelineArtifact(SQLModel, table=True):
+    __tablename__ = "pipeline_artifacts"
+    
+    artifact_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    url_id: uuid.UUID = Field(foreign_key="urls.url_id", nullable=False, index=True)
+    # Fetched page, until it is extracted
+    page: Optional[str] = None
+    content_type: Optional[str] = None
+    # Chunk texts, and their float32 embeddings once embedded
+    contents: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))
+    embeddings: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
+    created_at: datetime = Field(default_factory=datetime.now)
+    
+    # Relationships
+    url: URL = Relationship(back_populates="artifacts")
+
+
+# A partitioned table only accepts rows once its partitions exist
+for _remainder in range(CHUNK_PARTITION_COUNT):
+    event.listen(
+        Chunk.__table__,
+        "after_create",
+        DDL(
+            f"CREATE TABLE chunks_p{_remainder:02d} PARTITION OF chunks "
+            f"FOR VALUES WITH (MODULUS {CHUNK_PARTITION_COUNT}, REMAINDER {_remainder})"
+        ).execute_if(dialect="postgresql"),
+    )
 
 
 # Response models for API
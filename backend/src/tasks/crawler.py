@@ -0,0 +1,407 @@
+"""Shared HTTP crawler of the ingestion pipeline's crawl stage."""
+
+import asyncio
+import contextlib
+import importlib.util
+import ipaddress
+import socket
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpcore
+import httpx
+
+from src.cache import TTLCache
+from src.config import settings
+from src.tasks.extraction import TEXT_CONTENT_TYPES
+
+# Longest robots.txt parsed; RFC 9309 requires at least 500 KiB
+ROBOTS_MAX_BYTES = 512 * 1024
+
+
+class CrawlError(Exception):
+    """The URL cannot be ingested, e.g. a 404 or an unsupported content type."""
+
+
+class TransientCrawlError(Exception):
+    """The URL could not be fetched this time, e.g. a timeout or a 503."""
+
+
+@dataclass
+class _Redirect:
+    """A redirect response, pointing to the absolute URL of the next hop."""
+    location: str
+
+
+@dataclass
+class Page:
+    """A fetched page, with its validators for conditional re-fetches."""
+    content: str
+    content_type: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class _HostSlots:
+    """Semaphore limiting concurrent requests to one host, with its number of users."""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class _CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """
+    Network backend resolving host names through a TTL cache before connecting.
+
+    TLS still verifies and sends SNI for the host name, which the connection
+    pool passes separately from the address connected to. Failed lookups are
+    not cached.
+    """
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, addresses: TTLCache[List[str]]):
+        self._backend = backend
+        self._addresses = addresses
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        addresses = [host] if _is_ip_address(host) else await self._resolve(host, port, timeout)
+        error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+    async def _resolve(self, host: str, port: int, timeout: Optional[float]) -> List[str]:
+        addresses = self._addresses.get(host)
+        if addresses is not None:
+            return addresses
+        try:
+            infos = await asyncio.wait_for(
+                asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            # Mapped to httpx.ConnectError, which the crawler retries
+            raise httpcore.ConnectError(f"Cannot resolve {host}: {e}") from e
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._addresses.set(host, addresses)
+        return addresses
+
+
+# httpx counterpart of each httpcore error, most specific first, like the
+# mapping of httpx's own transport
+_HTTPCORE_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+class _PoolTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport sending requests through an httpcore connection pool.
+
+    Like httpx.AsyncHTTPTransport, which offers no way to choose its pool's
+    network backend; httpcore errors are raised as the matching httpx ones.
+    """
+
+    def __init__(self, pool: httpcore.AsyncConnectionPool):
+        self._pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            response = await self._pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_PoolResponseStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._pool.aclose()
+
+
+class _PoolResponseStream(httpx.AsyncByteStream):
+    """Body of a _PoolTransport response, raising httpx errors."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with _httpx_errors():
+            async for part in self._stream:
+                yield part
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+@contextlib.contextmanager
+def _httpx_errors() -> Iterator[None]:
+    """Raise httpcore errors as their httpx counterparts."""
+    try:
+        yield
+    except Exception as e:
+        for core_error, httpx_error in _HTTPCORE_ERRORS:
+            if isinstance(e, core_error):
+                raise httpx_error(str(e)) from e
+        raise
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class Crawler:
+    """
+    Fetches pages through one long-lived, connection-pooled HTTP client.
+
+    The client keeps connections alive between fetches and negotiates HTTP/2
+    where the origin supports it, so many fetches to the same host share a
+    few connections. At most max_in_flight requests run at once, and at most
+    per_host_limit of them to any single host, so that a batch of URLs from
+    a few domains is fetched concurrently without hammering one origin.
+    
+    Pages disallowed for user_agent by their origin's robots.txt are never
+    fetched. Redirects are followed by the crawler itself, up to
+    max_redirects, so every hop is checked against its own origin's
+    robots.txt and host limit. Parsed robots.txt files are cached per origin,
+    and resolved host addresses per host name, for all fetches of the crawler.
+    A crawler must only be used from the event loop it was first used on.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        per_host_limit: int,
+        timeout: float,
+        max_bytes: int,
+        user_agent: str,
+        http2: bool = True,
+        max_redirects: int = 5,
+        robots_cache_size: int = 1024,
+        robots_cache_ttl: float = 86400,
+        dns_cache_size: int = 1024,
+        dns_cache_ttl: float = 300,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self.per_host_limit = per_host_limit
+        self.user_agent = user_agent
+        self.robots = TTLCache[RobotFileParser](robots_cache_size, robots_cache_ttl)
+        self.addresses = TTLCache[List[str]](dns_cache_size, dns_cache_ttl)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._hosts: Dict[str, _HostSlots] = {}
+        self._robots_pending: Dict[str, asyncio.Future] = {}
+        if transport is None:
+            transport = _PoolTransport(
+                httpcore.AsyncConnectionPool(
+                    ssl_context=httpx.create_ssl_context(),
+                    max_connections=max_in_flight,
+                    max_keepalive_connections=max_in_flight,
+                    # HTTP/2 needs the optional h2 package (httpx[http2])
+                    http2=http2 and importlib.util.find_spec("h2") is not None,
+                    network_backend=_CachingNetworkBackend(httpcore.AnyIOBackend(), self.addresses),
+                )
+            )
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=False,
+            headers={"User-Agent": user_agent},
+            transport=transport,
+        )
+
+    async def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Page]:
+        """
+        Fetch a page with a text content type, if its robots.txt allows it.
+        
+        Redirects are followed, each hop only if its robots.txt allows it.
+        
+        Args:
+            etag: ETag of the previously fetched page, sent as If-None-Match
+            last_modified: Last-Modified of the previously fetched page, sent
+                as If-Modified-Since
+        
+        Returns:
+            The page, or None if the server answered 304 Not Modified
+        
+        Raises:
+            TransientCrawlError: On timeouts, connection errors, 429s and 5xx
+                responses, also for robots.txt, which are worth retrying
+            CrawlError: On robots.txt denials, other error responses, too
+                many redirects, unsupported content types and pages larger
+                than max_bytes
+        """
+        for _ in range(self.max_redirects + 1):
+            result = await self._fetch_hop(url, etag, last_modified)
+            if not isinstance(result, _Redirect):
+                return result
+            url = result.location
+        raise CrawlError(f"More than {self.max_redirects} redirects")
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        await self._client.aclose()
+
+    async def _fetch_hop(
+        self, url: str, etag: Optional[str], last_modified: Optional[str]
+    ) -> Union[Page, _Redirect, None]:
+        """Fetch one URL, without following a redirect, holding a slot of its host."""
+        host = (urlsplit(url).hostname or "").lower()
+        slots = self._hosts.get(host)
+        if slots is None:
+            slots = self._hosts[host] = _HostSlots(self.per_host_limit)
+        slots.users += 1
+        try:
+            # The host slot is taken first, so requests waiting for a busy host
+            # do not hold global slots that requests to other hosts could use
+            async with slots.semaphore, self._in_flight:
+                if not await self._allowed_by_robots(url):
+                    raise CrawlError("Disallowed by robots.txt")
+                return await self._fetch(url, etag, last_modified)
+        finally:
+            slots.users -= 1
+            if not slots.users:
+                del self._hosts[host]
+
+    async def _allowed_by_robots(self, url: str) -> bool:
+        """Check whether the URL's robots.txt allows fetching it."""
+        robots = await self._robots(url)
+        return robots.can_fetch(self.user_agent, url)
+
+    async def _robots(self, url: str) -> RobotFileParser:
+        """Get the robots.txt of the URL's origin, fetching it once for concurrent callers."""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}".lower()
+        robots = self.robots.get(origin)
+        if robots is not None:
+            return robots
+        pending = self._robots_pending.get(origin)
+        if pending is None:
+            pending = self._robots_pending[origin] = asyncio.ensure_future(self._fetch_robots(origin))
+            pending.add_done_callback(lambda _: self._robots_pending.pop(origin, None))
+        # Shielded so that a cancelled caller does not cancel the others' fetch
+        return await asyncio.shield(pending)
+
+    async def _fetch_robots(self, origin: str) -> RobotFileParser:
+        """
+        Fetch and parse an origin's robots.txt, as RFC 9309 prescribes.
+        
+        A missing robots.txt (4xx) allows everything. An unreachable one (5xx
+        or a connection error) raises TransientCrawlError, so that the crawl
+        is retried instead of fetching pages the origin may disallow.
+        """
+        robots = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            # RFC 9309 asks crawlers to follow robots.txt redirects
+            async with self._client.stream("GET", robots.url, follow_redirects=True) as response:
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise TransientCrawlError(f"robots.txt: HTTP {response.status_code}")
+                if response.status_code >= 400:
+                    robots.allow_all = True
+                else:
+                    body = bytearray()
+                    async for part in response.aiter_bytes():
+                        body += part
+                        if len(body) >= ROBOTS_MAX_BYTES:
+                            break
+                    robots.parse(body[:ROBOTS_MAX_BYTES].decode("utf-8", errors="replace").splitlines())
+        except httpx.TransportError as e:
+            raise TransientCrawlError(f"robots.txt: {type(e).__name__}: {e}") from e
+        self.robots.set(origin, robots)
+        return robots
+
+    async def _fetch(
+        self, url: str, etag: Optional[str], last_modified: Optional[str]
+    ) -> Union[Page, _Redirect, None]:
+        headers = {}
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        try:
+            async with self._client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and headers:
+                    return None
+                if response.has_redirect_location:
+                    location = str(response.url.join(response.headers["location"]))
+                    if urlsplit(location).scheme not in ("http", "https"):
+                        raise CrawlError(f"Redirect to unsupported URL {location}")
+                    return _Redirect(location)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise TransientCrawlError(f"HTTP {response.status_code}")
+                if response.status_code >= 400:
+                    raise CrawlError(f"HTTP {response.status_code}")
+                content_type = response.headers.get("content-type", "text/html").split(";")[0].strip().lower()
+                if content_type not in TEXT_CONTENT_TYPES:
+                    raise CrawlError(f"Unsupported content type {content_type}")
+                body = bytearray()
+                async for part in response.aiter_bytes():
+                    body += part
+                    if len(body) > self.max_bytes:
+                        raise CrawlError(f"Page larger than {self.max_bytes} bytes")
+                content = body.decode(response.encoding or "utf-8", errors="replace")
+        except httpx.TransportError as e:
+            raise TransientCrawlError(f"{type(e).__name__}: {e}") from e
+        return Page(
+            content=content,
+            content_type=content_type,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+
+
+@lru_cache
+def get_crawler() -> Crawler:
+    """Get the process-wide crawler configured in settings."""
+    return Crawler(
+        max_in_flight=settings.CRAWL_MAX_IN_FLIGHT,
+        per_host_limit=settings.CRAWL_PER_HOST_CONCURRENCY,
+        timeout=settings.CRAWL_TIMEOUT_SECONDS,
+        max_bytes=settings.CRAWL_MAX_BYTES,
+        user_agent=settings.CRAWL_USER_AGENT,
+        http2=settings.CRAWL_HTTP2,
+        max_redirects=settings.CRAWL_MAX_REDIRECTS,
+        robots_cache_size=settings.CRAWL_ROBOTS_CACHE_SIZE,
+        robots_cache_ttl=settings.CRAWL_ROBOTS_CACHE_TTL_SECONDS,
+        dns_cache_size=settings.CRAWL_DNS_CACHE_SIZE,
+        dns_cache_ttl=settings.CRAWL_DNS_CACHE_TTL_SECONDS,
+    )
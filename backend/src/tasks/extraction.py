@@ -0,0 +1,75 @@
+"""Extraction of the readable text of crawled pages."""
+
+from html.parser import HTMLParser
+from typing import List
+
+# Elements whose content is not part of the page's readable text: code,
+# metadata and, as boilerplate repeated on every page, navigation and footers
+_SKIPPED_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "head",
+    "nav", "footer", "aside", "form", "button", "select",
+}
+
+# Elements that start a new paragraph
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "br", "hr", "li", "ul", "ol", "dl", "dt", "dd",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "table", "tr", "td", "th", "figcaption",
+}
+
+# Media types whose text can be extracted
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
+TEXT_CONTENT_TYPES = HTML_CONTENT_TYPES | {"text/plain", "text/markdown"}
+
+
+class _TextExtractor(HTMLParser):
+    """Collects text outside of skipped elements, marking paragraph breaks."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipped_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skipped_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self._skipped_depth = max(self._skipped_depth - 1, 0)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skipped_depth:
+            self.parts.append(data)
+
+
+def extract_text(content: str, content_type: str) -> str:
+    """
+    Extract the readable text of a page.
+    
+    HTML is parsed with the standard library parser, which tolerates
+    malformed markup. Whitespace within paragraphs is collapsed.
+    
+    Args:
+        content: Decoded response body
+        content_type: Media type of the response, one of TEXT_CONTENT_TYPES
+        
+    Returns:
+        Text with paragraphs separated by blank lines
+    """
+    if content_type in HTML_CONTENT_TYPES:
+        parser = _TextExtractor()
+        parser.feed(content)
+        parser.close()
+        content = "".join(parser.parts)
+    else:
+        content = content.replace("\r\n", "\n")
+    paragraphs = (" ".join(paragraph.split()) for paragraph in content.split("\n\n"))
+    return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
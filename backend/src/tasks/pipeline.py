@@ -0,0 +1,373 @@
+"""
+URL ingestion pipeline: crawl, extract and chunk, embed, and store.
+
+Each stage is a Celery task routed to its own queue (see task_routes in
+src.tasks), so that every stage can be scaled independently: many
+I/O-bound workers on "crawl", CPU-bound workers on "embed". A URL's stages
+are chained, each one receiving the payload returned by the previous one,
+and URL.status moves through crawling, encoding and stored. Payloads stay
+small: the fetched page, chunk texts and embeddings are kept in a
+pipeline_artifacts row, which each stage reads by its ID and the store
+stage deletes with the chunks it writes. A stage that
+fails for good marks the URL as failed with the reason. Crawls are paced
+per host across all workers (see src.tasks.politeness): a crawl whose host
+is busy is re-queued with a countdown, and the URL stays pending meanwhile.
+
+Re-crawls are conditional: the page is requested with the validators
+(ETag, Last-Modified) stored with the URL's chunks, and its extracted text
+is hashed. When the server answers 304 Not Modified, or the text hash is
+unchanged, the URL goes straight back to stored, leaving the embedder and
+the chunks table alone. A forced run skips both checks.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from celery import Task, chain
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chunks.embeddings import embed_texts
+from src.chunks.service import replace_url_chunks
+from src.chunks.utils import split_text
+from src.config import settings
+from src.database import engine
+from src.models import URL, PipelineArtifact
+from src.tasks import app
+from src.tasks.crawler import CrawlError, Crawler, TransientCrawlError, get_crawler
+from src.tasks.extraction import extract_text
+from src.tasks.politeness import CrawlDeferred, HostRateLimiter, claim_slot, get_rate_limiter
+from src.urls.constants import URLStatus
+
+# Message passed between stages: the URL's "url_id" and "project_id", the
+# "artifact_id" of the run's pipeline_artifacts row, and small metadata of
+# the previous stage's output. None once the URL was deleted mid-pipeline,
+# or once it needs no further stages.
+Payload = Optional[Dict[str, Any]]
+
+# Event loop of this worker process, run by a background thread, and the
+# process it was started in (worker processes are forked)
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+def run_async(coro):
+    """
+    Run a coroutine on this worker process's event loop and wait for its result.
+    
+    Tasks are synchronous but the database layer and the crawler are async.
+    All tasks of a process share one loop, run by a background thread, since
+    the engine's pooled connections and the crawler's HTTP connections are
+    bound to the loop that opened them. With the threads pool (`-P threads`),
+    concurrent tasks of a process therefore fetch concurrently through the
+    shared crawler.
+    """
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="pipeline-event-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+class PipelineTask(Task):
+    """Base class of the pipeline tasks, marking the URL failed when a stage fails for good."""
+    ignore_result = True
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        payload = args[0] if args else None
+        if payload is not None:
+            stage = self.name.rsplit(".", 1)[-1]
+            run_async(_mark_failed(payload, f"{stage}: {exc}"))
+
+
+@app.task(
+    base=PipelineTask,
+    bind=True,
+    autoretry_for=(TransientCrawlError,),
+    retry_backoff=True,
+    max_retries=settings.CRAWL_MAX_RETRIES,
+)
+def crawl_url(self, payload: Payload, slot_reserved: bool = False) -> Payload:
+    """
+    Fetch the URL. Routed to the "crawl" queue.
+    
+    When the host has no free slot, the task is replaced by one counting down
+    to the host's next slot; the rest of the chain moves to the replacement.
+    Replacing does not count against max_retries.
+    """
+    # A retry after a transient error needs a slot of its own
+    slot_reserved = slot_reserved and not self.request.retries
+
+    async def run():
+        async with AsyncSession(engine) as session:
+            return await crawl(session, get_crawler(), get_rate_limiter(), payload, slot_reserved)
+    try:
+        return run_async(run())
+    except CrawlDeferred as deferred:
+        replacement = crawl_url.signature(
+            (payload,), {"slot_reserved": deferred.reserved}, countdown=deferred.delay
+        )
+        raise self.replace(replacement)
+
+
+@app.task(base=PipelineTask)
+def extract_url(payload: Payload) -> Payload:
+    """Extract the page's text and split it into chunks. Routed to the "extract" queue."""
+    async def run():
+        async with AsyncSession(engine) as session:
+            return await extract(session, payload)
+    return run_async(run())
+
+
+@app.task(base=PipelineTask)
+def embed_url(payload: Payload) -> Payload:
+    """Embed the chunks. Routed to the "embed" queue."""
+    async def run():
+        async with AsyncSession(engine) as session:
+            return await embed(session, payload)
+    return run_async(run())
+
+
+@app.task(base=PipelineTask)
+def store_url(payload: Payload) -> Payload:
+    """Replace the URL's chunks. Routed to the "store" queue."""
+    async def run():
+        async with AsyncSession(engine) as session:
+            return await store(session, payload)
+    return run_async(run())
+
+
+def enqueue_urls(urls: Sequence[Tuple[UUID, UUID]], force: bool = False) -> None:
+    """
+    Start the pipeline of each (url_id, project_id).
+    
+    The URLs must have been committed with status pending. Publishing blocks
+    while the broker is unreachable, so async callers run it in a thread.
+    
+    Args:
+        force: Fetch and embed the pages unconditionally, even if unchanged
+    """
+    for url_id, project_id in urls:
+        payload = {"url_id": str(url_id), "project_id": str(project_id), "force": force}
+        chain(crawl_url.s(payload), extract_url.s(), embed_url.s(), store_url.s()).apply_async()
+
+
+async def crawl(
+    session: AsyncSession,
+    crawler: Crawler,
+    limiter: HostRateLimiter,
+    payload: Payload,
+    slot_reserved: bool = False,
+) -> Payload:
+    """
+    Claim a slot of the URL's host, then move the URL to crawling and fetch it.
+    
+    The page is fetched conditionally on the stored validators, unless the
+    payload has "force" set.
+    
+    Args:
+        slot_reserved: Whether a slot was already reserved when the crawl was deferred
+    
+    Returns:
+        The payload with the "artifact_id" holding the decoded page, the new
+        "etag" and "last_modified", and the "stored_hash" of the stored
+        chunks' text (None when forced); None if the page is not modified
+    
+    Raises:
+        CrawlDeferred: If the host has no free slot now; the URL is left unchanged
+    """
+    if payload is None:
+        return None
+    url = (
+        await session.execute(
+            select(URL.original_url, URL.etag, URL.last_modified, URL.content_hash).where(
+                URL.url_id == UUID(payload["url_id"]), URL.project_id == UUID(payload["project_id"])
+            )
+        )
+    ).first()
+    if url is None:
+        return None
+    etag, last_modified, stored_hash = url.etag, url.last_modified, url.content_hash
+    if payload.get("force"):
+        etag = last_modified = stored_hash = None
+    if not slot_reserved:
+        await claim_slot(session, limiter, url.original_url)
+    if await _set_status(session, payload, URLStatus.CRAWLING) is None:
+        return None
+    page = await crawler.fetch(url.original_url, etag, last_modified)
+    if page is None:
+        await _mark_stored(session, payload)
+        return None
+    artifact = PipelineArtifact(url_id=UUID(payload["url_id"]), page=page.content, content_type=page.content_type)
+    session.add(artifact)
+    await session.commit()
+    return {
+        **payload,
+        "artifact_id": str(artifact.artifact_id),
+        "etag": page.etag,
+        "last_modified": page.last_modified,
+        "stored_hash": stored_hash,
+    }
+
+
+async def extract(session: AsyncSession, payload: Payload) -> Payload:
+    """
+    Extract the page's text and split it into chunks, replacing the page in its artifact.
+    
+    Parsing and splitting run in a worker thread, off the event loop shared
+    with the process's other tasks.
+    
+    Returns:
+        The payload with the text's "content_hash"; without an artifact but
+        "unchanged" if the text hashes like the stored chunks' text
+    """
+    if payload is None:
+        return None
+    artifact = await _artifact(session, payload)
+    if artifact is None:
+        return None
+    text = await run_in_threadpool(extract_text, artifact.page, artifact.content_type)
+    result = {
+        "url_id": payload["url_id"],
+        "project_id": payload["project_id"],
+        "artifact_id": payload["artifact_id"],
+        "etag": payload.get("etag"),
+        "last_modified": payload.get("last_modified"),
+        "content_hash": hashlib.sha256(text.encode()).hexdigest(),
+    }
+    if result["content_hash"] == payload.get("stored_hash"):
+        await session.delete(artifact)
+        await session.commit()
+        del result["artifact_id"]
+        return {**result, "unchanged": True}
+    contents = await run_in_threadpool(split_text, text, settings.CHUNK_MAX_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+    if not contents:
+        raise CrawlError("No text content")
+    artifact.page = None
+    artifact.content_type = None
+    artifact.contents = contents
+    await session.commit()
+    return result
+
+
+async def embed(session: AsyncSession, payload: Payload) -> Payload:
+    """
+    Move the URL to encoding and embed its chunks, or to stored if its text is unchanged.
+    
+    The model runs in a worker thread, off the event loop shared with the
+    process's other tasks, and the embeddings are saved to the artifact.
+    
+    Returns:
+        The payload; None if unchanged
+    """
+    if payload is None:
+        return None
+    if payload.get("unchanged"):
+        await _mark_stored(session, payload)
+        return None
+    if await _set_status(session, payload, URLStatus.ENCODING) is None:
+        return None
+    artifact = await _artifact(session, payload)
+    if artifact is None:
+        return None
+    embeddings = await run_in_threadpool(embed_texts, artifact.contents)
+    artifact.embeddings = np.asarray(embeddings, dtype=np.float32).tobytes()
+    await session.commit()
+    return payload
+
+
+async def store(session: AsyncSession, payload: Payload) -> Payload:
+    """
+    Replace the URL's chunks, mark it stored and delete its artifact, in one transaction.
+    
+    Returns:
+        The payload with the "chunk_count" stored
+    """
+    if payload is None:
+        return None
+    url_id, project_id = UUID(payload["url_id"]), UUID(payload["project_id"])
+    url = await session.get(URL, url_id)
+    if url is None or url.project_id != project_id:
+        return None
+    artifact = await _artifact(session, payload)
+    if artifact is None:
+        return None
+    contents = artifact.contents
+    embeddings = np.frombuffer(artifact.embeddings, dtype=np.float32).reshape(len(contents), -1)
+    await session.delete(artifact)
+    url.status = URLStatus.STORED.value
+    url.failure_reason = None
+    url.last_updated_at = datetime.now()
+    url.etag = payload.get("etag")
+    url.last_modified = payload.get("last_modified")
+    url.content_hash = payload.get("content_hash")
+    # Commits the status and the artifact's deletion with the chunks
+    chunk_count = await replace_url_chunks(session, url_id, project_id, contents, embeddings)
+    return {"url_id": payload["url_id"], "project_id": payload["project_id"], "chunk_count": chunk_count}
+
+
+async def _artifact(session: AsyncSession, payload: Dict[str, Any]) -> Optional[PipelineArtifact]:
+    """Load the payload's artifact, or None if its URL was deleted since."""
+    artifact = await session.get(PipelineArtifact, UUID(payload["artifact_id"]))
+    if artifact is None or artifact.url_id != UUID(payload["url_id"]):
+        return None
+    return artifact
+
+
+async def _set_status(session: AsyncSession, payload: Dict[str, Any], status: URLStatus) -> Optional[str]:
+    """
+    Move a URL to a pipeline status, clearing any previous failure.
+    
+    Returns:
+        The URL's address, or None if it was deleted since it was enqueued
+    """
+    original_url = await session.scalar(
+        update(URL)
+        .where(URL.url_id == UUID(payload["url_id"]), URL.project_id == UUID(payload["project_id"]))
+        .values(status=status.value, failure_reason=None, last_updated_at=datetime.now())
+        .returning(URL.original_url)
+    )
+    await session.commit()
+    return original_url
+
+
+async def _mark_stored(session: AsyncSession, payload: Dict[str, Any]) -> None:
+    """
+    Move a URL whose page is unchanged back to stored, keeping its chunks.
+    
+    Validators in the payload replace the stored ones, since a server may
+    send a new ETag for the same text.
+    """
+    values = {"status": URLStatus.STORED.value, "failure_reason": None, "last_updated_at": datetime.now()}
+    values.update({key: payload[key] for key in ("etag", "last_modified") if key in payload})
+    await session.execute(
+        update(URL)
+        .where(URL.url_id == UUID(payload["url_id"]), URL.project_id == UUID(payload["project_id"]))
+        .values(**values)
+    )
+    await session.commit()
+
+
+async def _mark_failed(payload: Dict[str, Any], reason: str) -> None:
+    """Mark a URL failed after one of its stages failed for good, dropping its artifact."""
+    async with AsyncSession(engine) as session:
+        if "artifact_id" in payload:
+            await session.execute(
+                delete(PipelineArtifact).where(PipelineArtifact.artifact_id == UUID(payload["artifact_id"]))
+            )
+        await session.execute(
+            update(URL)
+            .where(URL.url_id == UUID(payload["url_id"]), URL.project_id == UUID(payload["project_id"]))
+            .values(status=URLStatus.FAILED.value, failure_reason=reason, last_updated_at=datetime.now())
+        )
+        await session.commit()
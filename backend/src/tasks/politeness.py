@@ -0,0 +1,136 @@
+"""
+Cluster-wide crawl politeness: per-host token buckets shared by all workers.
+
+Each host's bucket is kept as the theoretical arrival time of its next
+request (the generic cell rate algorithm): a request may start once that
+time, less the burst tolerance, has passed, and each request pushes it
+forward by one refill interval. A crawl claims the host's next slot before
+fetching; when that slot lies in the future, the slot stays reserved and
+the crawl is re-queued to run at it, so workers never sleep on a busy host
+and always pull crawlable work instead.
+"""
+
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Protocol
+from urllib.parse import urlsplit
+
+from sqlalchemy import bindparam, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import CrawlHostSlot
+
+_SECOND = literal_column("interval '1 second'")
+
+
+class CrawlDeferred(Exception):
+    """
+    Raised when a URL's host has no free crawl slot now.
+
+    Attributes:
+        delay: Seconds after which to run the crawl again
+        reserved: Whether a slot was reserved for the crawl at that time
+    """
+
+    def __init__(self, delay: float, reserved: bool):
+        super().__init__(f"Host busy for {delay:.1f}s")
+        self.delay = delay
+        self.reserved = reserved
+
+
+class HostRateLimiter(Protocol):
+    """Interface implemented by all host rate limiters."""
+
+    async def reserve(self, session: AsyncSession, host: str, max_delay: float) -> Optional[float]:
+        """
+        Reserve the host's next request slot.
+
+        Returns:
+            Seconds until the reserved slot, 0 if a request may start now, or
+            None (reserving nothing) if no slot is free within max_delay
+        """
+        ...
+
+
+class MemoryHostRateLimiter:
+    """Host rate limiter keeping its buckets in this process, for tests and local development."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self._interval = 1.0 / rate
+        self._tolerance = (max(burst, 1) - 1) * self._interval
+        self._clock = clock
+        self._next_slots: Dict[str, float] = {}
+
+    async def reserve(self, session: AsyncSession, host: str, max_delay: float) -> Optional[float]:
+        now = self._clock()
+        next_slot = max(self._next_slots.get(host, now), now)
+        delay = max(next_slot - self._tolerance - now, 0.0)
+        if delay > max_delay:
+            return None
+        self._next_slots[host] = next_slot + self._interval
+        return delay
+
+
+class PostgresHostRateLimiter:
+    """
+    Host rate limiter keeping its buckets in the crawl_host_slots table.
+
+    A reservation is a single upsert, so concurrent workers never hand out
+    the same slot and no row lock is held across a fetch.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self._interval = 1.0 / rate
+        self._tolerance = (max(burst, 1) - 1) * self._interval
+
+    async def reserve(self, session: AsyncSession, host: str, max_delay: float) -> Optional[float]:
+        slots = CrawlHostSlot.__table__
+        interval = _SECOND * bindparam("interval", self._interval)
+        tolerance = _SECOND * bindparam("tolerance", self._tolerance)
+        next_slot = func.greatest(slots.c.next_slot_at, func.now())
+        statement = (
+            insert(slots)
+            .values(host=host, next_slot_at=func.now() + interval)
+            .on_conflict_do_update(
+                index_elements=[slots.c.host],
+                set_={"next_slot_at": next_slot + interval},
+                where=next_slot - tolerance <= func.now() + _SECOND * bindparam("max_delay", max_delay),
+            )
+            # Evaluated on the updated row, whose slot is one interval later
+            .returning(
+                func.extract(
+                    "epoch", func.greatest(slots.c.next_slot_at - interval - tolerance, func.now()) - func.now()
+                )
+            )
+        )
+        delay = await session.scalar(statement)
+        await session.commit()
+        return None if delay is None else float(delay)
+
+
+async def claim_slot(session: AsyncSession, limiter: HostRateLimiter, url: str) -> None:
+    """
+    Claim a crawl slot of the URL's host.
+
+    Raises:
+        CrawlDeferred: If the host's next slot is not free now
+    """
+    host = urlsplit(url).hostname
+    if host is None:
+        return
+    max_delay = settings.CRAWL_MAX_SCHEDULE_DELAY_SECONDS
+    delay = await limiter.reserve(session, host, max_delay)
+    if delay is None:
+        raise CrawlDeferred(max_delay, reserved=False)
+    if delay > 0:
+        raise CrawlDeferred(delay, reserved=True)
+
+
+@lru_cache
+def get_rate_limiter() -> HostRateLimiter:
+    """Get the process-wide host rate limiter configured in settings."""
+    if settings.CRAWL_RATE_LIMITER == "memory":
+        return MemoryHostRateLimiter(settings.CRAWL_HOST_RATE, settings.CRAWL_HOST_BURST)
+    return PostgresHostRateLimiter(settings.CRAWL_HOST_RATE, settings.CRAWL_HOST_BURST)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Path, status
+from fastapi import APIRouter, Depends, Path, Query, status
 from typing import List, Optional
 from pydantic import UUID4
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -132,6 +132,7 @@ async def reprocess_url(
     url = Depends(get_url_or_404),
     project_id: UUID4 = Path(..., description="The ID of the project"),
     url_id: UUID4 = Path(..., description="The ID of the URL to reprocess"),
+    force: bool = Query(False, description="Re-embed the page even if it is unchanged"),
     session: AsyncSession = Depends(get_db),
 ):
     """
@@ -139,7 +140,7 @@ async def reprocess_url(
     
     This will reset the URL status to 'pending' and clear any failure reason.
     """
-    url = await service.reprocess_url(session=session, url_id=url_id, project_id=project_id)
+    url = await service.reprocess_url(session=session, url_id=url_id, project_id=project_id, force=force)
     return url
 
 
@@ -1,17 +1,51 @@
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pydantic import UUID4
 from sqlalchemy import select, update, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session
+from fastapi.concurrency import run_in_threadpool
 
+from src.chunks.service import apply_index_change, bump_index_generation
 from src.database import engine
 from src.models import URL, Project
+from src.tasks.pipeline import enqueue_urls
 from src.urls.constants import URLStatus
 from src.urls.exceptions import DuplicateURLException
 
 
+async def _enqueue(
+    session: AsyncSession, urls: List[Tuple[UUID4, UUID4]], force: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Start the pipelines of committed (url_id, project_id) pairs.
+    
+    If the broker cannot be reached, the URLs are marked failed, so they can
+    be reprocessed instead of staying pending forever. A pipeline that was
+    published before the error moves its URL on from failed as usual.
+    
+    Returns:
+        The values the URLs were updated with, or None if all were enqueued
+    """
+    if not urls:
+        return None
+    try:
+        await run_in_threadpool(enqueue_urls, urls, force)
+        return None
+    except Exception as e:
+        values = {
+            "status": URLStatus.FAILED.value,
+            "failure_reason": f"Could not be queued for processing: {type(e).__name__}",
+            "last_updated_at": datetime.now(),
+        }
+        await session.execute(
+            update(URL).where(URL.url_id.in_([url_id for url_id, _ in urls])).values(**values)
+        )
+        await session.commit()
+        return values
+
+
 async def get_url_by_id(session: AsyncSession, url_id: UUID4, project_id: UUID4) -> Optional[Dict[str, Any]]:
     """Get a URL by ID."""
     query = select(URL).where(and_(URL.url_id == url_id, URL.project_id == project_id))
@@ -56,7 +90,7 @@ async def get_urls_by_project(session: AsyncSession, project_id: UUID4, status:
 
 
 async def create_url(session: AsyncSession, project_id: UUID4, original_url: str) -> Dict[str, Any]:
-    """Create a new URL for processing."""
+    """Create a new URL and start its ingestion pipeline."""
     # First, check if the URL already exists in this project
     query = select(URL).where(and_(URL.project_id == project_id, URL.original_url == original_url))
     result = await session.execute(query)
@@ -85,6 +119,8 @@ async def create_url(session: AsyncSession, project_id: UUID4, original_url: str
     session.add(url)
     await session.commit()
     await session.refresh(url)
+    if await _enqueue(session, [(url.url_id, url.project_id)]):
+        await session.refresh(url)
     
     return {
         "url_id": url.url_id,
@@ -98,7 +134,7 @@ async def create_url(session: AsyncSession, project_id: UUID4, original_url: str
 
 
 async def batch_create_urls(session: AsyncSession, project_id: UUID4, urls: List[str]) -> Dict[str, Any]:
-    """Create multiple URLs for processing."""
+    """Create multiple URLs and start their ingestion pipelines."""
     submitted_urls = []
     duplicate_urls = []
     
@@ -141,6 +177,10 @@ async def batch_create_urls(session: AsyncSession, project_id: UUID4, urls: List
         })
     
     await session.commit()
+    failed = await _enqueue(session, [(url["url_id"], url["project_id"]) for url in submitted_urls])
+    if failed:
+        for url in submitted_urls:
+            url.update(failed)
     
     return {
         "submitted_urls": submitted_urls,
@@ -148,8 +188,17 @@ async def batch_create_urls(session: AsyncSession, project_id: UUID4, urls: List
     }
 
 
-async def reprocess_url(session: AsyncSession, url_id: UUID4, project_id: UUID4) -> Dict[str, Any]:
-    """Reset URL status to pending for reprocessing."""
+async def reprocess_url(
+    session: AsyncSession, url_id: UUID4, project_id: UUID4, force: bool = False
+) -> Dict[str, Any]:
+    """
+    Reset URL status to pending and restart its ingestion pipeline.
+    
+    The page is re-fetched conditionally; if it is not modified, or its text
+    is unchanged, the URL goes back to stored without re-embedding its chunks.
+    With force, the page is always re-fetched and re-embedded, e.g. after the
+    embedding model or the chunking settings changed.
+    """
     # First get the URL
     query = select(URL).where(and_(URL.url_id == url_id, URL.project_id == project_id))
     result = await session.execute(query)
@@ -164,6 +213,8 @@ async def reprocess_url(session: AsyncSession, url_id: UUID4, project_id: UUID4)
         
         await session.commit()
         await session.refresh(url)
+        if await _enqueue(session, [(url.url_id, url.project_id)], force):
+            await session.refresh(url)
     
     return {
         "url_id": url.url_id,
@@ -185,4 +236,9 @@ async def delete_url(session: AsyncSession, url_id: UUID4, project_id: UUID4) ->
     
     if url:
         await session.delete(url)
+        # Deleting the URL deletes its chunks
+        generation = await bump_index_generation(session, project_id, url_id)
         await session.commit()
+        await apply_index_change(
+            session, project_id, generation, lambda backend: backend.remove_url(project_id, url_id, generation)
+        )
@@ -1,8 +1,22 @@
+from typing import Dict
+
 from fastapi import APIRouter
 
+from src.chunks.embeddings import query_embedding_cache
+from src.chunks.service import search_result_cache
+
 router = APIRouter(prefix="/utils", tags=["utils"])
 
 
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get("/cache-stats/")
+async def cache_stats() -> Dict[str, dict]:
+    """Size and hit/miss counters of this API process's in-process caches."""
+    return {
+        "query_embeddings": query_embedding_cache.stats,
+        "search_results": search_result_cache.stats,
+    }
@@ -0,0 +1,197 @@
+"""Tests for the in-process vector search backends."""
+
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import select, update
+
+from src.chunks import backends, service
+from src.chunks.backends import NumpyVectorBackend, SearchScope, _ProjectIndex
+from src.chunks.embeddings import embed_texts
+from src.chunks.service import replace_url_chunks
+from src.models import URL, Chunk, IndexChange, Project, User
+
+
+@pytest.fixture
+async def project_with_urls(db_session):
+    """Create a project with two URLs of two chunks each."""
+    user = User(user_id=uuid.uuid4(), email="backends@example.com", password_hash="hashed_password")
+    project = Project(project_id=uuid.uuid4(), user_id=user.user_id, project_name="Backend Project")
+    urls = [
+        URL(url_id=uuid.uuid4(), project_id=project.project_id, original_url=f"https://example.com/{i}", status="stored")
+        for i in range(2)
+    ]
+    contents = [["vector search", "hnsw graphs"], ["weather forecast", "humid summer"]]
+    chunks = [
+        Chunk(
+            chunk_id=uuid.uuid4(),
+            url_id=url.url_id,
+            project_id=project.project_id,
+            content=content,
+            chunk_index=index,
+            embedding=embed_texts([content])[0].tolist(),
+            created_at=datetime.now(timezone.utc),
+        )
+        for url, url_contents in zip(urls, contents)
+        for index, content in enumerate(url_contents)
+    ]
+    db_session.add_all([user, project, *urls, *chunks])
+    await db_session.commit()
+    return project, urls, chunks
+
+
+def test_project_index_search_matches_full_sort():
+    """argpartition returns the same top-k as sorting all similarities."""
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(200, 16)).astype(np.float32)
+    url_id = uuid.uuid4()
+    index = _ProjectIndex.build(0, [(i, url_id, embedding) for i, embedding in enumerate(embeddings)])
+    query = rng.normal(size=(1, 16)).astype(np.float32)
+    query /= np.linalg.norm(query)
+
+    [(chunk_ids, similarities)] = index.search(query, 10, None, None)
+
+    expected = np.argsort(-(index.matrix @ query[0]))[:10]
+    assert chunk_ids.tolist() == expected.tolist()
+    assert np.all(np.diff(similarities) <= 0)
+
+
+async def test_search_filters_by_url(db_session, project_with_urls):
+    project, urls, chunks = project_with_urls
+    backend = NumpyVectorBackend()
+
+    [found] = await backend.search(
+        db_session, embed_texts(["vector search"]), top_k=5, scope=SearchScope((project.project_id,), urls[0].url_id)
+    )
+
+    assert [chunk_id for chunk_id, _ in found][0] == chunks[0].chunk_id
+    assert {chunk_id for chunk_id, _ in found} == {chunks[0].chunk_id, chunks[1].chunk_id}
+
+
+async def test_replace_url_updates_loaded_index_incrementally(db_session, project_with_urls):
+    """Writes at the next generation are applied without reloading the project."""
+    project, urls, chunks = project_with_urls
+    backend = NumpyVectorBackend()
+    scope = SearchScope((project.project_id,))
+    await backend.search(db_session, embed_texts(["vector search"]), top_k=5, scope=scope)
+    loaded = backend._indexes[project.project_id]
+
+    new_chunk_id = uuid.uuid4()
+    await db_session.execute(
+        update(Project).where(Project.project_id == project.project_id).values(index_generation=1)
+    )
+    await db_session.commit()
+    backend.replace_url(project.project_id, urls[1].url_id, 1, [new_chunk_id], embed_texts(["rainy autumn"]))
+
+    index = backend._indexes[project.project_id]
+    assert index is not loaded
+    assert index.generation == 1
+    assert set(index.chunk_ids) == {chunks[0].chunk_id, chunks[1].chunk_id, new_chunk_id}
+    [found] = await backend.search(db_session, embed_texts(["rainy autumn"]), top_k=1, scope=scope)
+    assert found[0][0] == new_chunk_id
+    assert backend._indexes[project.project_id] is index
+
+
+async def test_stale_index_is_reloaded(db_session, project_with_urls):
+    """A write this process did not see reloads the project on the next search."""
+    project, _, chunks = project_with_urls
+    backend = NumpyVectorBackend()
+    scope = SearchScope((project.project_id,))
+    await backend.search(db_session, embed_texts(["vector search"]), top_k=5, scope=scope)
+
+    await db_session.delete(chunks[0])
+    await db_session.execute(
+        update(Project).where(Project.project_id == project.project_id).values(index_generation=1)
+    )
+    await db_session.commit()
+
+    [found] = await backend.search(db_session, embed_texts(["vector search"]), top_k=5, scope=scope)
+    assert chunks[0].chunk_id not in {chunk_id for chunk_id, _ in found}
+    assert len(found) == 3
+
+
+async def test_index_catches_up_from_change_log(db_session, project_with_urls, monkeypatch):
+    """Writes made elsewhere are applied from index_changes without reloading the project."""
+    project, urls, chunks = project_with_urls
+    backend = NumpyVectorBackend()
+    scope = SearchScope((project.project_id,))
+    await backend.search(db_session, embed_texts(["vector search"]), top_k=5, scope=scope)
+
+    # Applied to the process-wide backend, not to this one
+    await replace_url_chunks(
+        db_session, urls[1].url_id, project.project_id, ["rainy autumn"], embed_texts(["rainy autumn"])
+    )
+
+    async def fail(*args):
+        raise AssertionError("project reloaded")
+
+    monkeypatch.setattr(backends, "_project_rows", fail)
+    [found] = await backend.search(db_session, embed_texts(["rainy autumn"]), top_k=5, scope=scope)
+    assert backend._indexes[project.project_id].generation == 1
+    assert len(found) == 3
+    assert found[0][0] not in {chunk.chunk_id for chunk in chunks}
+
+
+async def test_faiss_backend_reuses_snapshots(db_session, project_with_urls, tmp_path):
+    """A new process opens the published snapshot and catches up from the change log."""
+    pytest.importorskip("faiss")
+    project, urls, chunks = project_with_urls
+    scope = SearchScope((project.project_id,))
+    first = backends.FaissVectorBackend(str(tmp_path))
+    [found] = await first.search(db_session, embed_texts(["vector search"]), top_k=1, scope=scope)
+    assert found[0][0] == chunks[0].chunk_id
+
+    await replace_url_chunks(
+        db_session, urls[0].url_id, project.project_id, ["rainy autumn"], embed_texts(["rainy autumn"])
+    )
+    second = backends.FaissVectorBackend(str(tmp_path))
+    [found] = await second.search(db_session, embed_texts(["vector search"]), top_k=5, scope=scope)
+
+    state = second._indexes[project.project_id]
+    assert state.snapshot_generation == 0
+    assert state.generation == 1
+    assert chunks[0].chunk_id not in {chunk_id for chunk_id, _ in found}
+    assert len(found) == 3
+
+
+async def test_faiss_backend_prunes_change_log(db_session, project_with_urls, tmp_path, monkeypatch):
+    """Changes covered by every snapshot are pruned; older indexes reopen the snapshot."""
+    pytest.importorskip("faiss")
+    project, urls, chunks = project_with_urls
+    scope = SearchScope((project.project_id,))
+    backend = backends.FaissVectorBackend(str(tmp_path))
+    monkeypatch.setattr(service, "get_vector_backend", lambda: backend)
+    monkeypatch.setattr(backends.settings, "VECTOR_INDEX_SNAPSHOT_INTERVAL", 1)
+    stale = backends.FaissVectorBackend(str(tmp_path))
+    await stale.search(db_session, embed_texts(["vector search"]), top_k=1, scope=scope)
+    await backend.search(db_session, embed_texts(["vector search"]), top_k=1, scope=scope)
+
+    for generation, content in enumerate(["rainy autumn", "snowy winter"], start=1):
+        await replace_url_chunks(db_session, urls[0].url_id, project.project_id, [content], embed_texts([content]))
+        assert backend._indexes[project.project_id].snapshot_generation == generation
+
+    changes = (await db_session.execute(select(IndexChange.generation))).scalars().all()
+    assert changes == []
+
+    async def fail(*args):
+        raise AssertionError("project reloaded")
+
+    monkeypatch.setattr(backends, "_project_rows", fail)
+    [found] = await stale.search(db_session, embed_texts(["snowy winter"]), top_k=5, scope=scope)
+    assert stale._indexes[project.project_id].generation == 2
+    assert len(found) == 3
+    assert chunks[0].chunk_id not in {chunk_id for chunk_id, _ in found}
+
+
+async def test_change_log_is_pruned_without_backend_horizon(db_session, project_with_urls, monkeypatch):
+    """Backends without snapshots keep only VECTOR_INDEX_CHANGE_LOG_RETENTION generations of the log."""
+    project, urls, _ = project_with_urls
+    monkeypatch.setattr(service.settings, "VECTOR_INDEX_CHANGE_LOG_RETENTION", 1)
+    
+    for content in ["rainy autumn", "snowy winter", "sunny spring"]:
+        await replace_url_chunks(db_session, urls[1].url_id, project.project_id, [content], embed_texts([content]))
+    
+    changes = (await db_session.execute(select(IndexChange.generation))).scalars().all()
+    assert changes == [3]
@@ -0,0 +1,26 @@
+"""Tests for the chunk table definition."""
+
+from sqlalchemy import DDL
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from src.chunks.constants import CHUNK_PARTITION_COUNT
+from src.models import Chunk
+
+
+def test_chunks_table_is_hash_partitioned_by_project():
+    """The chunks table is hash-partitioned on project_id on PostgreSQL."""
+    ddl = str(CreateTable(Chunk.__table__).compile(dialect=postgresql.dialect()))
+    
+    assert "PARTITION BY HASH (project_id)" in ddl
+    # The partition key must be part of the primary key
+    assert {column.name for column in Chunk.__table__.primary_key} == {"chunk_id", "project_id"}
+
+
+def test_chunk_partitions_created_with_table():
+    """Creating the table on PostgreSQL also creates every hash partition."""
+    statements = [listener.statement for listener in Chunk.__table__.dispatch.after_create if isinstance(listener, DDL)]
+    partitions = [statement for statement in statements if "PARTITION OF chunks" in statement]
+    
+    assert len(partitions) == CHUNK_PARTITION_COUNT
+    assert f"MODULUS {CHUNK_PARTITION_COUNT}, REMAINDER 0" in partitions[0]
@@ -0,0 +1,829 @@
+"""Tests for the chunk service layer."""
+
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from src.chunks import service
+from src.chunks.backends import SearchScope
+from src.chunks.constants import SearchMode
+from src.chunks.exceptions import InvalidQueryException
+from src.config import settings
+from src.chunks import embeddings
+from src.chunks.embeddings import HashingEmbedder, embed_query, embed_texts, embedding_array
+from src.chunks.rerankers import RerankExecutor, TermOverlapReranker
+from src.chunks.schemas import SearchFilters
+from src.chunks.utils import count_tokens, split_text
+from src.models import URL, Chunk, Project, User
+
+
+CONTENTS = [
+    "Vector databases enable fast similarity search over embeddings.",
+    "The weather in Taipei is humid during the summer months.",
+    "HNSW graphs trade recall against latency with the ef_search parameter.",
+]
+
+
+@pytest.fixture
+async def url_with_chunks(db_session):
+    """Create a URL whose chunks are embedded with the configured embedder."""
+    user = User(user_id=uuid.uuid4(), email="chunk_service@example.com", password_hash="hashed_password")
+    project = Project(project_id=uuid.uuid4(), user_id=user.user_id, project_name="Chunk Service Project")
+    url = URL(
+        url_id=uuid.uuid4(),
+        project_id=project.project_id,
+        original_url="https://example.com/vectors",
+        status="stored",
+    )
+    db_session.add_all([user, project, url])
+    
+    embeddings = embed_texts(CONTENTS)
+    chunks = [
+        Chunk(
+            chunk_id=uuid.uuid4(),
+            url_id=url.url_id,
+            project_id=project.project_id,
+            content=content,
+            chunk_index=index,
+            embedding=embeddings[index].tolist(),
+            created_at=datetime.now(timezone.utc),
+        )
+        for index, content in enumerate(CONTENTS)
+    ]
+    db_session.add_all(chunks)
+    await db_session.commit()
+    return project, url, chunks
+
+
+def test_hashing_embedder_is_deterministic():
+    """The hashing embedder returns identical vectors for identical text."""
+    embedder = HashingEmbedder(dimensions=384)
+    first, second, other = embedder.embed(["similarity search", "similarity search", "weather"])
+    
+    assert first.shape == (384,)
+    assert (first == second).all()
+    assert not (first == other).all()
+
+
+async def test_embed_query_caches_normalized_queries(monkeypatch):
+    """Queries differing only in whitespace are embedded once."""
+    embed = MagicMock(wraps=embed_texts)
+    monkeypatch.setattr(embeddings, "embed_texts", embed)
+    
+    first = await embed_query("vector  databases")
+    second = await embed_query(" vector databases\n")
+    
+    assert first == second
+    embed.assert_called_once_with(["vector databases"])
+    assert embeddings.query_embedding_cache.hits == 1
+    assert embeddings.query_embedding_cache.misses == 1
+
+
+async def test_replace_url_chunks_stores_normalized_embeddings(db_session, url_with_chunks):
+    """Replacing a URL's chunks stores unit-length embeddings in document order."""
+    project, url, _ = url_with_chunks
+    raw_embeddings = HashingEmbedder(dimensions=384).embed(["first new chunk", "second new chunk"]) * 7
+    
+    stored = await service.replace_url_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        contents=["first new chunk", "second new chunk"],
+        embeddings=raw_embeddings,
+    )
+    
+    chunks = await service.get_chunks_by_url(
+        session=db_session, url_id=url.url_id, project_id=project.project_id, include_vectors=True
+    )
+    assert stored == 2
+    assert [chunk.content for chunk in chunks] == ["first new chunk", "second new chunk"]
+    assert [chunk.chunk_index for chunk in chunks] == [0, 1]
+    for chunk in chunks:
+        assert np.linalg.norm(chunk.embedding) == pytest.approx(1.0, abs=1e-3)
+
+
+async def test_query_chunks_ranks_by_similarity(db_session, url_with_chunks):
+    """Query results are ordered by decreasing cosine similarity."""
+    project, url, chunks = url_with_chunks
+    
+    response = await service.query_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        query=CONTENTS[2],
+        top_k=2,
+    )
+    
+    assert len(response.results) == 2
+    assert response.results[0].chunk_id == chunks[2].chunk_id
+    assert response.results[0].similarity_score == pytest.approx(1.0, abs=1e-3)
+    assert response.results[0].similarity_score >= response.results[1].similarity_score
+
+
+async def test_embed_queries_embeds_cache_misses_in_one_call(monkeypatch):
+    """Batched queries share one model call and reuse cached embeddings."""
+    await embed_query("cached query")
+    embed = MagicMock(wraps=embed_texts)
+    monkeypatch.setattr(embeddings, "embed_texts", embed)
+    
+    vectors = await embeddings.embed_queries(["first", "cached query", "second", "first"])
+    
+    embed.assert_called_once_with(["first", "second"])
+    assert vectors[0] == vectors[3]
+    assert vectors[1] == await embed_query("cached query")
+
+
+async def test_batch_query_chunks_matches_single_queries(db_session, url_with_chunks):
+    """Each batched query returns the same results as the equivalent single query."""
+    project, url, _ = url_with_chunks
+    queries = [CONTENTS[2], CONTENTS[1]]
+    
+    batch = await service.batch_query_chunks(
+        session=db_session, url_id=url.url_id, project_id=project.project_id, queries=queries, top_k=2
+    )
+    
+    for query, response in zip(queries, batch.results):
+        single = await service.query_chunks(
+            session=db_session, url_id=url.url_id, project_id=project.project_id, query=query, top_k=2
+        )
+        assert [result.chunk_id for result in response.results] == [result.chunk_id for result in single.results]
+
+
+async def test_batch_nearest_chunks_uses_lateral_join():
+    """Batched searches unnest the query vectors and join them LATERAL to the top-k subquery."""
+    session = _postgres_session(settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD + 1)
+    row = SimpleNamespace(query_index=2, chunk_id="chunk")
+    session.execute.return_value.all.return_value = [row]
+    
+    results = await service._batch_nearest_chunks(
+        session, [[0.1] * 384, [0.2] * 384], top_k=3, ef_search=None, scope=SearchScope((uuid.uuid4(),))
+    )
+    
+    assert results == [[], [row]]
+    search_sql = str(session.execute.await_args_list[1].args[0].compile(dialect=postgresql.dialect()))
+    assert "FROM unnest(CAST(" in search_sql
+    assert "WITH ORDINALITY AS queries(embedding, query_index) JOIN LATERAL" in search_sql
+    assert "chunks.embedding <#> queries.embedding AS distance" in search_sql
+    # The candidate subquery is correlated rather than joined to its own unnest()
+    assert search_sql.count("unnest(") == 1
+
+
+async def test_query_chunks_mmr_diversifies_near_duplicates(db_session, url_with_chunks):
+    """MMR replaces duplicate paragraphs with distinct relevant chunks."""
+    project, url, _ = url_with_chunks
+    contents = [
+        "HNSW index recall depends on ef_search.",
+        "HNSW index recall depends on ef_search.",
+        "HNSW index build time depends on m and ef_construction.",
+    ]
+    await service.replace_url_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        contents=contents,
+        embeddings=embed_texts(contents),
+    )
+    
+    async def search(**mmr):
+        response = await service.query_chunks(
+            session=db_session,
+            url_id=url.url_id,
+            project_id=project.project_id,
+            query="HNSW index recall",
+            top_k=2,
+            **mmr,
+        )
+        return [result.content for result in response.results]
+    
+    assert await search() == contents[:2]
+    assert await search(mmr_lambda=0.5, mmr_fetch_multiplier=2) == [contents[0], contents[2]]
+
+
+def test_term_overlap_reranker_scores_query_term_coverage():
+    """The stand-in reranker scores the fraction of query terms in each text."""
+    scores = TermOverlapReranker().score("HNSW ef_search", ["Tuning ef_search for HNSW", "HNSW graphs", "weather"])
+    
+    assert scores.tolist() == [1.0, 0.5, 0.0]
+
+
+async def test_query_chunks_reranks_candidates(db_session, url_with_chunks):
+    """Reranking reorders the retrieved candidates by reranker score."""
+    project, url, chunks = url_with_chunks
+    
+    response = await service.query_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        query="weather in Taipei",
+        top_k=2,
+        rerank=True,
+    )
+    
+    assert response.results[0].chunk_id == chunks[1].chunk_id
+    assert response.results[0].rerank_score == pytest.approx(1.0)
+    assert response.results[0].rerank_score >= response.results[1].rerank_score
+
+
+async def test_query_chunks_rerank_falls_back_to_retrieval_order(db_session, url_with_chunks, monkeypatch):
+    """Reranking that exceeds its budget keeps the retrieval order and is not cached."""
+    project, url, _ = url_with_chunks
+    
+    def slow_scores(query, texts):
+        time.sleep(0.2)
+        return np.zeros(len(texts), dtype=np.float32)
+    
+    monkeypatch.setattr(service, "_rerank_scores", slow_scores)
+    
+    async def search(**rerank):
+        return await service.query_chunks(
+            session=db_session,
+            url_id=url.url_id,
+            project_id=project.project_id,
+            query=CONTENTS[2],
+            top_k=3,
+            **rerank,
+        )
+    
+    reranked = await search(rerank=True, rerank_timeout_ms=1)
+    retrieved = await search()
+    
+    assert [result.chunk_id for result in reranked.results] == [result.chunk_id for result in retrieved.results]
+    assert all(result.rerank_score is None for result in reranked.results)
+    assert len(service.search_result_cache) == 1
+
+
+async def test_query_chunks_skips_rerank_when_executor_is_busy(db_session, url_with_chunks, monkeypatch):
+    """Reranks still running past their budget hold their threads, and new ones are skipped."""
+    project, url, _ = url_with_chunks
+    calls = []
+    
+    def slow_scores(query, texts):
+        calls.append(query)
+        time.sleep(0.2)
+        return np.zeros(len(texts), dtype=np.float32)
+    
+    monkeypatch.setattr(service, "_rerank_scores", slow_scores)
+    executor = RerankExecutor(1)
+    monkeypatch.setattr(service, "get_rerank_executor", lambda: executor)
+    
+    for query in CONTENTS[:2]:
+        response = await service.query_chunks(
+            session=db_session,
+            url_id=url.url_id,
+            project_id=project.project_id,
+            query=query,
+            top_k=3,
+            rerank=True,
+            rerank_timeout_ms=1,
+        )
+        assert all(result.rerank_score is None for result in response.results)
+    
+    assert calls == [CONTENTS[0]]
+
+
+async def test_query_chunks_returns_merged_context_windows(db_session, url_with_chunks):
+    """Neighbors of adjacent hits are returned once, as a single window."""
+    project, url, _ = url_with_chunks
+    contents = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot"]
+    await service.replace_url_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        contents=contents,
+        embeddings=embed_texts(contents),
+    )
+    
+    response = await service.query_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        query="bravo charlie",
+        top_k=2,
+        context_window=1,
+    )
+    
+    assert sorted(result.chunk_index for result in response.results) == [1, 2]
+    assert len(response.contexts) == 1
+    context = response.contexts[0]
+    assert (context.start_chunk_index, context.end_chunk_index) == (0, 3)
+    assert context.content == "alpha\nbravo\ncharlie\ndelta"
+    assert set(context.hit_chunk_ids) == {result.chunk_id for result in response.results}
+    assert all(result.context_index == 0 for result in response.results)
+
+
+async def test_token_budget_retrieves_beyond_top_k(db_session, url_with_chunks, monkeypatch):
+    """Packing fills the budget from more than top_k results, up to the candidate limit."""
+    project, url, _ = url_with_chunks
+    contents = [f"bravo {word}" for word in ["alpha", "charlie", "delta", "echo", "foxtrot", "golf"]]
+    await service.replace_url_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        contents=contents,
+        embeddings=embed_texts(contents),
+    )
+    
+    async def search(token_budget):
+        response = await service.query_chunks(
+            session=db_session,
+            url_id=url.url_id,
+            project_id=project.project_id,
+            query="bravo",
+            top_k=1,
+            token_budget=token_budget,
+        )
+        return response.packed
+    
+    packed = await search(1000)
+    assert len(packed.sources) == 1
+    assert packed.token_count == 12
+    
+    monkeypatch.setattr(service.settings, "TOKEN_BUDGET_MAX_CANDIDATES", 4)
+    service.search_result_cache.clear()
+    assert (await search(1000)).token_count == 8
+    assert (await search(4)).token_count == 4
+
+
+async def test_packed_spans_do_not_repeat_chunk_overlap(db_session, url_with_chunks, monkeypatch):
+    """Text that adjacent chunks share is packed, and counted, once."""
+    project, url, _ = url_with_chunks
+    monkeypatch.setattr(service.settings, "CHUNK_OVERLAP_TOKENS", 4)
+    text = "Alpha bravo charlie. Delta echo foxtrot. Golf hotel india."
+    contents = split_text(text, max_tokens=8, overlap_tokens=4)
+    assert len(contents) == 2
+    await service.replace_url_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        contents=contents,
+        embeddings=embed_texts(contents),
+    )
+    
+    response = await service.query_chunks(
+        session=db_session, url_id=url.url_id, project_id=project.project_id, query="delta", top_k=2, token_budget=100
+    )
+    
+    assert response.packed.text == text
+    assert response.packed.token_count == count_tokens(text)
+
+
+async def test_context_windows_do_not_repeat_chunk_overlap(db_session, url_with_chunks, monkeypatch):
+    """A window's neighboring chunks are joined without repeating their shared text."""
+    project, url, _ = url_with_chunks
+    monkeypatch.setattr(service.settings, "CHUNK_OVERLAP_TOKENS", 4)
+    text = "Alpha bravo charlie. Delta echo foxtrot. Golf hotel india. Juliet kilo lima."
+    contents = split_text(text, max_tokens=8, overlap_tokens=4)
+    assert len(contents) == 3
+    await service.replace_url_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        contents=contents,
+        embeddings=embed_texts(contents),
+    )
+    
+    response = await service.query_chunks(
+        session=db_session, url_id=url.url_id, project_id=project.project_id, query=contents[1], top_k=1, context_window=1
+    )
+    
+    [context] = response.contexts
+    assert (context.start_chunk_index, context.end_chunk_index) == (0, 2)
+    assert context.content == text
+
+
+async def test_context_windows_skip_urls_rechunked_since_the_search(db_session, url_with_chunks):
+    """Hits whose chunks are gone by the time windows are read get no window."""
+    project, url, chunks = url_with_chunks
+    gone = SimpleNamespace(project_id=project.project_id, url_id=uuid.uuid4(), chunk_index=0, chunk_id=uuid.uuid4())
+    rows = [gone, chunks[0]]
+    results = [SimpleNamespace(context_index=None) for _ in rows]
+    
+    contexts = await service._attach_context_windows(db_session, rows, results, 1)
+    
+    assert [context.url_id for context in contexts] == [url.url_id]
+    assert [result.context_index for result in results] == [None, 0]
+
+
+async def test_query_chunks_packs_results_into_token_budget(db_session, url_with_chunks, monkeypatch):
+    """Adjacent packed chunks are merged into one span with offsets into the text."""
+    project, url, _ = url_with_chunks
+    monkeypatch.setattr(service.settings, "CHUNK_OVERLAP_TOKENS", 0)
+    contents = ["alpha bravo", "bravo charlie", "delta echo foxtrot golf hotel", "bravo kilo"]
+    await service.replace_url_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        contents=contents,
+        embeddings=embed_texts(contents),
+    )
+    
+    response = await service.query_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        query="bravo",
+        top_k=4,
+        token_budget=6,
+        context_window=1,
+    )
+    
+    assert response.results == []
+    assert response.contexts is None
+    packed = response.packed
+    assert packed.token_count == 6
+    assert "delta" not in packed.text
+    spans = {(source.start_chunk_index, source.end_chunk_index): source for source in packed.sources}
+    assert set(spans) == {(0, 1), (3, 3)}
+    assert packed.text[spans[0, 1].start:spans[0, 1].end] == "alpha bravo\nbravo charlie"
+    assert packed.text[spans[3, 3].start:spans[3, 3].end] == "bravo kilo"
+    assert all(source.url == url.original_url for source in packed.sources)
+
+
+async def test_query_chunks_pages_with_cursor(db_session, url_with_chunks):
+    """Following next_cursor returns the remaining results in order, without repeats."""
+    project, url, _ = url_with_chunks
+    
+    async def search(**params):
+        return await service.query_chunks(
+            session=db_session, url_id=url.url_id, project_id=project.project_id, query=CONTENTS[0], **params
+        )
+    
+    everything = await search(top_k=3)
+    first = await search(top_k=2)
+    second = await search(top_k=2, cursor=first.next_cursor)
+    
+    assert [result.chunk_id for result in first.results + second.results] == [
+        result.chunk_id for result in everything.results
+    ]
+    assert second.next_cursor is None
+
+
+async def test_query_chunks_min_score_ends_pagination(db_session, url_with_chunks):
+    """Results below min_score are dropped and no further page is offered."""
+    project, url, chunks = url_with_chunks
+    
+    response = await service.query_chunks(
+        session=db_session, url_id=url.url_id, project_id=project.project_id, query=CONTENTS[0], top_k=3, min_score=0.99
+    )
+    
+    assert [result.chunk_id for result in response.results] == [chunks[0].chunk_id]
+    assert response.next_cursor is None
+
+
+async def test_query_chunks_rejects_foreign_cursor(db_session, url_with_chunks):
+    """A cursor only resumes the search it was issued for."""
+    project, url, _ = url_with_chunks
+    first = await service.query_chunks(
+        session=db_session, url_id=url.url_id, project_id=project.project_id, query=CONTENTS[0], top_k=1
+    )
+    
+    with pytest.raises(InvalidQueryException):
+        await service.query_chunks(
+            session=db_session, url_id=url.url_id, project_id=project.project_id,
+            query=CONTENTS[1], top_k=1, cursor=first.next_cursor,
+        )
+    with pytest.raises(InvalidQueryException):
+        await service.query_chunks(
+            session=db_session, url_id=url.url_id, project_id=project.project_id,
+            query=CONTENTS[0], top_k=1, cursor=first.next_cursor, rerank=True,
+        )
+
+
+async def test_query_chunks_pages_through_duplicate_embeddings(db_session, url_with_chunks):
+    """Chunks of equal distance spanning a page boundary are each returned once."""
+    project, url, chunks = url_with_chunks
+    duplicates = [
+        Chunk(
+            chunk_id=uuid.uuid4(),
+            url_id=url.url_id,
+            project_id=project.project_id,
+            content=CONTENTS[0],
+            chunk_index=len(CONTENTS) + index,
+            embedding=chunks[0].embedding,
+            created_at=datetime.now(timezone.utc),
+        )
+        for index in range(3)
+    ]
+    db_session.add_all(duplicates)
+    await db_session.commit()
+    
+    async def search(**params):
+        return await service.query_chunks(
+            session=db_session, url_id=url.url_id, project_id=project.project_id, query=CONTENTS[0], top_k=3, **params
+        )
+    
+    first = await search()
+    second = await search(cursor=first.next_cursor)
+    
+    tied = {chunks[0].chunk_id, *(chunk.chunk_id for chunk in duplicates)}
+    returned = [result.chunk_id for result in first.results + second.results]
+    assert len(returned) == len(set(returned)) == 6
+    assert set(returned[:4]) == tied
+    assert returned[:4] == sorted(returned[:4], key=str)
+
+
+def test_page_criteria_resumes_after_cursor():
+    """The keyset condition orders ties by chunk ID."""
+    chunk_id = uuid.uuid4()
+    
+    [condition] = service._page_criteria([0.1] * 384, (-0.5, chunk_id))
+    
+    sql = _compiled(condition)
+    assert "(chunks.embedding <#> '[" in sql
+    assert "> -0.5 OR" in sql
+    assert f"chunks.chunk_id > '{chunk_id}'" in sql
+
+
+async def test_query_chunks_serves_repeated_queries_from_cache(db_session, url_with_chunks, monkeypatch):
+    """Repeated searches are cached until the project's chunks change."""
+    project, url, _ = url_with_chunks
+    nearest = AsyncMock(wraps=service._nearest_chunks)
+    monkeypatch.setattr(service, "_nearest_chunks", nearest)
+    
+    async def search():
+        return await service.query_chunks(
+            session=db_session, url_id=url.url_id, project_id=project.project_id, query="HNSW recall", top_k=2
+        )
+    
+    first = await search()
+    second = await search()
+    assert second == first
+    assert nearest.await_count == 1
+    
+    await service.replace_url_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        contents=["HNSW recall depends on ef_search"],
+        embeddings=embed_texts(["HNSW recall depends on ef_search"]),
+    )
+    
+    third = await search()
+    assert nearest.await_count == 2
+    assert [result.content for result in third.results] == ["HNSW recall depends on ef_search"]
+
+
+async def test_search_projects_cache_is_invalidated_by_url_deletion(db_session, url_with_chunks):
+    """Deleting a URL bumps the project's index generation."""
+    from src.urls.service import delete_url
+    
+    project, url, _ = url_with_chunks
+    
+    before = await service.search_projects(session=db_session, project_ids=[project.project_id], query="weather")
+    await delete_url(db_session, url.url_id, project.project_id)
+    after = await service.search_projects(session=db_session, project_ids=[project.project_id], query="weather")
+    
+    assert len(before.results) == 3
+    assert after.results == []
+    await db_session.refresh(project)
+    assert project.index_generation == 1
+
+
+async def test_search_projects_status_filtered_results_follow_status_changes(db_session, url_with_chunks):
+    """Searches filtered by URL status are not served from the cache."""
+    project, url, _ = url_with_chunks
+    filters = SearchFilters(url_statuses=["stored"])
+    
+    async def search():
+        return await service.search_projects(
+            session=db_session, project_ids=[project.project_id], query="weather", filters=filters
+        )
+    
+    before = await search()
+    url.status = "failed"
+    await db_session.commit()
+    after = await search()
+    
+    assert len(before.results) == 3
+    assert after.results == []
+
+
+async def test_search_projects_applies_metadata_filters(db_session, url_with_chunks):
+    """Host, URL status and crawl date filters restrict the searched chunks."""
+    project, url, _ = url_with_chunks
+    other = URL(url_id=uuid.uuid4(), project_id=project.project_id, original_url="https://Docs.Other.org/a", status="failed")
+    db_session.add(other)
+    await db_session.commit()
+    for url_id, content in [(url.url_id, "vector search"), (other.url_id, "vector search engines")]:
+        await service.replace_url_chunks(
+            session=db_session, url_id=url_id, project_id=project.project_id,
+            contents=[content], embeddings=embed_texts([content]),
+        )
+    
+    async def search(**filters):
+        response = await service.search_projects(
+            session=db_session, project_ids=[project.project_id], query="vector search",
+            filters=SearchFilters(**filters),
+        )
+        return [result.url_id for result in response.results]
+    
+    assert await search(hosts=["DOCS.other.org"]) == [other.url_id]
+    assert await search(url_statuses=["stored"]) == [url.url_id]
+    assert await search(crawled_after=datetime.now() - timedelta(hours=1)) == [url.url_id, other.url_id]
+    assert await search(crawled_after=datetime.now() + timedelta(hours=1)) == []
+    
+    [chunk] = await db_session.scalars(select(Chunk).where(Chunk.url_id == other.url_id))
+    assert chunk.host == "docs.other.org"
+
+
+def test_search_scope_filters_through_chunk_columns():
+    """Host and crawl date filters use the denormalized chunk columns; statuses use urls."""
+    scope = SearchScope(
+        (uuid.uuid4(),), hosts=("example.com",), url_statuses=("stored",), crawled_after=datetime(2026, 1, 1)
+    )
+    
+    sql = " AND ".join(_compiled(condition) for condition in scope.criteria())
+    assert "chunks.host IN ('example.com')" in sql
+    assert "chunks.crawled_at >= '2026-01-01 00:00:00'" in sql
+    assert "chunks.url_id IN (SELECT urls.url_id" in sql
+    assert "urls.status IN ('stored')" in sql
+
+
+def _postgres_session(scope_size: int) -> MagicMock:
+    """Mock session bound to PostgreSQL whose search scope has scope_size chunks."""
+    session = MagicMock()
+    session.bind.dialect.name = "postgresql"
+    session.scalar = AsyncMock(return_value=scope_size)
+    session.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=[])))
+    return session
+
+
+def _compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+async def test_nearest_chunks_uses_hnsw_for_large_scopes():
+    """Large scopes use an ordered <=> HNSW scan with iterative scans enabled."""
+    session = _postgres_session(settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD + 1)
+    
+    await service._nearest_chunks(
+        session,
+        [0.1] * 384,
+        top_k=10,
+        ef_search=100,
+        scope=SearchScope((uuid.uuid4(),)),
+    )
+    
+    set_config, search = (call.args[0] for call in session.execute.await_args_list)
+    set_config_sql = _compiled(set_config)
+    assert "set_config('hnsw.ef_search', '100', true)" in set_config_sql
+    assert f"set_config('hnsw.iterative_scan', '{settings.VECTOR_SEARCH_ITERATIVE_SCAN}', true)" in set_config_sql
+    assert "hnsw.max_scan_tuples" in set_config_sql
+    
+    search_sql = str(search.compile(dialect=postgresql.dialect()))
+    assert "<#>" in search_sql
+    assert "LIMIT" in search_sql
+    assert "<~>" not in search_sql
+    # The index scan orders by distance alone; the re-rank breaks ties in page cursor order
+    assert "ORDER BY distance \n LIMIT" in search_sql
+    assert "ORDER BY anon_1.distance, anon_1.chunk_id" in search_sql
+
+
+async def test_nearest_chunks_ef_search_never_below_top_k():
+    """ef_search is raised to top_k so the index can return enough rows."""
+    session = _postgres_session(settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD + 1)
+    
+    await service._nearest_chunks(session, [0.1] * 384, top_k=50, ef_search=10, scope=SearchScope((uuid.uuid4(),)))
+    
+    set_config = session.execute.await_args_list[0].args[0]
+    assert "set_config('hnsw.ef_search', '50', true)" in _compiled(set_config)
+
+
+async def test_nearest_chunks_scans_small_scopes_exactly():
+    """Small scopes disable index scans so the exact top-k is returned."""
+    session = _postgres_session(3)
+    
+    await service._nearest_chunks(
+        session,
+        [0.1] * 384,
+        top_k=10,
+        ef_search=None,
+        scope=SearchScope((uuid.uuid4(),), uuid.uuid4()),
+    )
+    
+    set_config = session.execute.await_args_list[0].args[0]
+    set_config_sql = _compiled(set_config)
+    assert "set_config('enable_indexscan', 'off', true)" in set_config_sql
+    assert "hnsw.ef_search" not in set_config_sql
+    
+    count = _compiled(session.scalar.await_args.args[0])
+    assert f"LIMIT {settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD + 1}" in count
+
+
+async def test_nearest_chunks_binary_quantized_first_pass(monkeypatch):
+    """Binary quantization over-fetches by Hamming distance and reranks exactly."""
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_BINARY_QUANTIZATION", True)
+    session = _postgres_session(settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD + 1)
+    
+    await service._nearest_chunks(
+        session,
+        [0.1] * 384,
+        top_k=10,
+        ef_search=None,
+        scope=SearchScope((uuid.uuid4(),)),
+        oversampling=8,
+    )
+    
+    set_config, search = (call.args[0] for call in session.execute.await_args_list)
+    # ef_search is raised to the number of over-fetched candidates
+    assert "set_config('hnsw.ef_search', '80', true)" in _compiled(set_config)
+    
+    search_sql = _compiled(search)
+    assert "ORDER BY CAST(binary_quantize(chunks.embedding) AS BIT(384)) <~> binary_quantize(" in search_sql
+    assert "LIMIT 80" in search_sql
+    assert search_sql.rstrip().endswith("ORDER BY anon_1.distance, anon_1.chunk_id \n LIMIT 10")
+
+
+async def test_nearest_chunks_binary_quantization_skips_small_scopes(monkeypatch):
+    """Small scopes are still scanned exactly without the quantized index."""
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_BINARY_QUANTIZATION", True)
+    session = _postgres_session(3)
+    
+    await service._nearest_chunks(session, [0.1] * 384, top_k=10, ef_search=None, scope=SearchScope((uuid.uuid4(),)))
+    
+    search = session.execute.await_args_list[1].args[0]
+    assert "<~>" not in str(search.compile(dialect=postgresql.dialect()))
+
+
+async def test_nearest_chunks_cosine_metric(monkeypatch):
+    """The cosine metric searches with <=> and scores 1 - distance."""
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_METRIC", "cosine")
+    session = _postgres_session(settings.VECTOR_SEARCH_EXACT_SCAN_THRESHOLD + 1)
+    
+    await service._nearest_chunks(session, [0.1] * 384, top_k=5, ef_search=None, scope=SearchScope((uuid.uuid4(),)))
+    
+    search = session.execute.await_args_list[1].args[0]
+    assert "<=>" in str(search.compile(dialect=postgresql.dialect()))
+    assert service._similarity(0.25) == pytest.approx(0.75)
+
+
+async def test_hybrid_search_falls_back_to_vector_ranking(db_session, url_with_chunks):
+    """Without PostgreSQL full-text search, hybrid results are ranked by vector search alone."""
+    project, url, chunks = url_with_chunks
+    
+    response = await service.query_chunks(
+        session=db_session,
+        url_id=url.url_id,
+        project_id=project.project_id,
+        query=CONTENTS[2],
+        top_k=2,
+        mode=SearchMode.HYBRID,
+    )
+    
+    assert [result.vector_rank for result in response.results] == [1, 2]
+    assert response.results[0].chunk_id == chunks[2].chunk_id
+    assert response.results[0].rrf_score == pytest.approx(1 / (settings.HYBRID_SEARCH_RRF_K + 1))
+    assert response.results[0].lexical_rank is None
+
+
+async def test_hybrid_search_fuses_vector_and_lexical_rankings(monkeypatch):
+    """Hybrid search reports each side's rank and orders results by fused score."""
+    def row(name, distance, lexical_score=None):
+        return SimpleNamespace(
+            chunk_id=name, url_id=None, project_id=None, content=name, chunk_index=0,
+            created_at=None, original_url="https://example.com", distance=distance,
+            lexical_score=lexical_score,
+        )
+    
+    vector_rows = [row("semantic", -0.9), row("both", -0.8)]
+    lexical_rows = [row("both", -0.8, 0.5), row("exact-id", -0.1, 0.4)]
+    monkeypatch.setattr(service, "_nearest_chunks", AsyncMock(return_value=vector_rows))
+    lexical = AsyncMock(return_value=lexical_rows)
+    monkeypatch.setattr(service, "_lexical_chunks", lexical)
+    session = _postgres_session(0)
+    
+    rows = await service._hybrid_chunks(session, [0.1] * 384, "E1234", 3, None, None, SearchScope((uuid.uuid4(),)))
+    
+    assert [row.chunk_id for row in rows] == ["both", "semantic", "exact-id"]
+    assert (rows[0].vector_rank, rows[0].lexical_rank, rows[0].lexical_score) == (2, 1, 0.5)
+    assert (rows[2].vector_rank, rows[2].lexical_rank) == (None, 2)
+    assert lexical.await_args.args[0] is session.bind
+    assert lexical.await_args.args[3] == settings.HYBRID_SEARCH_CANDIDATES
+
+
+def test_lexical_statement_uses_full_text_index():
+    """Lexical search matches content_tsv with websearch syntax and ranks with ts_rank_cd."""
+    stmt = service._lexical_statement([0.1] * 384, '"E1234" timeout', 50, [Chunk.project_id == uuid.uuid4()])
+    
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "chunks.content_tsv @@ websearch_to_tsquery(CAST(" in sql
+    assert "AS REGCONFIG)" in sql
+    assert "ts_rank_cd(chunks.content_tsv" in sql
+    assert "ORDER BY lexical_score DESC" in sql
+
+
+def test_embedding_array_accepts_halfvec_embeddings():
+    """Embeddings read from a halfvec column convert to float32 arrays."""
+    from pgvector import HalfVector
+    
+    array = embedding_array(HalfVector([0.5, -0.25, 1.0]))
+    
+    assert array.dtype == np.float32
+    assert array.tolist() == [0.5, -0.25, 1.0]
@@ -0,0 +1,102 @@
+"""Tests for the chunk ranking helpers."""
+
+import numpy as np
+import pytest
+
+from src.chunks.utils import (
+    count_tokens,
+    join_chunks,
+    maximal_marginal_relevance,
+    merge_windows,
+    pack_by_budget,
+    reciprocal_rank_fusion,
+    split_text,
+)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """Items ranked by both rankings beat items ranked highly by only one."""
+    scores = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d", "b"]], k=60)
+    
+    assert scores["b"] == pytest.approx(1 / 62 + 1 / 63)
+    assert scores["d"] == pytest.approx(1 / 62)
+    assert sorted(scores, key=scores.get, reverse=True) == ["c", "b", "a", "d"]
+
+
+def test_reciprocal_rank_fusion_empty_rankings():
+    assert reciprocal_rank_fusion([[], []]) == {}
+
+
+def test_maximal_marginal_relevance_skips_near_duplicates():
+    """A near-duplicate of a selected candidate loses to a less relevant distinct one."""
+    query = np.array([1.0, 0.0, 0.0])
+    candidates = np.array([
+        [1.0, 0.1, 0.0],
+        [1.0, 0.11, 0.0],  # near-duplicate of the first candidate
+        [0.7, 0.0, 0.7],
+    ])
+    
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+
+
+def test_maximal_marginal_relevance_handles_small_candidate_sets():
+    query = np.array([1.0, 0.0])
+    
+    assert maximal_marginal_relevance(query, np.empty((0, 2)), k=3, lambda_mult=0.5) == []
+    assert sorted(maximal_marginal_relevance(query, np.eye(2), k=3, lambda_mult=0.5)) == [0, 1]
+
+
+def test_merge_windows_merges_overlapping_ranges_per_document():
+    hits = [("a", 5), ("b", 0), ("a", 2), ("a", 9)]
+    
+    assert merge_windows(hits, window=1) == [
+        ("a", 1, 6, [2, 0]),
+        ("a", 8, 10, [3]),
+        ("b", 0, 1, [1]),
+    ]
+
+
+def test_count_tokens_counts_words_and_punctuation():
+    assert count_tokens("") == 0
+    assert count_tokens("Hello, world!") == 4
+    assert count_tokens("internationalization") == 3
+
+
+def test_pack_by_budget_skips_duplicates_and_oversized_texts():
+    texts = ["one two three", "ONE  two three", "four five six seven", "eight nine"]
+    
+    selected, used = pack_by_budget(texts, budget=6)
+    
+    assert selected == [0, 3]
+    assert used == 5
+
+
+def test_split_text_packs_sentences_with_overlap():
+    text = "One two three. Four five six.\n\nSeven eight nine. Ten eleven twelve."
+    
+    chunks = split_text(text, max_tokens=8, overlap_tokens=4)
+    
+    assert chunks == [
+        "One two three. Four five six.",
+        "Four five six. Seven eight nine.",
+        "Seven eight nine. Ten eleven twelve.",
+    ]
+    assert all(count_tokens(chunk) <= 8 for chunk in chunks)
+
+
+def test_join_chunks_drops_overlap():
+    chunks = split_text("One two three. Four five six. Seven eight nine.", max_tokens=8, overlap_tokens=4)
+    
+    assert join_chunks(chunks, overlap_tokens=4) == "One two three. Four five six. Seven eight nine."
+    # Text shared by chance, beyond overlap_tokens, or not at a word boundary is kept
+    assert join_chunks(["a b", "b c"], overlap_tokens=0) == "a b\nb c"
+    assert join_chunks(["a b c", "b c d"], overlap_tokens=1) == "a b c\nb c d"
+    assert join_chunks(["ab", "b c"], overlap_tokens=4) == "ab\nb c"
+
+
+def test_split_text_cuts_oversized_sentences_between_words():
+    chunks = split_text("a b c d e f g", max_tokens=3)
+    
+    assert chunks == ["a b c", "d e f", "g"]
+    assert split_text(" \n\n ", max_tokens=3) == []
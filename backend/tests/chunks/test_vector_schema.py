@@ -0,0 +1,66 @@
+"""Tests for the chunk search schema modes applied outside of migrations."""
+
+import pytest
+
+from src.chunks import vector_schema
+from src.chunks.vector_schema import VectorSchema, apply_vector_schema, check_vector_schema, schema_mismatches
+
+DEFAULT = VectorSchema(storage="vector", metric="inner_product", binary_quantization=False, text_search_config="english")
+
+
+class _RecordingConnection:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement))
+
+
+def test_schema_mismatches_names_each_mode():
+    live = VectorSchema(storage="halfvec", metric="inner_product", binary_quantization=False, text_search_config="simple")
+
+    mismatches = schema_mismatches(live, DEFAULT)
+
+    assert [mismatch.split(":")[0] for mismatch in mismatches] == ["storage", "text_search_config"]
+    assert schema_mismatches(DEFAULT, DEFAULT) == []
+
+
+async def test_check_skips_databases_without_pgvector(db_session, monkeypatch):
+    monkeypatch.setattr(vector_schema.settings, "VECTOR_STORAGE", "halfvec")
+
+    await check_vector_schema(db_session.bind)
+
+
+async def test_storage_switch_rebuilds_dependent_indexes():
+    conn = _RecordingConnection()
+    configured = VectorSchema(storage="halfvec", metric="inner_product", binary_quantization=True, text_search_config="english")
+
+    await apply_vector_schema(conn, DEFAULT, configured)
+
+    statements = conn.statements
+    assert statements[:3] == [
+        "DROP INDEX IF EXISTS idx_chunks_embedding_bq",
+        "DROP INDEX IF EXISTS idx_chunks_embedding",
+        "ALTER TABLE chunks ALTER COLUMN embedding TYPE halfvec(384) USING embedding::halfvec(384)",
+    ]
+    assert "CREATE INDEX idx_chunks_embedding ON ONLY chunks USING hnsw (embedding halfvec_ip_ops)" in statements
+    assert any(statement.startswith("CREATE INDEX idx_chunks_embedding_bq ON ONLY") for statement in statements)
+    # Embeddings are already normalized, and the text search column is untouched
+    assert not any("l2_normalize" in statement or "content_tsv" in statement for statement in statements)
+
+
+@pytest.mark.parametrize("metric, normalized", [("inner_product", True), ("cosine", False)])
+async def test_metric_switch(metric, normalized):
+    conn = _RecordingConnection()
+    live = VectorSchema(
+        storage="vector",
+        metric="cosine" if metric == "inner_product" else "inner_product",
+        binary_quantization=False,
+        text_search_config="english",
+    )
+
+    await apply_vector_schema(conn, live, VectorSchema("vector", metric, False, "english"))
+
+    assert ("UPDATE chunks SET embedding = l2_normalize(embedding)" in conn.statements) == normalized
+    opclass = "vector_ip_ops" if metric == "inner_product" else "vector_cosine_ops"
+    assert f"CREATE INDEX idx_chunks_embedding ON ONLY chunks USING hnsw (embedding {opclass})" in conn.statements
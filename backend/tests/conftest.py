@@ -1,4 +1,5 @@
 import asyncio
+import os
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
@@ -8,6 +9,10 @@ from sqlalchemy.orm import sessionmaker
 from typing import AsyncGenerator, Generator
 from sqlmodel import SQLModel
 
+# Use the dependency-free deterministic embedder and reranker instead of loading transformer models
+os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+os.environ.setdefault("RERANKER_PROVIDER", "term-overlap")
+
 from src.main import app
 from src.auth.dependencies import get_db
 from src.config import settings
@@ -29,6 +34,29 @@ async_test_session = sessionmaker(
 )
 
 
+# In-process caches outlive the per-test databases
+@pytest.fixture(autouse=True)
+def clear_caches():
+    from src.chunks.backends import get_vector_backend
+    from src.chunks.embeddings import query_embedding_cache
+    from src.chunks.service import search_result_cache
+    
+    query_embedding_cache.clear()
+    search_result_cache.clear()
+    get_vector_backend().clear()
+    yield
+
+
+# Submitted URLs are recorded instead of being sent to the broker
+@pytest.fixture(autouse=True)
+def enqueued_urls(monkeypatch):
+    from unittest.mock import MagicMock
+    
+    enqueue = MagicMock()
+    monkeypatch.setattr("src.urls.service.enqueue_urls", enqueue)
+    return enqueue
+
+
 # Session fixture
 @pytest_asyncio.fixture
 async def db_session() -> AsyncGenerator[AsyncSession, None]:
@@ -48,6 +76,32 @@ async def db_session() -> AsyncGenerator[AsyncSession, None]:
         await conn.run_sync(SQLModel.metadata.drop_all)
 
 
+# Session on the configured PostgreSQL database, for Postgres-only SQL. Everything
+# runs in one rolled-back transaction, so now() is fixed for the whole test
+# and the session's commits only release savepoints.
+@pytest_asyncio.fixture
+async def postgres_session() -> AsyncGenerator[AsyncSession, None]:
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    
+    engine = create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI), connect_args={"connect_timeout": 5})
+    try:
+        connection = await engine.connect()
+    except (OperationalError, OSError) as e:
+        await engine.dispose()
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    transaction = await connection.begin()
+    try:
+        await connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await connection.run_sync(SQLModel.metadata.create_all)
+        async with AsyncSession(bind=connection, join_transaction_mode="create_savepoint") as session:
+            yield session
+    finally:
+        await transaction.rollback()
+        await connection.close()
+        await engine.dispose()
+
+
 # Override get_db dependency to use test engine
 async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
     """Override database dependency for tests."""
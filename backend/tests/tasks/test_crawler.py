@@ -0,0 +1,164 @@
+"""Tests for the shared crawler."""
+
+import asyncio
+from collections import Counter
+
+import httpcore
+import httpx
+import pytest
+
+from src.cache import TTLCache
+from src.tasks.crawler import CrawlError, Crawler, TransientCrawlError, _CachingNetworkBackend, _PoolTransport
+
+
+def _crawler(handler, **limits) -> Crawler:
+    options = {"max_in_flight": 3, "per_host_limit": 2, "timeout": 5, "max_bytes": 1000, "user_agent": "test"}
+    return Crawler(**{**options, **limits}, transport=httpx.MockTransport(handler))
+
+
+async def test_fetches_are_limited_per_host_and_in_total():
+    """A busy host does not block fetches to other hosts beyond the global limit."""
+    active, peaks = Counter(), Counter()
+    
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        peaks[host] = max(peaks[host], active[host])
+        peaks["total"] = max(peaks["total"], sum(active.values()))
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200, text="ok", headers={"content-type": "text/plain"})
+    
+    crawler = _crawler(handler)
+    urls = [f"https://a.example/{i}" for i in range(6)] + [f"https://b.example/{i}" for i in range(6)]
+    pages = await asyncio.gather(*(crawler.fetch(url) for url in urls))
+    
+    assert [page.content for page in pages] == ["ok"] * 12
+    assert peaks["a.example"] == peaks["b.example"] == 2
+    assert peaks["total"] == 3
+    # Idle hosts are forgotten
+    assert crawler._hosts == {}
+    await crawler.aclose()
+
+
+async def test_fetch_rejects_oversized_pages():
+    crawler = _crawler(lambda request: httpx.Response(200, text="x" * 2000, headers={"content-type": "text/html"}))
+    
+    with pytest.raises(CrawlError):
+        await crawler.fetch("https://a.example/large")
+
+
+async def test_robots_txt_is_fetched_once_per_origin_and_honored():
+    """Disallowed pages are rejected without being fetched."""
+    requested = Counter()
+    
+    async def handler(request):
+        requested[request.url.path] += 1
+        if request.url.path == "/robots.txt":
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, text="User-agent: *\nDisallow: /private/\n")
+        return httpx.Response(200, text="ok", headers={"content-type": "text/plain"})
+    
+    crawler = _crawler(handler)
+    await asyncio.gather(*(crawler.fetch(f"https://a.example/{i}") for i in range(4)))
+    with pytest.raises(CrawlError, match="robots.txt"):
+        await crawler.fetch("https://a.example/private/page")
+    
+    assert requested["/robots.txt"] == 1
+    assert requested["/private/page"] == 0
+    assert crawler.robots.stats["hits"] >= 1
+
+
+async def test_robots_txt_errors():
+    """A missing robots.txt allows everything; an unavailable one defers the crawl."""
+    def handler(request):
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404 if request.url.host == "a.example" else 503)
+        return httpx.Response(200, text="ok", headers={"content-type": "text/plain"})
+    
+    crawler = _crawler(handler)
+    
+    assert (await crawler.fetch("https://a.example/page")).content == "ok"
+    with pytest.raises(TransientCrawlError):
+        await crawler.fetch("https://b.example/page")
+    assert crawler.robots.get("https://b.example") is None
+
+
+async def test_redirects_are_checked_against_robots_txt_per_hop():
+    """A redirect to a disallowed page on another host is not followed."""
+    requested = Counter()
+    
+    def handler(request):
+        requested[str(request.url)] += 1
+        if request.url.path == "/robots.txt":
+            if request.url.host == "b.example":
+                return httpx.Response(200, text="User-agent: *\nDisallow: /private/\n")
+            return httpx.Response(404)
+        if request.url.path == "/private":
+            return httpx.Response(301, headers={"location": "https://b.example/private/page"})
+        if request.url.path == "/public":
+            return httpx.Response(302, headers={"location": "/page"})
+        if request.url.path == "/loop":
+            return httpx.Response(302, headers={"location": "/loop"})
+        return httpx.Response(200, text="ok", headers={"content-type": "text/plain"})
+    
+    crawler = _crawler(handler, max_redirects=2)
+    
+    with pytest.raises(CrawlError, match="robots.txt"):
+        await crawler.fetch("https://a.example/private")
+    assert requested["https://b.example/private/page"] == 0
+    assert (await crawler.fetch("https://a.example/public")).content == "ok"
+    with pytest.raises(CrawlError, match="More than 2 redirects"):
+        await crawler.fetch("https://a.example/loop")
+    assert requested["https://a.example/loop"] == 3
+    assert crawler._hosts == {}
+
+
+async def test_host_addresses_are_cached(monkeypatch):
+    """Hosts are resolved once, and connections fall back to their next address."""
+    lookups, connects = [], []
+    
+    async def getaddrinfo(host, port, **kwargs):
+        lookups.append(host)
+        return [(None, None, None, "", ("192.0.2.1", port)), (None, None, None, "", ("192.0.2.2", port))]
+    
+    class Backend(httpcore.AsyncNetworkBackend):
+        async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            connects.append(host)
+            if host == "192.0.2.1":
+                raise httpcore.ConnectError("refused")
+            return host
+    
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    backend = _CachingNetworkBackend(Backend(), TTLCache(maxsize=8, ttl=60))
+    
+    assert await backend.connect_tcp("a.example", 443) == "192.0.2.2"
+    assert await backend.connect_tcp("a.example", 443) == "192.0.2.2"
+    assert await backend.connect_tcp("192.0.2.2", 443) == "192.0.2.2"
+    assert lookups == ["a.example"]
+    assert connects == ["192.0.2.1", "192.0.2.2"] * 2 + ["192.0.2.2"]
+
+
+async def test_pool_transport_fetches_through_its_network_backend():
+    """The crawler's transport speaks HTTP through the given backend and raises httpx errors."""
+    responses = [
+        b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n",
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nETag: \"v1\"\r\nContent-Length: 2\r\n\r\nok",
+    ]
+    
+    class Backend(httpcore.AsyncNetworkBackend):
+        async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            if not responses:
+                raise httpcore.ConnectError("refused")
+            return httpcore.AsyncMockStream([responses.pop(0)])
+    
+    transport = _PoolTransport(httpcore.AsyncConnectionPool(max_keepalive_connections=0, network_backend=Backend()))
+    crawler = Crawler(
+        max_in_flight=1, per_host_limit=1, timeout=5, max_bytes=1000, user_agent="test", transport=transport
+    )
+    
+    page = await crawler.fetch("http://a.example/page")
+    assert (page.content, page.etag) == ("ok", '"v1"')
+    with pytest.raises(httpx.ConnectError):
+        await transport.handle_async_request(httpx.Request("GET", "http://a.example/"))
+    await crawler.aclose()
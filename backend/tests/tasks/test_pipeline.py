@@ -0,0 +1,284 @@
+"""Tests for the URL ingestion pipeline stages."""
+
+import asyncio
+import threading
+import uuid
+
+import httpx
+import numpy as np
+import pytest
+from celery.exceptions import Ignore
+from sqlalchemy import select
+
+from src.models import URL, Chunk, PipelineArtifact, Project, User
+from src.tasks import pipeline
+from src.tasks.crawler import CrawlError, Crawler, TransientCrawlError
+from src.tasks.extraction import extract_text
+from src.tasks.politeness import CrawlDeferred, MemoryHostRateLimiter
+from src.urls.constants import URLStatus
+
+PAGE = """
+<html>
+  <head><title>Ignored</title><style>body { color: red; }</style></head>
+  <body>
+    <nav><a href="/">Home</a></nav>
+    <h1>Vector search</h1>
+    <p>HNSW graphs trade recall against latency.</p>
+    <script>console.log("ignored");</script>
+    <p>Binary quantization shrinks the index &amp; speeds up scans.</p>
+  </body>
+</html>
+"""
+
+
+@pytest.fixture
+async def pending_url(db_session):
+    """Create a URL waiting to be ingested."""
+    user = User(user_id=uuid.uuid4(), email="pipeline@example.com", password_hash="hashed_password")
+    project = Project(project_id=uuid.uuid4(), user_id=user.user_id, project_name="Pipeline Project")
+    url = URL(url_id=uuid.uuid4(), project_id=project.project_id, original_url="https://docs.example.com/hnsw")
+    db_session.add_all([user, project, url])
+    await db_session.commit()
+    return url
+
+
+def _crawler(status_code: int = 200, content: str = PAGE, content_type: str = "text/html; charset=utf-8"):
+    """Crawler answering every request with the given response."""
+    def handler(request):
+        return httpx.Response(status_code, text=content, headers={"content-type": content_type})
+    return Crawler(
+        max_in_flight=4, per_host_limit=2, timeout=5, max_bytes=100_000, user_agent="test",
+        transport=httpx.MockTransport(handler),
+    )
+
+
+def _limiter(burst: int = 100) -> MemoryHostRateLimiter:
+    return MemoryHostRateLimiter(rate=1.0, burst=burst)
+
+
+def _payload(url: URL) -> dict:
+    return {"url_id": str(url.url_id), "project_id": str(url.project_id)}
+
+
+def test_run_async_shares_one_loop_between_tasks():
+    """Pooled database and HTTP connections stay on the loop that opened them."""
+    async def running_loop():
+        return asyncio.get_running_loop()
+    
+    assert pipeline.run_async(running_loop()) is pipeline.run_async(running_loop())
+
+
+def test_extract_text_skips_boilerplate_and_code():
+    assert extract_text(PAGE, "text/html") == (
+        "Vector search\n\n"
+        "HNSW graphs trade recall against latency.\n\n"
+        "Binary quantization shrinks the index & speeds up scans."
+    )
+
+
+async def test_pipeline_stores_chunks(db_session, pending_url):
+    """The stages fetch, chunk, embed and store a page, moving the URL to stored."""
+    payload = await pipeline.crawl(db_session, _crawler(), _limiter(), _payload(pending_url))
+    await db_session.refresh(pending_url)
+    assert pending_url.status == URLStatus.CRAWLING.value
+    
+    assert set(payload) == {"url_id", "project_id", "artifact_id", "etag", "last_modified", "stored_hash"}
+    
+    payload = await pipeline.extract(db_session, payload)
+    artifact = await db_session.get(PipelineArtifact, uuid.UUID(payload["artifact_id"]))
+    assert artifact.page is None
+    assert artifact.contents[0].startswith("Vector search HNSW graphs")
+    payload = await pipeline.embed(db_session, payload)
+    await db_session.refresh(pending_url)
+    assert pending_url.status == URLStatus.ENCODING.value
+    await db_session.refresh(artifact)
+    assert len(artifact.embeddings) == 384 * 4
+    
+    payload = await pipeline.store(db_session, payload)
+    await db_session.refresh(pending_url)
+    assert pending_url.status == URLStatus.STORED.value
+    chunks = (await db_session.scalars(select(Chunk).where(Chunk.url_id == pending_url.url_id))).all()
+    assert payload["chunk_count"] == len(chunks) == 1
+    assert (await db_session.scalars(select(PipelineArtifact))).all() == []
+    assert chunks[0].content.startswith("Vector search HNSW graphs")
+    assert chunks[0].host == "docs.example.com"
+
+
+async def test_embed_runs_model_off_the_event_loop(db_session, pending_url, monkeypatch):
+    """Embedding does not block the event loop shared by the process's tasks."""
+    threads = []
+    
+    def embed_texts(texts):
+        threads.append(threading.current_thread())
+        return np.zeros((len(texts), 384), dtype=np.float32)
+    
+    monkeypatch.setattr(pipeline, "embed_texts", embed_texts)
+    payload = await pipeline.crawl(db_session, _crawler(), _limiter(), _payload(pending_url))
+    await pipeline.embed(db_session, await pipeline.extract(db_session, payload))
+    
+    assert threads and threads[0] is not threading.current_thread()
+
+
+async def _ingest(db_session, crawler, payload):
+    payload = await pipeline.crawl(db_session, crawler, _limiter(), payload)
+    payload = await pipeline.extract(db_session, payload)
+    payload = await pipeline.embed(db_session, payload)
+    return await pipeline.store(db_session, payload)
+
+
+async def test_recrawl_of_unmodified_page_keeps_chunks(db_session, pending_url, monkeypatch):
+    """A 304 or unchanged text moves the URL back to stored without re-embedding."""
+    requests = []
+    
+    def handler(request):
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        if len(requests) == 1:
+            return httpx.Response(200, text=PAGE, headers={"content-type": "text/html", "etag": '"v1"'})
+        # Same text, different markup and no validators
+        return httpx.Response(200, text=PAGE.replace("<h1>", "<h1 class='title'>"), headers={"content-type": "text/html"})
+    
+    crawler = Crawler(
+        max_in_flight=4, per_host_limit=2, timeout=5, max_bytes=100_000, user_agent="test",
+        transport=httpx.MockTransport(handler),
+    )
+    await _ingest(db_session, crawler, _payload(pending_url))
+    await db_session.refresh(pending_url)
+    assert pending_url.etag == '"v1"'
+    stored_hash = pending_url.content_hash
+    chunk_ids = set(await db_session.scalars(select(Chunk.chunk_id).where(Chunk.url_id == pending_url.url_id)))
+    
+    def embed_texts(texts):
+        raise AssertionError("re-embedded")
+    
+    monkeypatch.setattr(pipeline, "embed_texts", embed_texts)
+    # Not modified
+    assert await pipeline.crawl(db_session, crawler, _limiter(), _payload(pending_url)) is None
+    await db_session.refresh(pending_url)
+    assert pending_url.status == URLStatus.STORED.value
+    
+    # Unchanged text, served without validators
+    pending_url.etag = None
+    await db_session.commit()
+    payload = await pipeline.extract(db_session, await pipeline.crawl(db_session, crawler, _limiter(), _payload(pending_url)))
+    assert payload["unchanged"] and "artifact_id" not in payload
+    assert (await db_session.scalars(select(PipelineArtifact))).all() == []
+    assert await pipeline.embed(db_session, payload) is None
+    
+    await db_session.refresh(pending_url)
+    assert pending_url.status == URLStatus.STORED.value
+    assert pending_url.content_hash == stored_hash
+    assert set(await db_session.scalars(select(Chunk.chunk_id).where(Chunk.url_id == pending_url.url_id))) == chunk_ids
+    assert [request.headers.get("if-none-match") for request in requests] == [None, '"v1"', None]
+
+
+async def test_forced_recrawl_skips_validators_and_hash(db_session, pending_url):
+    """A forced run re-fetches unconditionally and re-embeds unchanged text."""
+    requests = []
+    
+    def handler(request):
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        requests.append(request)
+        return httpx.Response(200, text=PAGE, headers={"content-type": "text/html", "etag": '"v1"'})
+    
+    crawler = Crawler(
+        max_in_flight=4, per_host_limit=2, timeout=5, max_bytes=100_000, user_agent="test",
+        transport=httpx.MockTransport(handler),
+    )
+    await _ingest(db_session, crawler, _payload(pending_url))
+    chunk_ids = set(await db_session.scalars(select(Chunk.chunk_id).where(Chunk.url_id == pending_url.url_id)))
+    
+    payload = await _ingest(db_session, crawler, {**_payload(pending_url), "force": True})
+    
+    assert payload["chunk_count"] == 1
+    assert [request.headers.get("if-none-match") for request in requests] == [None, None]
+    new_chunk_ids = set(await db_session.scalars(select(Chunk.chunk_id).where(Chunk.url_id == pending_url.url_id)))
+    assert new_chunk_ids and not new_chunk_ids & chunk_ids
+
+
+async def test_crawl_classifies_http_errors(db_session, pending_url):
+    """Server errors are retried; client errors and unsupported content fail the URL."""
+    for status_code, content_type, error in [
+        (503, "text/html", TransientCrawlError),
+        (404, "text/html", CrawlError),
+        (200, "application/pdf", CrawlError),
+    ]:
+        with pytest.raises(error):
+            await pipeline.crawl(
+                db_session, _crawler(status_code, content_type=content_type), _limiter(), _payload(pending_url)
+            )
+
+
+async def test_crawl_defers_busy_host(db_session, pending_url):
+    """A crawl without a free slot of its host leaves the URL pending until its reserved slot."""
+    limiter = _limiter(burst=1)
+    await limiter.reserve(db_session, "docs.example.com", 0)
+    
+    with pytest.raises(CrawlDeferred) as deferred:
+        await pipeline.crawl(db_session, _crawler(), limiter, _payload(pending_url))
+    await db_session.refresh(pending_url)
+    assert pending_url.status == URLStatus.PENDING.value
+    assert deferred.value.reserved
+    assert 0 < deferred.value.delay <= 1
+    
+    payload = await pipeline.crawl(db_session, _crawler(), limiter, _payload(pending_url), slot_reserved=True)
+    artifact = await db_session.get(PipelineArtifact, uuid.UUID(payload["artifact_id"]))
+    assert artifact.content_type.startswith("text/html")
+
+
+def test_crawl_url_requeues_deferred_crawl(monkeypatch):
+    """A deferred crawl is replaced by one counting down to its slot, keeping its payload."""
+    replacements = []
+
+    async def deferred(*args):
+        raise CrawlDeferred(2.5, reserved=True)
+
+    def replace(sig):
+        replacements.append(sig)
+        return Ignore()
+
+    monkeypatch.setattr(pipeline, "crawl", deferred)
+    monkeypatch.setattr(pipeline.crawl_url, "replace", replace)
+    payload = {"url_id": str(uuid.uuid4()), "project_id": str(uuid.uuid4())}
+
+    with pytest.raises(Ignore):
+        pipeline.crawl_url.run(payload)
+
+    [replacement] = replacements
+    assert replacement.task == pipeline.crawl_url.name
+    assert replacement.args == (payload,)
+    assert replacement.kwargs == {"slot_reserved": True}
+    assert replacement.options["countdown"] == 2.5
+
+
+async def test_stages_skip_deleted_urls(db_session, pending_url):
+    """A URL deleted after it was enqueued ends its pipeline without errors."""
+    payload = _payload(pending_url)
+    await db_session.delete(pending_url)
+    await db_session.commit()
+    
+    assert await pipeline.crawl(db_session, _crawler(), _limiter(), payload) is None
+    assert await pipeline.extract(db_session, None) is None
+    payload = {**payload, "artifact_id": str(uuid.uuid4())}
+    assert await pipeline.extract(db_session, payload) is None
+    assert await pipeline.embed(db_session, payload) is None
+    assert await pipeline.store(db_session, payload) is None
+
+
+async def test_mark_failed_records_reason(db_session, pending_url, monkeypatch):
+    monkeypatch.setattr(pipeline, "engine", db_session.bind)
+    artifact = PipelineArtifact(url_id=pending_url.url_id, page="<p></p>", content_type="text/html")
+    db_session.add(artifact)
+    await db_session.commit()
+    
+    await pipeline._mark_failed({**_payload(pending_url), "artifact_id": str(artifact.artifact_id)}, "extract_url: No text content")
+    
+    db_session.expire_all()
+    await db_session.refresh(pending_url)
+    assert pending_url.status == URLStatus.FAILED.value
+    assert pending_url.failure_reason == "extract_url: No text content"
+    assert (await db_session.scalars(select(PipelineArtifact))).all() == []
@@ -196,7 +196,7 @@ async def test_get_url_status(authenticated_client, db_session):
     assert data["status"] == URLStatus.PENDING.value
 
 
-async def test_reprocess_url(authenticated_client, db_session):
+async def test_reprocess_url(authenticated_client, db_session, enqueued_urls):
     """Test reprocessing a URL."""
     client, user = authenticated_client
     
@@ -227,3 +227,10 @@ async def test_reprocess_url(authenticated_client, db_session):
     assert data["url_id"] == url_id
     assert data["status"] == URLStatus.PENDING.value
     assert data["failure_reason"] is None
+    assert enqueued_urls.call_args.args[1] is False
+    
+    response = await client.post(
+        f"{settings.API_V1_STR}/projects/{project_id}/urls/{url_id}:reprocess", params={"force": True}
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert enqueued_urls.call_args.args[1] is True
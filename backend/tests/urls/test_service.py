@@ -97,7 +97,7 @@ async def test_get_urls_by_project(test_project, test_url, db_session):
     assert url_data["status"] == test_url.status
 
 
-async def test_create_url(test_project, db_session):
+async def test_create_url(test_project, db_session, enqueued_urls):
     """Test creating a new URL."""
     original_url = "https://example.com/new-service-test"
     
@@ -111,6 +111,33 @@ async def test_create_url(test_project, db_session):
     assert url_data["original_url"] == original_url
     assert url_data["status"] == URLStatus.PENDING.value
     assert url_data["project_id"] == test_project.project_id
+    enqueued_urls.assert_called_once_with([(url_data["url_id"], test_project.project_id)], False)
+
+
+async def test_urls_are_marked_failed_when_they_cannot_be_enqueued(test_project, db_session, enqueued_urls):
+    """URLs whose pipelines cannot be published are failed rather than left pending."""
+    enqueued_urls.side_effect = ConnectionError("broker unreachable")
+    project_id = test_project.project_id
+    
+    url_data = await service.create_url(
+        session=db_session, project_id=project_id, original_url="https://example.com/unqueued"
+    )
+    batch = await service.batch_create_urls(
+        session=db_session,
+        project_id=project_id,
+        urls=["https://example.com/unqueued-1", "https://example.com/unqueued-2"],
+    )
+    
+    assert url_data["status"] == URLStatus.FAILED.value
+    assert url_data["failure_reason"] == "Could not be queued for processing: ConnectionError"
+    assert [url["status"] for url in batch["submitted_urls"]] == [URLStatus.FAILED.value] * 2
+    db_session.expire_all()
+    stored = (await db_session.execute(select(URL).where(URL.project_id == project_id))).scalars().all()
+    assert {url.status for url in stored} == {URLStatus.FAILED.value}
+    
+    enqueued_urls.side_effect = None
+    reprocessed = await service.reprocess_url(db_session, url_data["url_id"], project_id)
+    assert reprocessed["status"] == URLStatus.PENDING.value
 
 
 async def test_create_duplicate_url(test_project, test_url, db_session):
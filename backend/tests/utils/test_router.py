@@ -9,3 +9,20 @@ async def test_health_check(client: AsyncClient):
     response = await client.get("/api/v1/utils/health-check/")
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == True
+
+
+@pytest.mark.asyncio
+async def test_cache_stats(client: AsyncClient):
+    """Test the cache statistics endpoint."""
+    from src.chunks.embeddings import query_embedding_cache
+    
+    query_embedding_cache.set(("model", "query"), [0.0])
+    query_embedding_cache.get(("model", "query"))
+    query_embedding_cache.get(("model", "other"))
+    
+    response = await client.get("/api/v1/utils/cache-stats/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "query_embeddings": {"size": 1, "hits": 1, "misses": 1},
+        "search_results": {"size": 0, "hits": 0, "misses": 0},
+    }